@@ -0,0 +1,91 @@
+'''
+File: import_time.py
+Author: Kunologist
+Description:
+    Measures how long a fresh interpreter takes to import the engine, and
+    what `env.warmup()` costs on top, as paid by every spawned worker.
+
+    python benchmarks/import_time.py --runs 10
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+
+# Statements timed in a fresh interpreter
+CASES = {
+    "python": "pass",
+    "import_env_mahjong": "import env.mahjong",
+    "import_and_warmup": "import env.mahjong, env; env.warmup()",
+    "import_flask_agent": "import env.flask_agent"
+}
+
+def time_case(statement: str, runs: int) -> float:
+    '''
+    Function: time_case()
+
+    ## Description
+
+    Returns the median wall time, in milliseconds, of starting an
+    interpreter and running `statement`.
+    '''
+    samples = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], cwd=parent, check=True)
+        samples.append((time.perf_counter() - t) * 1000)
+    return statistics.median(samples)
+
+def top_imports(module: str, count: int) -> list:
+    '''
+    Function: top_imports()
+
+    ## Description
+
+    Runs `python -X importtime` and returns the top-level imports of
+    `module` that take the longest, cumulative times in milliseconds.
+    '''
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module], cwd=parent, check=True, capture_output=True, text=True).stderr
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            cumulative = int(fields[1])
+        except ValueError:
+            continue
+        rows.append((fields[2].rstrip(), cumulative / 1000))
+    rows.sort(key=lambda row: -row[1])
+    return [{"module": name.strip(), "depth": (len(name) - len(name.lstrip())) // 2, "cumulative_ms": ms} for name, ms in rows[:count]]
+
+def run(runs: int, top: int) -> dict:
+    '''
+    Function: run()
+
+    ## Description
+
+    Runs the benchmark and returns a dict of measurements.
+    '''
+    results = {name: time_case(statement, runs) for name, statement in CASES.items()}
+    return {
+        "runs": runs,
+        "median_ms": results,
+        "import_overhead_ms": results["import_env_mahjong"] - results["python"],
+        "warmup_ms": results["import_and_warmup"] - results["import_env_mahjong"],
+        "slowest_imports": top_imports("env.mahjong", top)
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures the import time of the engine.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10, help="number of slowest imports to list")
+    args = parser.parse_args()
+    print(json.dumps(run(args.runs, args.top), indent=2))
@@ -0,0 +1,62 @@
+'''
+File: pool_start.py
+Author: Kunologist
+Description:
+    Measures how long a process pool takes to return its first warm
+    result, with workers started by the fork server or spawned.
+
+    python benchmarks/pool_start.py --processes 8
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from env.workers import make_pool
+
+def time_pool(method: str, processes: int) -> dict:
+    '''
+    Function: time_pool()
+
+    ## Description
+
+    Starts a pool, waits until every worker has warmed up and answered one
+    task, and returns the elapsed times in milliseconds.
+    '''
+    t = time.perf_counter()
+    with make_pool(processes, method=method) as pool:
+        futures = [pool.submit(time.sleep, 0.01) for _ in range(processes)]
+        first = None
+        for future in futures:
+            future.result()
+            if first is None:
+                first = (time.perf_counter() - t) * 1000
+        ready = (time.perf_counter() - t) * 1000
+        t = time.perf_counter()
+        for future in [pool.submit(os.getpid) for _ in range(processes)]:
+            future.result()
+        warm = (time.perf_counter() - t) * 1000
+    return {"first_result_ms": first, "all_ready_ms": ready, "warm_round_ms": warm}
+
+def run(processes: int, methods: list) -> dict:
+    '''
+    Function: run()
+
+    ## Description
+
+    Runs the benchmark and returns a dict of measurements.
+    '''
+    return {"processes": processes, "methods": {method: time_pool(method, processes) for method in methods}}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures the start time of worker pools.")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--methods", nargs="+", default=["forkserver", "spawn"])
+    args = parser.parse_args()
+    print(json.dumps(run(args.processes, args.methods), indent=2))
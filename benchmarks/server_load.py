@@ -0,0 +1,190 @@
+'''
+File: server_load.py
+Author: Kunologist
+Description:
+    Load generator for the multi-table action server. Posts one decision
+    for every seat of every table, lets client threads answer them and
+    measures throughput and latency.
+
+    python benchmarks/server_load.py --tables 1000 --rounds 5
+    python benchmarks/server_load.py --tables 100 --http
+'''
+
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.insert(0, parent)
+
+from env.decision_board import DecisionBoard
+from env.local_server import LocalAgentServer
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    if len(values) == 0:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+class BoardTarget:
+    '''
+    Drives a `DecisionBoard` in-process.
+    '''
+    def __init__(self, board: DecisionBoard):
+        self.board = board
+
+    def post(self, key):
+        assert self.board.post(*key, {}, ["noop", "pon"])
+
+    def serve(self, seat_keys: list):
+        answered = 0
+        for table_id, seat in seat_keys:
+            decision = self.board.next_pending(table_id, seat, timeout=5)
+            if decision is not None and self.board.submit(*decision.key, 1):
+                answered += 1
+        return answered
+
+    def wait(self, key):
+        return self.board.wait(*key, 30)
+
+class HttpTarget:
+    '''
+    Drives an action server over HTTP, one keep-alive session per thread.
+    '''
+    def __init__(self, url: str):
+        import requests
+        self.url = url
+        self.requests = requests
+        self.local = threading.local()
+
+    def session(self):
+        if not hasattr(self.local, "session"):
+            self.local.session = self.requests.Session()
+        return self.local.session
+
+    def post(self, key):
+        ret = self.session().post(self.url + "observation_update", json={
+            "table_id": key[0],
+            "seat": key[1],
+            "decision_id": key[2],
+            "observation": "{}",
+            "action_space": "[\"noop\", \"pon\"]"
+        }).json()
+        assert ret["success"], ret
+
+    def serve(self, seat_keys: list):
+        answered = 0
+        for table_id, seat in seat_keys:
+            ret = self.session().get(self.url + "decision_next", params={"table_id": table_id, "seat": seat, "timeout": 5}).json()
+            if not ret["success"]:
+                continue
+            decision = ret["decision"]
+            ret = self.session().get(self.url + "action_submit", params={
+                "table_id": table_id, "seat": seat, "decision_id": decision["decision_id"], "action": 1
+            }).json()
+            answered += ret["success"]
+        return answered
+
+    def wait(self, key):
+        return self.session().get(self.url + "action_wait", params={
+            "table_id": key[0], "seat": key[1], "decision_id": key[2], "timeout": 30
+        }).json()["action"]
+
+def run_threads(count: int, target, chunks: list) -> list:
+    results = [None] * count
+    def work(i):
+        results[i] = target(chunks[i])
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def run(tables: int, seats: int, rounds: int, clients: int, waiters: int, http: bool = False, url: str = None) -> dict:
+    '''
+    Function: run()
+
+    ## Description
+
+    Runs the load generator and returns a dict of measurements.
+    '''
+    server = None
+    board = DecisionBoard()
+    if url is not None:
+        target = HttpTarget(url)
+    elif http:
+        server = LocalAgentServer(board=board)
+        target = HttpTarget(server.start())
+    else:
+        target = BoardTarget(board)
+    seat_keys = [(str(table), seat) for table in range(tables) for seat in range(seats)]
+    latencies = []
+    post_time = 0.0
+    total_time = 0.0
+    peak_pending = 0
+    for _ in range(rounds):
+        keys = [(table_id, seat, uuid.uuid4().hex) for table_id, seat in seat_keys]
+        posted_at = {}
+        t = time.perf_counter()
+        # Post all decisions of the round
+        def post(chunk):
+            for key in chunk:
+                posted_at[key] = time.perf_counter()
+                target.post(key)
+        run_threads(waiters, post, [keys[i::waiters] for i in range(waiters)])
+        post_time += time.perf_counter() - t
+        peak_pending = max(peak_pending, len(board.pending()) if url is None else len(keys))
+        # Answer and collect them concurrently
+        def wait(chunk):
+            done = []
+            for key in chunk:
+                target.wait(key)
+                done.append(time.perf_counter() - posted_at[key])
+            return done
+        waiting = []
+        waiter_threads = []
+        for i in range(waiters):
+            chunk = keys[i::waiters]
+            thread = threading.Thread(target=lambda c=chunk: waiting.append(wait(c)))
+            thread.start()
+            waiter_threads.append(thread)
+        answered = sum(run_threads(clients, target.serve, [seat_keys[i::clients] for i in range(clients)]))
+        for thread in waiter_threads:
+            thread.join()
+        total_time += time.perf_counter() - t
+        assert answered == len(keys), "{} of {} decisions answered".format(answered, len(keys))
+        for done in waiting:
+            latencies += done
+    if server is not None:
+        server.stop()
+    decisions = len(seat_keys) * rounds
+    return {
+        "transport": "http" if (http or url) else "in-process",
+        "tables": tables,
+        "seats": seats,
+        "rounds": rounds,
+        "decisions": decisions,
+        "peak_pending": peak_pending,
+        "posts_per_sec": decisions / post_time,
+        "decisions_per_sec": decisions / total_time,
+        "latency_p50_ms": percentile(latencies, 0.5) * 1000,
+        "latency_p99_ms": percentile(latencies, 0.99) * 1000
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load generator for the multi-table action server.")
+    parser.add_argument("--tables", type=int, default=500)
+    parser.add_argument("--seats", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--clients", type=int, default=8, help="threads answering decisions")
+    parser.add_argument("--waiters", type=int, default=8, help="threads posting and awaiting decisions")
+    parser.add_argument("--http", action="store_true", help="go through a LocalAgentServer")
+    parser.add_argument("--url", default=None, help="benchmark a running server instead, e.g. http://localhost:10317/")
+    args = parser.parse_args()
+    print(json.dumps(run(args.tables, args.seats, args.rounds, args.clients, args.waiters, args.http, args.url), indent=2))
@@ -0,0 +1,255 @@
+'''
+File: suite.py
+Author: Kunologist
+Description:
+    Throughput benchmarks of the rule helpers and the game engine over
+    fixed, seeded corpora of hands and walls. Results are written as json,
+    and two result files can be compared to flag regressions.
+
+    python benchmarks/suite.py --output before.json
+    python benchmarks/suite.py --output after.json
+    python benchmarks/suite.py --compare before.json after.json
+'''
+
+import os
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import contextlib
+
+import numpy as np
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.insert(0, parent)
+
+from env.action import Action
+from env.agent import Agent
+from env.deck import Deck, Wall
+from env.mahjong import MahjongGame, MahjongEndGame, MahjongRuleError
+from env.player import Player, can_chii, can_pon
+from env.ruleset import Ruleset
+from env.tiles import Tile
+from env.wall_bank import WallBank
+from env.utils import check_agari, check_tenpai, check_reach, shanten_count, get_value, check_agari_batch, get_tile_counts
+
+# All tile IDs, without red fives
+TILE_IDS = [suit * 10 + rank for suit in range(1, 4) for rank in range(1, 10)] + [41, 42, 43, 44, 45, 46, 47]
+
+def make_hands(count: int, seed: int = 0) -> list:
+    '''
+    Function: make_hands()
+
+    ## Description
+
+    Deals `count` hands from seeded walls. Every hand is a tuple of the
+    13-tile starting hand and the next tile of the mountain.
+    '''
+    ruleset = Ruleset()
+    hands = []
+    for i in range(count):
+        wall = Wall(ruleset, random_seed=seed + i)
+        hands.append((wall.get_starting_hand(0), wall.get_mountain()[-1]))
+    return hands
+
+def make_agari_hands(count: int, seed: int = 0) -> list:
+    '''
+    Function: make_agari_hands()
+
+    ## Description
+
+    Builds `count` complete closed hands of four sets and a pair. Every
+    hand is a tuple of the 14-tile `Deck` and its winning tile.
+    '''
+    rng = random.Random(seed)
+    hands = []
+    while len(hands) < count:
+        counts = {}
+        ids = []
+        for _ in range(4):
+            if rng.random() < 0.5:
+                suit, rank = rng.randint(1, 3), rng.randint(1, 7)
+                group = [suit * 10 + rank, suit * 10 + rank + 1, suit * 10 + rank + 2]
+            else:
+                group = [rng.choice(TILE_IDS)] * 3
+            ids += group
+        ids += [rng.choice(TILE_IDS)] * 2
+        for id in ids:
+            counts[id] = counts.get(id, 0) + 1
+        if max(counts.values()) > 4:
+            continue
+        hands.append((Deck(ids, sort=True), Tile(ids[rng.randrange(len(ids))])))
+    return hands
+
+def measure(fn, items: list, repeat: int) -> dict:
+    '''
+    Function: measure()
+
+    ## Description
+
+    Calls `fn` on every item, `repeat` times, and reports the best run.
+    '''
+    best = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        for item in items:
+            fn(item)
+        elapsed = time.perf_counter() - t
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        "count": len(items),
+        "seconds": best,
+        "ops_per_sec": len(items) / best if best > 0 else float("inf")
+    }
+
+def play_random_game(seed: int, fast_forward: bool = False):
+    random.seed(seed)
+    game = MahjongGame(Ruleset(), wall=seed, fast_forward=fast_forward)
+    for i in range(4):
+        game.set_player(i, Player("Random {}".format(i + 1), agent=Agent("Random {}".format(i + 1))))
+    try:
+        game.play()
+    except (MahjongEndGame, MahjongRuleError):
+        pass
+
+def run(hands: int = 200, games: int = 2, repeat: int = 3, seed: int = 0, only: list = None) -> dict:
+    '''
+    Function: run()
+
+    ## Description
+
+    Runs the benchmarks and returns a dict of measurements, keyed by the
+    benchmark name.
+
+    ## Parameters
+
+    - `hands`: `int`
+        Size of the hand corpora.
+    - `games`: `int`
+        Number of full random-agent games.
+    - `repeat`: `int`
+        Runs per benchmark; the fastest one is reported.
+    - `seed`: `int`
+        Seed of the corpora.
+    - `only`: `list` or `None`
+        Names of the benchmarks to run. Runs all if `None`.
+    '''
+    dealt = make_hands(hands, seed)
+    agari = make_agari_hands(hands, seed)
+    closed = [hand for hand, _ in dealt]
+    full = [hand + tile for hand, tile in dealt]
+    mixed = [hand for hand, _ in agari] + full
+    mixed_counts = np.array([get_tile_counts(hand.get_tiles()) for hand in mixed])
+    # Active and passive observations of seeded games
+    game = MahjongGame(Ruleset(), wall=seed)
+    game.initialize_game()
+    observations = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(hands):
+            if len(game.wall.mountain) == 0:
+                game = MahjongGame(Ruleset(), wall=seed + len(observations))
+                game.initialize_game()
+            player_idx = game.state["player_idx"]
+            tile = game.wall.mountain.pop()
+            observations.append(game.get_observation(player_idx, {"player_state": "active", "incoming_tile": tile}))
+            game.perform_action(Action.DISCARD(), {"player_idx": player_idx, "incoming_tile": tile})
+            game.state["player_idx"] = (player_idx + 1) % 4
+            passive_idx = game.state["player_idx"]
+            observations.append(game.get_observation(passive_idx, {"player_state": "passive", "incoming_tile": tile}))
+    passive = [(obs["hand"].get_tiles(), obs["incoming_tile"], obs) for obs in observations if obs["player_state"] == "passive"]
+    player = Player("Benchmark", is_manual=True)
+    ruleset = Ruleset()
+    bank = WallBank.generate(ruleset, hands, seed)
+    benchmarks = {
+        "check_agari": (lambda hand: check_agari(hand, []), mixed),
+        "check_agari_batch": (check_agari_batch, [mixed_counts]),
+        "check_tenpai": (lambda hand: check_tenpai(hand, []), closed),
+        "check_reach": (lambda hand: check_reach(hand, []), full),
+        "shanten_count": (shanten_count, full),
+        "get_value": (lambda item: get_value(item[0], item[1], dora_indicators=[Tile(11)]), agari),
+        "can_chii": (lambda item: can_chii(*item), passive),
+        "can_pon": (lambda item: can_pon(*item), passive),
+        "get_action_space": (player.get_action_space, observations),
+        "new_wall": (lambda i: Wall(ruleset, random_seed=seed + i).get_starting_hands(), list(range(hands))),
+        "bank_wall": (lambda i: bank[i].get_starting_hands(), list(range(hands))),
+        "generate_bank": (lambda _: WallBank.generate(ruleset, 1000, seed), [None]),
+        "get_observation": (lambda i: game.get_observation(i % 4, {"player_state": "passive", "incoming_tile": None}), list(range(hands))),
+        "random_games": (play_random_game, [seed + i for i in range(games)]),
+        "random_games_fast_forward": (lambda i: play_random_game(i, fast_forward=True), [seed + i for i in range(games)])
+    }
+    results = {}
+    workdir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        # Games write their log to the working directory
+        os.chdir(tmp)
+        try:
+            for name, (fn, items) in benchmarks.items():
+                if only is not None and name not in only:
+                    continue
+                results[name] = measure(fn, items, 1 if name.startswith("random_games") else repeat)
+        finally:
+            os.chdir(workdir)
+    return {
+        "python": platform.python_version(),
+        "seed": seed,
+        "benchmarks": results
+    }
+
+def compare(before: dict, after: dict, threshold: float) -> list:
+    '''
+    Function: compare()
+
+    ## Description
+
+    Compares two results of `run()`.
+
+    ## Returns
+
+    `list`
+        One dict per benchmark present in both runs, with the throughput
+        ratio `after / before` and whether it dropped by more than
+        `threshold` (e.g. `0.1` for 10%).
+    '''
+    rows = []
+    for name, result in after["benchmarks"].items():
+        if name not in before["benchmarks"]:
+            continue
+        ratio = result["ops_per_sec"] / before["benchmarks"][name]["ops_per_sec"]
+        rows.append({
+            "benchmark": name,
+            "before": before["benchmarks"][name]["ops_per_sec"],
+            "after": result["ops_per_sec"],
+            "ratio": ratio,
+            "regression": ratio < 1 - threshold
+        })
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput benchmarks of the rule helpers and the game engine.")
+    parser.add_argument("--hands", type=int, default=200, help="size of the hand corpora")
+    parser.add_argument("--games", type=int, default=2, help="number of random-agent games")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", default=None, help="names of the benchmarks to run")
+    parser.add_argument("--output", default=None, help="also write the results to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), default=None, help="compare two result files")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown reported as a regression")
+    args = parser.parse_args()
+    if args.compare is not None:
+        with open(args.compare[0]) as f:
+            before = json.load(f)
+        with open(args.compare[1]) as f:
+            after = json.load(f)
+        rows = compare(before, after, args.threshold)
+        print(json.dumps(rows, indent=2))
+        sys.exit(1 if any(row["regression"] for row in rows) else 0)
+    results = run(args.hands, args.games, args.repeat, args.seed, args.only)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,121 @@
+'''
+File: wire_bench.py
+Author: Kunologist
+Description:
+    Compares the message size and the encode / decode throughput of the
+    binary wire format (`env/wire.py`) and of the json delta observations
+    (`env/events.py`) with the json observations posted by `FlaskAgent`.
+
+    python benchmarks/wire_bench.py --games 20
+'''
+
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import contextlib
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.insert(0, parent)
+
+from env.action import Action
+from env.mahjong import MahjongGame
+from env.ruleset import Ruleset
+from env.events import make_delta
+from env.wire import ObservationEncoder, ObservationDecoder
+
+def collect_observations(games: int) -> list:
+    '''
+    Function: collect_observations()
+
+    ## Description
+
+    Plays seeded games in which every player discards the drawn tile and
+    returns the passive observations of every seat, in order, and their
+    delta observations. Each observation is a snapshot, so later discards
+    do not leak into it.
+    '''
+    stream = []
+    deltas = []
+    ruleset = Ruleset()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for seed in range(games):
+            game = MahjongGame(ruleset, wall=seed, stream_events=True)
+            game.initialize_game()
+            while len(game.wall.mountain) > 0:
+                player_idx = game.state["player_idx"]
+                tile = game.wall.mountain.pop()
+                game.emit({"type": "draw", "player_idx": player_idx}, player_idx, {"tile": tile.get_id()})
+                game.perform_action(Action.DISCARD(), {"player_idx": player_idx, "incoming_tile": tile})
+                for i in range(4):
+                    if i != player_idx:
+                        obs = game.get_observation(i, {"player_state": "passive", "incoming_tile": tile})
+                        deltas.append(make_delta(obs))
+                        del obs["events"]
+                        obs["discarded_tiles"] = [list(discards) for discards in obs["discarded_tiles"]]
+                        obs["calls"] = [list(calls) for calls in obs["calls"]]
+                        stream.append(obs)
+                game.state["player_idx"] = (player_idx + 1) % 4
+    return stream, deltas
+
+def run(games: int) -> dict:
+    '''
+    Function: run()
+
+    ## Description
+
+    Runs the benchmark and returns a dict of measurements.
+    '''
+    stream, deltas = collect_observations(games)
+    to_json = lambda o: o.to_json()
+    # json, as posted by FlaskAgent
+    t = time.perf_counter()
+    json_messages = [json.dumps(obs, default=to_json).encode("utf-8") for obs in stream]
+    json_encode = time.perf_counter() - t
+    t = time.perf_counter()
+    for message in json_messages:
+        json.loads(message)
+    json_decode = time.perf_counter() - t
+    # binary, delta-encoded per seat
+    encoder = ObservationEncoder()
+    t = time.perf_counter()
+    binary_messages = [encoder.encode(obs) for obs in stream]
+    binary_encode = time.perf_counter() - t
+    decoder = ObservationDecoder()
+    t = time.perf_counter()
+    for message in binary_messages:
+        decoder.decode(message)
+    binary_decode = time.perf_counter() - t
+    # json deltas, applied by an ObservationTracker on the server
+    t = time.perf_counter()
+    delta_messages = [json.dumps(delta).encode("utf-8") for delta in deltas]
+    delta_encode = time.perf_counter() - t
+    # binary, without deltas
+    full_bytes = sum(len(ObservationEncoder().encode(obs)) for obs in stream)
+    count = len(stream)
+    json_bytes = sum(len(message) for message in json_messages)
+    binary_bytes = sum(len(message) for message in binary_messages)
+    delta_bytes = sum(len(message) for message in delta_messages)
+    return {
+        "messages": count,
+        "json_bytes_per_message": json_bytes / count,
+        "binary_full_bytes_per_message": full_bytes / count,
+        "binary_delta_bytes_per_message": binary_bytes / count,
+        "json_delta_bytes_per_message": delta_bytes / count,
+        "size_ratio": json_bytes / binary_bytes,
+        "delta_size_ratio": json_bytes / delta_bytes,
+        "json_encode_per_sec": count / json_encode,
+        "json_decode_per_sec": count / json_decode,
+        "json_delta_encode_per_sec": count / delta_encode,
+        "binary_encode_per_sec": count / binary_encode,
+        "binary_decode_per_sec": count / binary_decode
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares the binary wire format with json.")
+    parser.add_argument("--games", type=int, default=10)
+    args = parser.parse_args()
+    print(json.dumps(run(args.games), indent=2))
@@ -0,0 +1,24 @@
+'''
+File: __init__.py
+Author: Kunologist
+Description:
+    The env package. Importing it is cheap: the `mahjong` library and other
+    heavy dependencies are only loaded when first used, or by `warmup()`.
+'''
+
+def warmup():
+    '''
+    Function: warmup()
+
+    ## Description
+
+    Pays the one-off costs of the engine up front: imports the game modules,
+    maps the agari tables and builds the calculators of the `mahjong`
+    library. Call it in a
+    parent process before forking workers, or before timing a first game.
+    '''
+    import env.mahjong
+    from env.tables import get_tables
+    from env.utils import get_calculators
+    get_tables()
+    get_calculators()
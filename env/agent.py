@@ -16,13 +16,44 @@ class Agent:
 
     A class that represents an agent that can play the game of mahjong.
     This class serves as a base class for other agents.
+
+    ## Details
+
+    `concurrent` tells whether the game may query the agent in a thread
+    while other agents decide. It is meant for agents that wait on I/O,
+    such as `FlaskAgent`.
+
+    Random choices are drawn from `self.random`, the global `random`
+    module unless a `random.Random` is assigned, e.g. by the duplicate
+    evaluation (`env/duplicate.py`).
     '''
+    concurrent = False
+    random = random
+
     def __init__(self, name):
         self.name = name
 
     def query(self, obs, action_space):
         # Random select
-        return random.choice(action_space)
+        return self.random.choice(action_space)
+
+    def query_batch(self, observations, action_spaces):
+        '''
+        Method: query_batch()
+
+        ## Description
+
+        Selects the actions of several seats played by this agent, e.g.
+        the passive players after a discard. Override it to evaluate all
+        of them in one forward pass; by default, `query()` is called for
+        every seat.
+
+        ## Returns
+
+        `list`
+            One action of every action space.
+        '''
+        return [self.query(obs, action_space) for obs, action_space in zip(observations, action_spaces)]
 
 class AgentAgari(Agent):
     '''
@@ -40,4 +71,4 @@ class AgentAgari(Agent):
         for action in action_space:
             if action.action_type == "ron" or action.action_type == "tsumo":
                 return action
-        return random.choice(action_space)
+        return self.random.choice(action_space)
@@ -0,0 +1,180 @@
+'''
+File: cache.py
+Author: Kunologist
+Description:
+    Canonical keys of hands and bounded LRU caches of the rule checks in
+    `env.utils`, shared by all games of a process.
+'''
+
+import os
+import threading
+from collections import OrderedDict
+
+# Default capacity of every cache, in entries. `$MAHJONG_CACHE_SIZE`
+# overrides it; 0 disables caching.
+DEFAULT_CAPACITY = 65536
+
+# The cached rule checks
+CACHED_FUNCTIONS = ["check_agari", "check_tenpai", "check_reach", "shanten_count", "get_waits"]
+
+def get_hand_key(counts: list) -> bytes:
+    '''
+    Function: get_hand_key()
+
+    ## Description
+
+    Returns the canonical key of a hand. Hands with the same tile counts
+    have the same key, whatever the order of their tiles.
+
+    ## Parameters
+
+    - `counts`: `list`
+        The 34 tile counts, see `env.utils.get_tile_counts()`.
+
+    ## Returns
+
+    `bytes`
+
+    ## Details
+
+    The cached checks depend only on the tile counts of the closed hand:
+    red fives and calls do not change the shape of a hand, so they are
+    not part of the key.
+    '''
+    return bytes(counts)
+
+class LRUCache:
+    '''
+    Class: LRUCache
+
+    ## Description
+
+    A bounded mapping that evicts the least recently used entry, and
+    counts its hits and misses.
+    '''
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        '''
+        Constructor: __init__
+
+        ## Parameters
+
+        - `capacity`: `int`
+            The maximum number of entries. `0` disables the cache.
+        '''
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute, *args):
+        '''
+        Method: get()
+
+        ## Description
+
+        Returns the value cached for `key`, or computes it as
+        `compute(*args)` and caches it. Cached values are shared, so they
+        must not be modified by the caller.
+        '''
+        with self.lock:
+            value = self.entries.get(key, self)
+            if value is not self:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+        value = compute(*args)
+        if self.capacity > 0:
+            with self.lock:
+                self.entries[key] = value
+                if len(self.entries) > self.capacity:
+                    self.entries.popitem(last=False)
+        return value
+
+    def resize(self, capacity: int):
+        '''
+        Method: resize()
+
+        ## Description
+
+        Changes the capacity, evicting the oldest entries if needed.
+        '''
+        with self.lock:
+            self.capacity = capacity
+            while len(self.entries) > max(capacity, 0):
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        '''
+        Method: clear()
+
+        ## Description
+
+        Removes all entries and resets the statistics.
+        '''
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get_stats(self) -> dict:
+        '''
+        Method: get_stats()
+
+        ## Description
+
+        Returns the hits, misses, hit rate, size and capacity of the cache.
+        '''
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups > 0 else 0.0,
+                "size": len(self.entries),
+                "capacity": self.capacity
+            }
+
+caches = {name: LRUCache(int(os.environ.get("MAHJONG_CACHE_SIZE", DEFAULT_CAPACITY))) for name in CACHED_FUNCTIONS}
+
+def configure_cache(capacity: int, names: list = None):
+    '''
+    Function: configure_cache()
+
+    ## Description
+
+    Sets the capacity of the caches of the rule checks in `names` (by
+    default, all of them). `0` disables caching.
+    '''
+    for name in names if names is not None else CACHED_FUNCTIONS:
+        caches[name].resize(capacity)
+
+def clear_cache():
+    '''
+    Function: clear_cache()
+
+    ## Description
+
+    Empties all caches and resets their statistics.
+    '''
+    for cache in caches.values():
+        cache.clear()
+
+def get_cache_stats() -> dict:
+    '''
+    Function: get_cache_stats()
+
+    ## Description
+
+    Returns the statistics of every cache, see `LRUCache.get_stats()`.
+
+    ## Examples
+
+    ```python
+    >>> get_cache_stats()["check_reach"]["hit_rate"]
+    0.93
+    ```
+    '''
+    return {name: cache.get_stats() for name, cache in caches.items()}
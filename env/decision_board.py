@@ -0,0 +1,322 @@
+'''
+File: decision_board.py
+Author: Kunologist
+Description:
+    Thread-safe bookkeeping of pending decisions for action servers that
+    host many tables at once.
+'''
+
+import time
+import threading
+from collections import deque
+
+class Decision:
+    '''
+    Class: Decision
+
+    ## Description
+
+    A decision waiting for an action. Decisions are identified by the key
+    `(table_id, seat, decision_id)`.
+    '''
+
+    __slots__ = ("key", "observation", "action_space", "posted_at", "deadline", "action", "timed_out", "event")
+
+    def __init__(self, key: tuple, observation, action_space, deadline: float or None):
+        self.key = key
+        self.observation = observation
+        self.action_space = action_space
+        self.posted_at = time.monotonic()
+        self.deadline = deadline
+        self.action = None
+        self.timed_out = False
+        self.event = threading.Event()
+
+    def to_json(self):
+        return {
+            "table_id": self.key[0],
+            "seat": self.key[1],
+            "decision_id": self.key[2],
+            "observation": self.observation,
+            "action_space": self.action_space
+        }
+
+class DecisionBoard:
+    '''
+    Class: DecisionBoard
+
+    ## Description
+
+    Stores the pending decisions of any number of tables and seats.
+
+    ## Details
+
+    Agents `post()` a decision and block in `wait()` until it is answered.
+    Clients, i.e. humans or bots answering on behalf of a seat, either
+    long-poll `next_pending()` for work or are pushed new decisions through
+    a listener, and answer with `submit()`.
+
+    Every decision may carry a timeout. A decision that is not answered in
+    time is resolved with the default action, which is the first entry of
+    the action space (`discard` for an active player, `noop` for a passive
+    one).
+
+    Each decision has its own event and each seat its own condition, so
+    answering one decision never wakes up the waiters of the others.
+
+    A decision leaves the queue of its seat as soon as it is answered or
+    times out, and leaves the board once `wait()` delivers it. Decisions
+    nobody waits for any more are dropped by `expire()`, `retention`
+    seconds after their deadline.
+    '''
+
+    def __init__(self, default_timeout: float or None = None, default_action: int = 0, retention: float = 60):
+        '''
+        Constructor: __init__
+
+        ## Description
+
+        The constructor of the DecisionBoard class.
+
+        ## Parameters
+
+        - `default_timeout`: `float` or `None`
+            Seconds a decision may stay unanswered before the default
+            action is applied. `None` waits forever.
+        - `default_action`: `int`
+            The index of the action applied on timeout.
+        - `retention`: `float`
+            Seconds a decision past its deadline is kept for `wait()`
+            before `expire()` drops it.
+        '''
+        self.default_timeout = default_timeout
+        self.default_action = default_action
+        self.retention = retention
+        self.next_expiry = time.monotonic() + retention
+        self.lock = threading.Lock()
+        self.decisions = {}
+        self.queues = {}
+        self.conditions = {}
+        self.listeners = []
+        self.stats = {
+            "posted": 0,
+            "answered": 0,
+            "timed_out": 0
+        }
+
+    def __seat_condition(self, seat_key: tuple) -> threading.Condition:
+        condition = self.conditions.get(seat_key)
+        if condition is None:
+            condition = self.conditions[seat_key] = threading.Condition(self.lock)
+            self.queues[seat_key] = deque()
+        return condition
+
+    def post(self, table_id: str, seat: int, decision_id: str, observation, action_space, timeout: float or None = None) -> bool:
+        '''
+        Method: post()
+
+        ## Description
+
+        Registers a new pending decision.
+
+        ## Parameters
+
+        - `table_id`, `seat`, `decision_id`:
+            The key of the decision.
+        - `observation`, `action_space`:
+            The payload handed to the client.
+        - `timeout`: `float` or `None`
+            Overrides the default timeout of the board.
+
+        ## Returns
+
+        `bool`
+            `False` if the key is already in use.
+        '''
+        key = (str(table_id), int(seat), str(decision_id))
+        timeout = self.default_timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        decision = Decision(key, observation, action_space, deadline)
+        if time.monotonic() >= self.next_expiry:
+            self.expire()
+        with self.lock:
+            if key in self.decisions:
+                return False
+            self.decisions[key] = decision
+            condition = self.__seat_condition(key[:2])
+            self.queues[key[:2]].append(decision)
+            self.stats["posted"] += 1
+            condition.notify()
+        for listener in self.listeners:
+            listener(decision)
+        return True
+
+    def submit(self, table_id: str, seat: int, decision_id: str, action: int) -> bool:
+        '''
+        Method: submit()
+
+        ## Description
+
+        Answers a pending decision.
+
+        ## Returns
+
+        `bool`
+            `False` if no such decision is pending, e.g. because it has
+            already been answered or has timed out.
+        '''
+        key = (str(table_id), int(seat), str(decision_id))
+        with self.lock:
+            decision = self.decisions.get(key)
+            if decision is None or decision.event.is_set():
+                return False
+            if decision.deadline is not None and time.monotonic() >= decision.deadline:
+                self.__time_out(decision)
+                return False
+            decision.action = int(action)
+            self.stats["answered"] += 1
+            decision.event.set()
+            self.__dequeue(decision)
+        return True
+
+    def __dequeue(self, decision: Decision):
+        # Must be called with the lock held
+        queue = self.queues.get(decision.key[:2])
+        if queue is not None:
+            try:
+                queue.remove(decision)
+            except ValueError:
+                pass
+
+    def __time_out(self, decision: Decision):
+        # Must be called with the lock held
+        decision.action = self.default_action
+        decision.timed_out = True
+        self.stats["timed_out"] += 1
+        decision.event.set()
+        self.__dequeue(decision)
+
+    def expire(self) -> int:
+        '''
+        Method: expire()
+
+        ## Description
+
+        Times out the decisions past their deadline, and drops the ones
+        whose deadline passed more than `retention` seconds ago, which
+        nobody waits for any more. Called by `post()` every `retention`
+        seconds.
+
+        ## Returns
+
+        `int`
+            The number of decisions dropped.
+        '''
+        now = time.monotonic()
+        dropped = 0
+        with self.lock:
+            self.next_expiry = now + self.retention
+            for key, decision in list(self.decisions.items()):
+                if decision.deadline is None or now < decision.deadline:
+                    continue
+                if not decision.event.is_set():
+                    self.__time_out(decision)
+                if now >= decision.deadline + self.retention:
+                    del self.decisions[key]
+                    dropped += 1
+        return dropped
+
+    def wait(self, table_id: str, seat: int, decision_id: str, timeout: float) -> int or None:
+        '''
+        Method: wait()
+
+        ## Description
+
+        Blocks until the decision is answered, times out, or `timeout`
+        seconds have passed. A delivered decision is removed from the board.
+
+        ## Returns
+
+        `int` or `None`
+            The action index, or `None` if the decision is still pending.
+
+        ## Raises
+
+        - `KeyError`:
+            If the decision is unknown.
+        '''
+        key = (str(table_id), int(seat), str(decision_id))
+        with self.lock:
+            decision = self.decisions[key]
+        if decision.deadline is not None:
+            timeout = min(timeout, max(0, decision.deadline - time.monotonic()))
+        if not decision.event.wait(timeout):
+            with self.lock:
+                if not decision.event.is_set():
+                    if decision.deadline is None or time.monotonic() < decision.deadline:
+                        return None
+                    self.__time_out(decision)
+        with self.lock:
+            self.decisions.pop(key, None)
+        return decision.action
+
+    def next_pending(self, table_id: str, seat: int, timeout: float = 0) -> Decision or None:
+        '''
+        Method: next_pending()
+
+        ## Description
+
+        Returns the oldest unanswered decision of a seat, waiting up to
+        `timeout` seconds for one to be posted.
+
+        ## Returns
+
+        `Decision` or `None`
+        '''
+        seat_key = (str(table_id), int(seat))
+        end = time.monotonic() + timeout
+        with self.lock:
+            condition = self.__seat_condition(seat_key)
+            queue = self.queues[seat_key]
+            while True:
+                now = time.monotonic()
+                while len(queue) > 0:
+                    decision = queue[0]
+                    if decision.event.is_set():
+                        queue.popleft()
+                    elif decision.deadline is not None and now >= decision.deadline:
+                        self.__time_out(decision)
+                    else:
+                        return decision
+                if now >= end:
+                    return None
+                condition.wait(end - now)
+
+    def pending(self, table_id: str or None = None, seat: int or None = None) -> list:
+        '''
+        Method: pending()
+
+        ## Description
+
+        Returns the keys of the unanswered decisions, optionally filtered
+        by table and seat.
+        '''
+        with self.lock:
+            return [
+                key for key, decision in self.decisions.items()
+                if not decision.event.is_set()
+                and (table_id is None or key[0] == str(table_id))
+                and (seat is None or key[1] == int(seat))
+            ]
+
+    def add_listener(self, listener):
+        '''
+        Method: add_listener()
+
+        ## Description
+
+        Registers a callable that is pushed every new decision, e.g. to
+        forward it to a connected client. The listener is called outside
+        the lock and may call `submit()` directly.
+        '''
+        self.listeners.append(listener)
@@ -5,9 +5,8 @@ Description:
     This file contains the Deck class, a class that represents a deck of tiles.
 '''
 
-import time
+import os
 import random
-from mahjong.tile import TilesConverter
 
 from env.tiles import Tile
 from env.ruleset import Ruleset
@@ -149,7 +148,20 @@ class Deck:
         Sorts the deck in ascending order.
         '''
         self.tiles.sort(key=self.__sort_util)
-    
+
+    def copy(self):
+        '''
+        Method: copy()
+
+        ## Description
+
+        Returns a new deck with the same tiles, which is not affected by
+        later changes to this deck.
+        '''
+        deck = Deck(sort=self.sort_always)
+        deck.tiles = self.tiles.copy()
+        return deck
+
     def get_34_array(self):
         '''
         Method: get_34_array()
@@ -252,7 +264,8 @@ class Deck:
         84 -> 4s
         88 -> 0s (dora)
         '''
-        return TilesConverter().one_line_string_to_136_array(self.get_short_string())
+        from env.utils import get_calculators
+        return get_calculators()["tiles_converter"].one_line_string_to_136_array(self.get_short_string())
 
     def parse_list(self, tile_list: list):
         '''
@@ -557,6 +570,87 @@ class Deck:
         
 
 
+def get_wall_tile_ids(ruleset: Ruleset) -> list:
+    '''
+    Function: get_wall_tile_ids()
+
+    ## Description
+
+    Returns the IDs of all tiles of a wall for the given ruleset, unshuffled.
+    Only the `redDora` and `players` properties of the ruleset are used.
+
+    ## Raises
+
+    - `NotImplementedError`:
+        For 3-player walls.
+    - `Exception`:
+        For an unsupported `redDora` count.
+    '''
+    red_dora = int(ruleset.get_rule("redDora"))
+    player_count = int(ruleset.get_rule("players"))
+    if red_dora == 0 and player_count == 4:
+        tiles = [ 
+            11, 12, 13, 14, 15, 16, 17, 18, 19,
+            21, 22, 23, 24, 25, 26, 27, 28, 29,
+            31, 32, 33, 34, 35, 36, 37, 38, 39,
+            41, 42, 43, 44, 45, 46, 47,
+            11, 12, 13, 14, 15, 16, 17, 18, 19,
+            21, 22, 23, 24, 25, 26, 27, 28, 29,
+            31, 32, 33, 34, 35, 36, 37, 38, 39,
+            41, 42, 43, 44, 45, 46, 47,
+            11, 12, 13, 14, 15, 16, 17, 18, 19,
+            21, 22, 23, 24, 25, 26, 27, 28, 29,
+            31, 32, 33, 34, 35, 36, 37, 38, 39,
+            41, 42, 43, 44, 45, 46, 47,
+            11, 12, 13, 14, 15, 16, 17, 18, 19,
+            21, 22, 23, 24, 25, 26, 27, 28, 29,
+            31, 32, 33, 34, 35, 36, 37, 38, 39,
+            41, 42, 43, 44, 45, 46, 47
+        ]
+    elif red_dora == 3 and player_count == 4:
+        tiles = [ 
+            11, 12, 13, 14, (51), 16, 17, 18, 19,
+            21, 22, 23, 24, (52), 26, 27, 28, 29,
+            31, 32, 33, 34, (53), 36, 37, 38, 39,
+            41, 42, 43, 44, 45,   46, 47,
+            11, 12, 13, 14, 15,   16, 17, 18, 19,
+            21, 22, 23, 24, 25,   26, 27, 28, 29,
+            31, 32, 33, 34, 35,   36, 37, 38, 39,
+            41, 42, 43, 44, 45,   46, 47,
+            11, 12, 13, 14, 15,   16, 17, 18, 19,
+            21, 22, 23, 24, 25,   26, 27, 28, 29,
+            31, 32, 33, 34, 35,   36, 37, 38, 39,
+            41, 42, 43, 44, 45,   46, 47,
+            11, 12, 13, 14, 15,   16, 17, 18, 19,
+            21, 22, 23, 24, 25,   26, 27, 28, 29,
+            31, 32, 33, 34, 35,   36, 37, 38, 39,
+            41, 42, 43, 44, 45,   46, 47
+        ]
+    elif red_dora == 4 and player_count == 4:
+        tiles = [ 
+            11, 12, 13, 14, (51), 16, 17, 18, 19,
+            21, 22, 23, 24, (52), 26, 27, 28, 29,
+            31, 32, 33, 34, (53), 36, 37, 38, 39,
+            41, 42, 43, 44, 45,   46, 47,
+            11, 12, 13, 14, 15,   16, 17, 18, 19,
+            21, 22, 23, 24, (52), 26, 27, 28, 29,
+            31, 32, 33, 34, 35,   36, 37, 38, 39,
+            41, 42, 43, 44, 45,   46, 47,
+            11, 12, 13, 14, 15,   16, 17, 18, 19,
+            21, 22, 23, 24, 25,   26, 27, 28, 29,
+            31, 32, 33, 34, 35,   36, 37, 38, 39,
+            41, 42, 43, 44, 45,   46, 47,
+            11, 12, 13, 14, 15,   16, 17, 18, 19,
+            21, 22, 23, 24, 25,   26, 27, 28, 29,
+            31, 32, 33, 34, 35,   36, 37, 38, 39,
+            41, 42, 43, 44, 45,   46, 47
+        ]
+    elif player_count == 3:
+        raise NotImplementedError("3-player wall generation is not implemented yet.")
+    else:
+        raise Exception("Invalid redDora count: {}".format(ruleset.get_rule("redDora")))
+    return tiles
+
 class Wall(Deck):
     '''
     Class: Wall
@@ -573,7 +667,7 @@ class Wall(Deck):
     replacements = None
     mountain = None
 
-    def __init__(self, ruleset: Ruleset, random_seed: int = None, tiles: list or str or None = None, from_file: str or None = None):
+    def __init__(self, ruleset: Ruleset, random_seed: int = None, tiles: list or str or None = None, from_file: str or None = None, rng: random.Random = None):
         '''
         Constructor: __init__
 
@@ -586,17 +680,26 @@ class Wall(Deck):
         - `ruleset`: `Ruleset`
             The ruleset to use. The wall will be initialized accordingly.
         - `random_seed`: `int` or `None` (optional, default: `None`)
-            A seed for the random number generator. If no seed is given, the
-            current time is used. **Will be ignored if `tiles` is given.**
+            A seed for the random number generator of this wall. If no seed
+            is given, a seed is drawn from the operating system and kept in
+            `self.random_seed`. **Will be ignored if `tiles` is given.**
         - `tiles`: `list` or `str` or `None` (optional, default: `None`)
             A list of tiles or a string that represents a list of tiles. A
             random shuffle of the tiles will only be performed if this
             parameter is not provided.
+        - `rng`: `random.Random` or `None` (optional, default: `None`)
+            A generator to shuffle with instead of a new one seeded with
+            `random_seed`, e.g. to deal several walls from one stream.
 
         ## Details
 
         In fact, only the `redDora` and `players` property of the ruleset is
         used in wall generation.
+
+        Every wall shuffles with its own `random.Random`, so the global
+        `random` module is neither used nor reseeded, and concurrent games
+        cannot disturb each other. Use `spawn_seeds()` to derive independent
+        seeds for many walls or workers.
         
         ## Examples
 
@@ -620,76 +723,15 @@ class Wall(Deck):
         assert isinstance(ruleset, Ruleset), "Invalid ruleset, expected `Ruleset` object."
         self.ruleset = ruleset
         if tiles is None and from_file is None:
-            # Set random seed
-            random_seed = random_seed if random_seed is not None else int(time.time())
-            random.seed(random_seed)
+            # Set up the random number generator of this wall
+            if rng is None:
+                random_seed = random_seed if random_seed is not None else int.from_bytes(os.urandom(8), "little")
+                rng = random.Random(random_seed)
             self.random_seed = random_seed
             # Parse ruleset to get a valid tile set
-            red_dora = int(ruleset.get_rule("redDora"))
-            player_count = int(ruleset.get_rule("players"))
-            if red_dora == 0 and player_count == 4:
-                tiles = [ 
-                    11, 12, 13, 14, 15, 16, 17, 18, 19,
-                    21, 22, 23, 24, 25, 26, 27, 28, 29,
-                    31, 32, 33, 34, 35, 36, 37, 38, 39,
-                    41, 42, 43, 44, 45, 46, 47,
-                    11, 12, 13, 14, 15, 16, 17, 18, 19,
-                    21, 22, 23, 24, 25, 26, 27, 28, 29,
-                    31, 32, 33, 34, 35, 36, 37, 38, 39,
-                    41, 42, 43, 44, 45, 46, 47,
-                    11, 12, 13, 14, 15, 16, 17, 18, 19,
-                    21, 22, 23, 24, 25, 26, 27, 28, 29,
-                    31, 32, 33, 34, 35, 36, 37, 38, 39,
-                    41, 42, 43, 44, 45, 46, 47,
-                    11, 12, 13, 14, 15, 16, 17, 18, 19,
-                    21, 22, 23, 24, 25, 26, 27, 28, 29,
-                    31, 32, 33, 34, 35, 36, 37, 38, 39,
-                    41, 42, 43, 44, 45, 46, 47
-                ]
-            elif red_dora == 3 and player_count == 4:
-                tiles = [ 
-                    11, 12, 13, 14, (51), 16, 17, 18, 19,
-                    21, 22, 23, 24, (52), 26, 27, 28, 29,
-                    31, 32, 33, 34, (53), 36, 37, 38, 39,
-                    41, 42, 43, 44, 45,   46, 47,
-                    11, 12, 13, 14, 15,   16, 17, 18, 19,
-                    21, 22, 23, 24, 25,   26, 27, 28, 29,
-                    31, 32, 33, 34, 35,   36, 37, 38, 39,
-                    41, 42, 43, 44, 45,   46, 47,
-                    11, 12, 13, 14, 15,   16, 17, 18, 19,
-                    21, 22, 23, 24, 25,   26, 27, 28, 29,
-                    31, 32, 33, 34, 35,   36, 37, 38, 39,
-                    41, 42, 43, 44, 45,   46, 47,
-                    11, 12, 13, 14, 15,   16, 17, 18, 19,
-                    21, 22, 23, 24, 25,   26, 27, 28, 29,
-                    31, 32, 33, 34, 35,   36, 37, 38, 39,
-                    41, 42, 43, 44, 45,   46, 47
-                ]
-            elif red_dora == 4 and player_count == 4:
-                tiles = [ 
-                    11, 12, 13, 14, (51), 16, 17, 18, 19,
-                    21, 22, 23, 24, (52), 26, 27, 28, 29,
-                    31, 32, 33, 34, (53), 36, 37, 38, 39,
-                    41, 42, 43, 44, 45,   46, 47,
-                    11, 12, 13, 14, 15,   16, 17, 18, 19,
-                    21, 22, 23, 24, (52), 26, 27, 28, 29,
-                    31, 32, 33, 34, 35,   36, 37, 38, 39,
-                    41, 42, 43, 44, 45,   46, 47,
-                    11, 12, 13, 14, 15,   16, 17, 18, 19,
-                    21, 22, 23, 24, 25,   26, 27, 28, 29,
-                    31, 32, 33, 34, 35,   36, 37, 38, 39,
-                    41, 42, 43, 44, 45,   46, 47,
-                    11, 12, 13, 14, 15,   16, 17, 18, 19,
-                    21, 22, 23, 24, 25,   26, 27, 28, 29,
-                    31, 32, 33, 34, 35,   36, 37, 38, 39,
-                    41, 42, 43, 44, 45,   46, 47
-                ]
-            elif player_count == 3:
-                raise NotImplementedError("3-player wall generation is not implemented yet.")
-            else:
-                raise Exception("Invalid redDora count: {}".format(ruleset.get_rule("redDora")))
+            tiles = get_wall_tile_ids(ruleset)
             # Shuffle
-            random.shuffle(tiles)
+            rng.shuffle(tiles)
             # Create wall
             self.tiles = self.parse_list(tiles)
             self.game_split()
@@ -824,3 +866,24 @@ class Wall(Deck):
         import json
         with open(filename, "w") as f:
             json.dump([t.get_id() for t in self.tiles], f)
+
+def spawn_seeds(seed: int, count: int) -> list:
+    '''
+    Function: spawn_seeds()
+
+    ## Description
+
+    Derives `count` statistically independent wall seeds from one root seed,
+    using NumPy's `SeedSequence.spawn()`. The same root seed always gives the
+    same seeds, so a large batch of games (or one batch per worker) is
+    reproducible from a single number.
+
+    ## Examples
+
+    ```python
+    >>> seeds = spawn_seeds(2022, 1000)
+    >>> walls = [Wall(ruleset, random_seed=seed) for seed in seeds]
+    ```
+    '''
+    from numpy.random import SeedSequence
+    return [int(child.generate_state(1, dtype="uint64")[0]) for child in SeedSequence(seed).spawn(count)]
@@ -0,0 +1,158 @@
+'''
+File: discards.py
+Author: Kunologist
+Description:
+    Per-seat sets of discarded tiles, kept as 34-bit integers (bit `i` is
+    the tile of 34-index `i`) by the game engine, for furiten checks and
+    safe tile (genbutsu) queries.
+'''
+
+from env.meld import get_index
+
+def get_bits(indices) -> int:
+    '''
+    Function: get_bits()
+
+    ## Description
+
+    Returns the set of 34-indices as a 34-bit integer.
+    '''
+    bits = 0
+    for index in indices:
+        bits |= 1 << index
+    return bits
+
+def get_indices(bits: int) -> list:
+    '''
+    Function: get_indices()
+
+    ## Description
+
+    Returns the 34-indices in a 34-bit integer, in increasing order.
+    '''
+    return [index for index in range(34) if bits >> index & 1]
+
+def is_furiten(obs: dict, waits) -> bool:
+    '''
+    Function: is_furiten()
+
+    ## Description
+
+    Checks whether the player of an observation is furiten for its wait
+    set: it discarded one of its waits, passed one since its last turn,
+    or passed one after its reach.
+
+    ## Parameters
+
+    - `obs`: `dict`
+        The observation, with the `"safe_bits"` and `"passed_bits"` of
+        `MahjongGame.get_observation()`. Observations without them are
+        never furiten.
+    - `waits`: iterable of `int`
+        The 34-indices of the waits, see `get_waits_counts()`.
+
+    ## Returns
+
+    `bool`
+    '''
+    safe_bits = obs.get("safe_bits")
+    if safe_bits is None:
+        return False
+    return get_bits(waits) & (safe_bits[obs["player_idx"]] | obs.get("passed_bits", 0)) != 0
+
+class DiscardIndex:
+    '''
+    Class: DiscardIndex
+
+    ## Description
+
+    The discards of every seat as 34-bit integers.
+
+    ## Details
+
+    - `discarded[seat]`: the tiles the seat discarded
+    - `since_reach[seat]`: the tiles the other seats discarded after the
+      reach of the seat, which it passed
+    - `passed[seat]`: the tiles the seat passed since its last turn
+
+    A tile is passed once every other seat had the chance to claim it,
+    see `pass_tile()`, so a discard is not furiten for its own claims.
+    The tiles safe against a seat are `discarded | since_reach`.
+    `version` changes whenever `discarded` or `since_reach` do.
+    '''
+    __slots__ = ["discarded", "since_reach", "passed", "reach", "version"]
+
+    def __init__(self, players: int = 4):
+        '''
+        Constructor: __init__
+
+        ## Parameters
+
+        - `players`: `int`
+            The number of players.
+        '''
+        self.discarded = [0] * players
+        self.since_reach = [0] * players
+        self.passed = [0] * players
+        self.reach = [False] * players
+        self.version = 0
+
+    def discard(self, seat: int, tile):
+        '''
+        Method: discard()
+
+        ## Description
+
+        A seat discards a tile.
+        '''
+        self.discarded[seat] |= 1 << get_index(tile.get_id())
+        self.version += 1
+
+    def pass_tile(self, seat: int, tile, seats: list = None):
+        '''
+        Method: pass_tile()
+
+        ## Description
+
+        The seats other than `seat` passed the tile it discarded, or added
+        to a kan. `seats` restricts the seats that passed the tile to the
+        ones that could have won on it, e.g. upon an ankan.
+        '''
+        bit = 1 << get_index(tile.get_id())
+        for other in range(len(self.passed)) if seats is None else seats:
+            if other != seat:
+                self.passed[other] |= bit
+                if self.reach[other]:
+                    self.since_reach[other] |= bit
+                    self.version += 1
+
+    def declare_reach(self, seat: int):
+        '''
+        Method: declare_reach()
+
+        ## Description
+
+        A seat declares reach. Its passed tiles count from now on.
+        '''
+        self.reach[seat] = True
+
+    def turn(self, seat: int):
+        '''
+        Method: turn()
+
+        ## Description
+
+        The turn of a seat starts, which ends its temporary furiten.
+        '''
+        self.passed[seat] = 0
+
+    def get_safe(self, seat: int) -> int:
+        '''
+        Method: get_safe()
+
+        ## Description
+
+        Returns the tiles a seat cannot win on by ron from now on, i.e.
+        the tiles safe against it.
+        '''
+        return self.discarded[seat] | self.since_reach[seat]
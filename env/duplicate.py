@@ -0,0 +1,247 @@
+'''
+File: duplicate.py
+Author: Kunologist
+Description:
+    Duplicate evaluation of agents: every wall of a fixed set is played
+    under all seat rotations, so the luck of the wall cancels out of the
+    score differences between agents.
+'''
+
+import io
+import json
+import math
+import random
+import logging
+import traceback
+import contextlib
+import statistics
+
+from env.deck import Wall
+from env.mahjong import MahjongGame, MahjongEndGame, MahjongRuleError
+from env.player import Player
+from env.ruleset import Ruleset
+from env.wall_bank import WallBank
+from env.workers import make_pool
+
+logger = logging.getLogger(__name__)
+
+def load_walls(walls) -> list:
+    '''
+    Function: load_walls()
+
+    ## Description
+
+    Normalizes a wall set to a list of lists of tile IDs.
+
+    ## Parameters
+
+    - `walls`: `WallBank`, `str` or `list`
+        A bank, the path of a saved bank (`.npy`), or a list whose items
+        are `Wall`s, lists of tile IDs, or paths of files written by
+        `Wall.save_tiles()`.
+
+    ## Returns
+
+    `list`
+    '''
+    if isinstance(walls, str):
+        walls = WallBank.load(walls)
+    if isinstance(walls, WallBank):
+        return [walls.walls[i].tolist() for i in range(len(walls))]
+    result = []
+    for wall in walls:
+        if isinstance(wall, Wall):
+            result.append([tile.get_id() for tile in wall.tiles])
+        elif isinstance(wall, str):
+            with open(wall, "r") as f:
+                result.append(json.load(f))
+        else:
+            result.append([int(id) for id in wall])
+    return result
+
+def play_wall(ruleset: Ruleset, ids: list, agents: list, lineup: list, seed: int) -> list:
+    '''
+    Function: play_wall()
+
+    ## Description
+
+    Plays one wall under every rotation of `lineup`. Seat `s` of rotation
+    `r` is taken by agent `lineup[(s + r) % 4]`. Before every rotation,
+    the agent of lineup entry `k` is given its own `random.Random`
+    (`agent.random`) seeded from `seed` and `k`, so every agent sees the
+    same random stream on the same wall, whatever its seat. The global
+    `random` module is left alone.
+
+    ## Returns
+
+    `list`
+        One dict per rotation with the agent of every seat (`seats`), the
+        credit changes (`credits`), the end reason (`reason`) and the
+        exception that aborted the game (`error`, `"Type: message"`, or
+        `None`). Aborted games have the reason `"error"` and no credit
+        changes; their traceback is logged.
+    '''
+    results = []
+    players = len(lineup)
+    for rotation in range(players):
+        seats = [lineup[(seat + rotation) % players] for seat in range(players)]
+        game = MahjongGame(ruleset, wall=Wall(ruleset, tiles=ids))
+        for seat in range(players):
+            agent = agents[seats[seat]]()
+            agent.random = random.Random(seed * players + (seat + rotation) % players)
+            game.set_player(seat, Player(agent.name, agent=agent))
+        credits = [0] * players
+        reason = "error"
+        error = None
+        with contextlib.redirect_stdout(io.StringIO()):
+            try:
+                game.play()
+            except MahjongEndGame:
+                credits = list(game.state["end_game"]["credits"])
+                reason = game.state["end_game"]["reason"]
+            except Exception as e:
+                # str() of a MahjongRuleError dumps the game state, which
+                # must not abort the evaluation: its message is used instead
+                error = "{}: {}".format(type(e).__name__, e.message if isinstance(e, MahjongRuleError) else e)
+                logger.error("Game aborted on the wall of seed %d, rotation %d: %s\n%s", seed, rotation, error, "".join(traceback.format_tb(e.__traceback__)))
+        results.append({"seats": seats, "credits": credits, "reason": reason, "error": error})
+    return results
+
+def _play_task(args):
+    return play_wall(*args)
+
+def _interval(values: list, z: float) -> dict:
+    n = len(values)
+    mean = statistics.fmean(values) if n > 0 else 0.0
+    stderr = statistics.stdev(values) / math.sqrt(n) if n > 1 else float("inf")
+    return {"mean": mean, "stderr": stderr, "ci": [mean - z * stderr, mean + z * stderr]}
+
+def summarize(results: list, agent_count: int, confidence: float = 0.95, baseline: int = 0) -> dict:
+    '''
+    Function: summarize()
+
+    ## Description
+
+    Aggregates the results of `play_wall()` over a set of walls.
+
+    ## Parameters
+
+    - `results`: `list`
+        One list of rotation results per wall.
+    - `agent_count`: `int`
+        The number of agents.
+    - `confidence`: `float`
+        The confidence level of the intervals.
+    - `baseline`: `int`
+        The agent the others are compared with.
+
+    ## Returns
+
+    `dict`
+        - `walls`, `games`, `errors`, `reasons`
+        - `error_types`: the number of aborted games per exception type.
+        - `agents`: per agent, the mean credit change per game and its
+          confidence interval over walls.
+        - `differences`: per agent, the mean per-wall difference to the
+          baseline, its confidence interval, and the standard error an
+          unpaired comparison of the same games would have.
+    '''
+    z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+    per_wall = [[] for _ in range(agent_count)]
+    reasons = {}
+    error_types = {}
+    games = 0
+    for wall_results in results:
+        totals = [0.0] * agent_count
+        counts = [0] * agent_count
+        for result in wall_results:
+            games += 1
+            reasons[result["reason"]] = reasons.get(result["reason"], 0) + 1
+            if result.get("error") is not None:
+                error_type = result["error"].split(":")[0]
+                error_types[error_type] = error_types.get(error_type, 0) + 1
+            for seat, agent in enumerate(result["seats"]):
+                totals[agent] += result["credits"][seat]
+                counts[agent] += 1
+        for agent in range(agent_count):
+            per_wall[agent].append(totals[agent] / counts[agent] if counts[agent] > 0 else 0.0)
+    differences = []
+    for agent in range(agent_count):
+        if agent == baseline:
+            continue
+        paired = [a - b for a, b in zip(per_wall[agent], per_wall[baseline])]
+        difference = _interval(paired, z)
+        difference["agent"] = agent
+        difference["baseline"] = baseline
+        if len(paired) > 1:
+            difference["unpaired_stderr"] = math.sqrt((statistics.variance(per_wall[agent]) + statistics.variance(per_wall[baseline])) / len(paired))
+        else:
+            difference["unpaired_stderr"] = float("inf")
+        differences.append(difference)
+    return {
+        "walls": len(results),
+        "games": games,
+        "errors": reasons.get("error", 0),
+        "reasons": reasons,
+        "error_types": error_types,
+        "confidence": confidence,
+        "agents": [_interval(per_wall[agent], z) for agent in range(agent_count)],
+        "differences": differences
+    }
+
+def evaluate(agents: list, walls, ruleset: Ruleset = None, lineup: list = None, processes: int = None, seed: int = 0, confidence: float = 0.95) -> dict:
+    '''
+    Function: evaluate()
+
+    ## Description
+
+    Plays every wall under all seat rotations of the agents, in a process
+    pool, and summarizes the score differences between the agents.
+
+    ## Parameters
+
+    - `agents`: `list`
+        Zero-argument callables creating the agents under test, e.g.
+        classes or `functools.partial` objects. They must be picklable
+        when `processes` is not `1`.
+    - `walls`: `WallBank`, `str` or `list`
+        The wall set, see `load_walls()`.
+    - `ruleset`: `Ruleset` or `None`
+        Defaults to `Ruleset()`.
+    - `lineup`: `list` or `None`
+        The agent of every seat before rotation. Defaults to
+        `[0, 1, 2, 3]` for four agents and `[0, 1, 0, 1]` for two.
+    - `processes`: `int` or `None`
+        The size of the process pool, `None` for one per CPU. `1` plays in
+        the current process. See `env.workers.make_pool()`.
+    - `seed`: `int`
+        Seeds the random streams of the agents, one per wall.
+    - `confidence`: `float`
+        The confidence level of the intervals.
+
+    ## Returns
+
+    `dict`
+        See `summarize()`.
+
+    ## Examples
+
+    ```python
+    >>> bank = WallBank.generate(Ruleset(), 200, seed=1)
+    >>> report = evaluate([partial(Agent, "random"), partial(AgentAgari, "agari")], bank)
+    >>> report["differences"][0]["ci"]
+    ```
+    '''
+    ruleset = ruleset if ruleset is not None else Ruleset()
+    players = ruleset.get_rule("players")
+    if lineup is None:
+        assert players % len(agents) == 0, "Cannot seat {} agents at {} seats, give a lineup".format(len(agents), players)
+        lineup = [seat % len(agents) for seat in range(players)]
+    assert len(lineup) == players, "Invalid lineup, expected {} seats".format(players)
+    tasks = [(ruleset, ids, agents, lineup, seed + i) for i, ids in enumerate(load_walls(walls))]
+    if processes == 1:
+        results = [_play_task(task) for task in tasks]
+    else:
+        with make_pool(processes) as pool:
+            results = list(pool.map(_play_task, tasks))
+    return summarize(results, len(agents), confidence)
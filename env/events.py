@@ -0,0 +1,197 @@
+'''
+File: events.py
+Author: Kunologist
+Description:
+    Per-seat event deltas emitted by the game, and a tracker that rebuilds
+    full observations from them.
+'''
+
+from env.deck import Deck
+from env.meld import Meld
+from env.tiles import Tile
+from env.river import FLAG_TSUMOGIRI, FLAG_REACH, FLAG_CALLED
+
+# Small, per-decision values that travel with every delta observation
+DELTA_KEYS = [
+    "active_player", "player_idx", "player_state", "incoming_tile", "is_ankan",
+    "tiles_left", "credits", "reach", "ippatsu", "wind", "wind_e", "repeat", "unseen",
+    "discard_bits", "safe_bits", "passed_bits", "tenpai", "rinshan"
+]
+
+def make_delta(obs: dict) -> dict:
+    '''
+    Function: make_delta()
+
+    ## Description
+
+    Strips an observation of a game created with `stream_events=True` down
+    to its delta: the events since the previous observation of the seat and
+    the small per-decision values. Discards, calls, dora indicators and the
+    hand are left out; an `ObservationTracker` rebuilds them.
+
+    ## Parameters
+
+    - `obs`: `dict`
+        An observation returned by `MahjongGame.get_observation()`.
+
+    ## Returns
+
+    `dict`
+        The delta observation. Tiles are given by their IDs.
+    '''
+    delta = {"events": obs["events"]}
+    for key in DELTA_KEYS:
+        if key in obs:
+            delta[key] = obs[key]
+    if delta.get("incoming_tile") is not None:
+        delta["incoming_tile"] = delta["incoming_tile"].get_id()
+    return delta
+
+class ObservationTracker:
+    '''
+    Class: ObservationTracker
+
+    ## Description
+
+    Maintains the view of one seat from the events of its delta
+    observations, and rebuilds full observations on demand.
+
+    ## Details
+
+    The following events are emitted by `MahjongGame` (tiles are IDs):
+
+    - `{"type": "start", "player_idx", "hand", "dora_indicators", "players"}`
+        A new game. `player_idx` and `hand` are the receiving seat and its
+        starting hand.
+    - `{"type": "draw", "player_idx", "tile"}`
+        `tile` is only present for the drawing seat.
+    - `{"type": "discard", "player_idx", "tile", "tsumogiri"}`
+        `tsumogiri` is `True` if the drawn tile was discarded.
+    - `{"type": "call", "player_idx", "call", "meld", "call_idx", "hand"}`
+        The call replaces the call at `call_idx` (kakan) or is appended.
+        `meld` holds the `type`, `tiles`, `from_seat` and `called` of the
+        `Meld`. `hand` is only present for the calling seat.
+    - `{"type": "dora", "tile"}`
+        A new dora indicator.
+    - `{"type": "reach", "player_idx"}`
+
+    ## Examples
+
+    ```python
+    >>> tracker = ObservationTracker()
+    >>> obs = tracker.update(make_delta(game_obs))
+    ```
+    '''
+
+    def __init__(self):
+        self.player_idx = None
+        self.hand = []
+        self.drawn_tile = None
+        self.dora_indicators = []
+        self.discarded_tiles = []
+        self.river_flags = []
+        self.reach = None
+        self.last_discarder = None
+        self.calls = []
+        self.melds = []
+
+    def apply(self, event: dict):
+        '''
+        Method: apply()
+
+        ## Description
+
+        Applies a single event to the view.
+        '''
+        event_type = event["type"]
+        if event_type == "start":
+            self.player_idx = event["player_idx"]
+            self.hand = list(event["hand"])
+            self.drawn_tile = None
+            self.dora_indicators = list(event["dora_indicators"])
+            self.discarded_tiles = [[] for _ in range(event["players"])]
+            self.river_flags = [[] for _ in range(event["players"])]
+            self.reach = None
+            self.last_discarder = None
+            self.calls = [[] for _ in range(event["players"])]
+            self.melds = [[] for _ in range(event["players"])]
+        elif event_type == "draw":
+            if "tile" in event:
+                self.drawn_tile = event["tile"]
+        elif event_type == "discard":
+            self.discarded_tiles[event["player_idx"]].append(event["tile"])
+            flags = FLAG_TSUMOGIRI if event["tsumogiri"] else 0
+            if self.reach == event["player_idx"]:
+                flags |= FLAG_REACH
+                self.reach = None
+            self.river_flags[event["player_idx"]].append(flags)
+            self.last_discarder = event["player_idx"]
+            if event["player_idx"] == self.player_idx:
+                if not event["tsumogiri"]:
+                    self.hand.remove(event["tile"])
+                    if self.drawn_tile is not None:
+                        self.hand.append(self.drawn_tile)
+                self.drawn_tile = None
+        elif event_type == "call":
+            calls = self.calls[event["player_idx"]]
+            melds = self.melds[event["player_idx"]]
+            if "meld" in event:
+                fields = event["meld"]
+                meld = Meld(fields["type"], fields["tiles"], fields["from_seat"], fields["called"], event["call"])
+            else:
+                meld = Meld.from_string(event["call"], event["player_idx"], players=len(self.calls))
+            if event["call_idx"] < len(calls):
+                calls[event["call_idx"]] = event["call"]
+                melds[event["call_idx"]] = meld
+            else:
+                calls.append(event["call"])
+                melds.append(meld)
+                # Chii, pon and minkan take the last discard
+                if "a" not in event["call"] and self.last_discarder is not None:
+                    self.river_flags[self.last_discarder][-1] |= FLAG_CALLED
+                    self.last_discarder = None
+            if "hand" in event:
+                self.hand = list(event["hand"])
+                self.drawn_tile = None
+        elif event_type == "dora":
+            self.dora_indicators.append(event["tile"])
+        elif event_type == "reach":
+            self.reach = event["player_idx"]
+        else:
+            raise ValueError("Unknown event type {}".format(event_type))
+
+    def update(self, delta: dict) -> dict:
+        '''
+        Method: update()
+
+        ## Description
+
+        Applies the events of a delta observation and returns the full
+        observation, in the format of `MahjongGame.get_observation()`.
+        '''
+        for event in delta["events"]:
+            self.apply(event)
+        return self.get_observation(delta)
+
+    def get_observation(self, delta: dict) -> dict:
+        '''
+        Method: get_observation()
+
+        ## Description
+
+        Builds the full observation from the current view and the
+        per-decision values of `delta`.
+        '''
+        obs = {}
+        for key in DELTA_KEYS:
+            if key in delta:
+                obs[key] = delta[key]
+        obs["hand"] = Deck(self.hand, sort=True)
+        obs["dora_indicators"] = [Tile(id) for id in self.dora_indicators]
+        obs["discarded_tiles"] = [[Tile(id) for id in discards] for discards in self.discarded_tiles]
+        obs["river_flags"] = [list(flags) for flags in self.river_flags]
+        obs["calls"] = [list(calls) for calls in self.calls]
+        obs["melds"] = [list(melds) for melds in self.melds]
+        if obs.get("incoming_tile") is not None:
+            obs["incoming_tile"] = Tile(obs["incoming_tile"])
+        return obs
@@ -1,57 +1,193 @@
-from env.agent import Agent
-import os
+'''
+File: flask_agent.py
+Author: Kunologist
+Description:
+    An agent that forwards every decision to a remote action server. The
+    agent keeps one persistent HTTP connection open to the server, so that
+    a decision only costs a couple of round trips.
+'''
+
+import json
+import uuid
 import time
+import warnings
 import requests
-import json
+from requests.adapters import HTTPAdapter
+
+from env.agent import Agent
+from env.events import make_delta
+from env.wire import ObservationEncoder, pack_decision
 
 class FlaskAgent(Agent):
     '''
     Class: FlaskAgent
+
+    ## Description
+
+    An agent that posts the observation to an action server (see
+    `server/flask_app.py` and `env/local_server.py`) and waits for the
+    action to be submitted there.
+
+    ## Details
+
+    Each decision is keyed by the table id, the seat and a unique
+    `decision_id`, so one server can host many tables. The observation is
+    posted to `/observation_update`, then the agent long-polls
+    `/action_wait` with the same `decision_id` until the server answers with
+    the index of the selected action. Replies carrying another decision id
+    are rejected, so a late answer can never be applied to the wrong
+    decision.
+
+    All requests share one `requests.Session`, which keeps the underlying
+    connection alive between decisions.
     '''
+    concurrent = True
+
+    def __init__(self, name, path: str = None, *, timeout: float = 60, server: str = "http://localhost:10317/", poll_interval: float = 10, pool_size: int = 1, table_id: str = "0", decision_timeout: float or None = None, wire: str = "json"):
+        '''
+        Constructor: __init__
 
-    def __init__(self, name, path: str, timeout: int = 60, server: str = "http://localhost:10317/"):
+        ## Description
+
+        The constructor of the FlaskAgent class.
+
+        ## Parameters
+
+        - `name`: `str`
+            The name of the agent.
+        - `path`: `str`
+            Deprecated and ignored. The agent used to exchange actions
+            through a file at this path; it now waits on the server.
+        - `timeout`: `float`
+            Seconds to wait for an action before giving up.
+        - `server`: `str`
+            The base url of the action server.
+        - `poll_interval`: `float`
+            Seconds a single long-poll request may be held by the server.
+        - `pool_size`: `int`
+            The number of connections kept alive to the server.
+        - `table_id`: `str`
+            The table this agent plays at. The seat is taken from the
+            observation.
+        - `decision_timeout`: `float` or `None`
+            Seconds after which the server applies the default action. Uses
+            the server default if `None`.
+        - `wire`: `str`
+            `"json"` posts the observation as json, `"binary"` uses the
+            compact encoding of `env/wire.py`, `"delta"` posts only the
+            events since the previous decision of the seat, as json. The
+            delta format requires a game created with `stream_events=True`.
+
+        All parameters but `name` are keyword-only.
+        '''
         super(FlaskAgent, self).__init__(name)
-        self.path = path
+        if path is not None:
+            warnings.warn("FlaskAgent no longer exchanges actions through a file, the path {} is ignored".format(path), DeprecationWarning, stacklevel=2)
         self.timeout = timeout
-        self.server = server
-        # Make sure the path exists
-        # If path is relative path then make it absolute
-        if not os.path.isabs(self.path):
-            self.path = os.path.join(os.path.dirname(os.path.realpath(__file__)), self.path)
-        # Make sure the path exists
-        if not os.path.exists(os.path.dirname(self.path)):
-            os.makedirs(os.path.dirname(self.path))
+        self.poll_interval = poll_interval
+        self.table_id = str(table_id)
+        self.decision_timeout = decision_timeout
+        assert wire in ["json", "binary", "delta"], "Invalid wire format {}, expected json, binary or delta".format(wire)
+        self.wire = wire
+        self.encoder = ObservationEncoder()
+        self.server = server if server.endswith("/") else server + "/"
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
 
     def query(self, obs, action_space):
-        observation = obs
-        action_space = action_space
-        ret = requests.post(self.server + "observation_update", json={
-            "observation": json.dumps(observation, default=lambda o: o.to_json()),
-            "file": self.path,
-            "action_space": json.dumps(action_space, default=lambda o: o.to_json()),
-        })
+        '''
+        Method: query()
+
+        ## Description
+
+        Sends the observation to the server and returns the action selected
+        there.
+
+        ## Parameters
+
+        - `obs`: `dict`
+            The observation of the game.
+        - `action_space`: `list`
+            All possible actions.
+
+        ## Returns
+
+        `Action`
+            The selected action.
+        '''
+        decision_id = uuid.uuid4().hex
+        seat = obs["player_idx"]
+        if self.wire == "binary":
+            params = {
+                "table_id": self.table_id,
+                "seat": seat,
+                "decision_id": decision_id
+            }
+            if self.decision_timeout is not None:
+                params["timeout"] = self.decision_timeout
+            ret = self.session.post(self.server + "observation_update", params=params,
+                data=pack_decision(self.encoder, obs, action_space),
+                headers={"Content-Type": "application/octet-stream"}
+            )
+        elif self.wire == "delta":
+            if "events" not in obs:
+                raise Exception("Delta observations require a game created with stream_events=True")
+            ret = self.session.post(self.server + "observation_update", json={
+                "table_id": self.table_id,
+                "seat": seat,
+                "decision_id": decision_id,
+                "timeout": self.decision_timeout,
+                "delta": json.dumps(make_delta(obs)),
+                "action_space": json.dumps(action_space, default=lambda o: o.to_json()),
+            })
+        else:
+            ret = self.session.post(self.server + "observation_update", json={
+                "table_id": self.table_id,
+                "seat": seat,
+                "decision_id": decision_id,
+                "timeout": self.decision_timeout,
+                "observation": json.dumps(obs, default=lambda o: o.to_json()),
+                "action_space": json.dumps(action_space, default=lambda o: o.to_json()),
+            })
         try:
             isSuccess = ret.json()["success"]
         except:
             isSuccess = False
         if not isSuccess:
             raise Exception("Error when posting observation to server")
-        # Remove the file
-        if os.path.exists(self.path):
-            os.remove(self.path)
-        # Wait for the file to be created
+        # Long-poll for the action
         t = time.time()
-        while not os.path.exists(self.path):
-            if time.time() - t > self.timeout:
+        while True:
+            remaining = self.timeout - (time.time() - t)
+            if remaining <= 0:
                 raise Exception("Timeout")
-            time.sleep(0.9)
-        # Read the file
-        time.sleep(0.1)
-        with open(self.path, "r") as f:
-            action = f.read()
-            try:
-                action = int(action)
-            except:
-                raise Exception("Action is not an integer")
-        raise Exception("Action receive: " + str(action))
+            wait = min(self.poll_interval, remaining)
+            ret = self.session.get(self.server + "action_wait", params={
+                "table_id": self.table_id,
+                "seat": seat,
+                "decision_id": decision_id,
+                "timeout": wait
+            }, timeout=wait + 5)
+            reply = ret.json()
+            if reply.get("pending"):
+                continue
+            if not reply.get("success"):
+                raise Exception("Error when waiting for action: {}".format(reply.get("error")))
+            if reply.get("decision_id") != decision_id:
+                raise Exception("Action reply for decision {} does not match decision {}".format(reply.get("decision_id"), decision_id))
+            action = reply["action"]
+            if not isinstance(action, int) or action < 0 or action >= len(action_space):
+                raise Exception("Action index {} out of range".format(action))
+            return action_space[action]
+
+    def close(self):
+        '''
+        Method: close()
+
+        ## Description
 
+        Closes the connections to the server.
+        '''
+        self.session.close()
@@ -0,0 +1,251 @@
+'''
+File: local_server.py
+Author: Kunologist
+Description:
+    A light-weight, in-process stand-in for the flask action server. It
+    speaks the same protocol as `server/flask_app.py` and is used to test
+    remote agents without running flask.
+'''
+
+import json
+import struct
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from env.decision_board import DecisionBoard
+from env.events import ObservationTracker
+from env.wire import ObservationDecoder, unpack_decision
+
+class LocalAgentServer:
+    '''
+    Class: LocalAgentServer
+
+    ## Description
+
+    An action server running in a background thread. Observations posted
+    by a `FlaskAgent` are stored in a `DecisionBoard` under their
+    `(table_id, seat, decision_id)` key, and actions can either be produced
+    right away by a `responder`, or submitted later through the board (or
+    `GET /action_submit`).
+
+    ## Examples
+
+    ```python
+    >>> server = LocalAgentServer(responder=lambda obs, action_space: 0)
+    >>> agent = FlaskAgent("remote", server=server.start())
+    >>> server.stop()
+    ```
+    '''
+
+    def __init__(self, responder = None, host: str = "localhost", port: int = 0, board: DecisionBoard = None):
+        '''
+        Constructor: __init__
+
+        ## Description
+
+        The constructor of the LocalAgentServer class.
+
+        ## Parameters
+
+        - `responder`: `callable` or `None`
+            Called as `responder(observation, action_space)` with the decoded
+            json payloads when an observation arrives. Should return the
+            index of the selected action. If `None`, actions must be
+            submitted manually.
+        - `host`: `str`
+            The host to bind.
+        - `port`: `int`
+            The port to bind. `0` picks a free port.
+        - `board`: `DecisionBoard` or `None`
+            The board holding the pending decisions. A fresh board without
+            timeout is created if not given.
+        '''
+        self.responder = responder
+        self.host = host
+        self.port = port
+        self.board = board if board is not None else DecisionBoard()
+        self.connections = 0
+        self.decoders = {}
+        self.trackers = {}
+        self.lock = threading.Lock()
+        self.httpd = None
+        self.thread = None
+        if responder is not None:
+            self.board.add_listener(
+                lambda decision: self.board.submit(*decision.key, responder(decision.observation, decision.action_space))
+            )
+
+    def start(self) -> str:
+        '''
+        Method: start()
+
+        ## Description
+
+        Starts serving in a background thread.
+
+        ## Returns
+
+        `str`
+            The base url of the server.
+        '''
+        self.httpd = ThreadingHTTPServer((self.host, self.port), _make_handler(self))
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self.thread.start()
+        return self.get_url()
+
+    def stop(self):
+        '''
+        Method: stop()
+
+        ## Description
+
+        Stops the server and releases the port.
+        '''
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def decode(self, table_id: str, body: bytes) -> tuple:
+        '''
+        Method: decode()
+
+        ## Description
+
+        Decodes a decision posted in the binary wire format into the same
+        json payloads a json post produces. Every table has its own
+        decoder, which keeps the discards received so far.
+
+        ## Returns
+
+        `tuple`
+            `(observation, action_space)`
+        '''
+        with self.lock:
+            decoder = self.decoders.setdefault(table_id, ObservationDecoder())
+            obs, action_space = unpack_decision(decoder, body)
+        to_json = lambda o: o.to_json()
+        return json.loads(json.dumps(obs, default=to_json)), json.loads(json.dumps(action_space, default=to_json))
+
+    def track(self, table_id: str, seat: int, delta: dict) -> dict:
+        '''
+        Method: track()
+
+        ## Description
+
+        Applies a delta observation to the tracker of the seat and returns
+        the full observation as a json payload.
+        '''
+        with self.lock:
+            tracker = self.trackers.setdefault((table_id, seat), ObservationTracker())
+            obs = tracker.update(delta)
+        return json.loads(json.dumps(obs, default=lambda o: o.to_json()))
+
+    def get_url(self) -> str:
+        '''
+        Method: get_url()
+
+        ## Description
+
+        Returns the base url of the server.
+        '''
+        return "http://{}:{}/".format(self.host, self.port)
+
+def _make_handler(local_server: LocalAgentServer):
+    '''
+    Function: _make_handler()
+
+    ## Description
+
+    Creates a request handler class bound to the given server. The handler
+    speaks HTTP/1.1 so that clients can keep their connection alive.
+    '''
+
+    board = local_server.board
+
+    class Handler(BaseHTTPRequestHandler):
+
+        protocol_version = "HTTP/1.1"
+        # Small json replies must not be held back by Nagle's algorithm
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            with local_server.lock:
+                local_server.connections += 1
+
+        def log_message(self, format, *args):
+            pass
+
+        def reply(self, payload: dict, status: int = 200):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            args = {key: value[0] for key, value in parse_qs(url.query).items()}
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length)
+            if url.path != "/observation_update":
+                return self.reply({"success": False, "error": "Not found"}, 404)
+            try:
+                if self.headers.get("Content-Type") == "application/octet-stream":
+                    key = (args.get("table_id", "0"), int(args["seat"]), args["decision_id"])
+                    timeout = float(args["timeout"]) if "timeout" in args else None
+                    observation, action_space = local_server.decode(key[0], body)
+                else:
+                    req = json.loads(body)
+                    key = (req.get("table_id", "0"), int(req["seat"]), req["decision_id"])
+                    timeout = req.get("timeout")
+                    if "delta" in req:
+                        observation = local_server.track(key[0], key[1], json.loads(req["delta"]))
+                    else:
+                        observation = json.loads(req["observation"])
+                    action_space = json.loads(req["action_space"])
+            except (ValueError, KeyError, IndexError, struct.error):
+                return self.reply({"success": False, "error": "Malformed observation"})
+            if not board.post(*key, observation, action_space, timeout=timeout):
+                return self.reply({"success": False, "error": "Duplicate decision id"})
+            self.reply({"success": True, "decision_id": key[2]})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            args = {key: value[0] for key, value in parse_qs(url.query).items()}
+            try:
+                table_id = args.get("table_id", "0")
+                seat = int(args.get("seat", 0))
+                timeout = float(args.get("timeout", 10))
+            except ValueError:
+                return self.reply({"success": False, "error": "Malformed query"})
+            decision_id = args.get("decision_id")
+            if url.path == "/action_wait":
+                try:
+                    action = board.wait(table_id, seat, decision_id, timeout)
+                except KeyError:
+                    return self.reply({"success": False, "error": "Unknown decision id"})
+                if action is None:
+                    return self.reply({"success": False, "pending": True, "decision_id": decision_id})
+                return self.reply({"success": True, "decision_id": decision_id, "action": action})
+            elif url.path == "/decision_next":
+                decision = board.next_pending(table_id, seat, timeout)
+                if decision is None:
+                    return self.reply({"success": False, "pending": True})
+                return self.reply({"success": True, "decision": decision.to_json()})
+            elif url.path == "/action_submit":
+                try:
+                    action = int(args.get("action"))
+                except (TypeError, ValueError):
+                    return self.reply({"success": False, "error": "Action is not an integer"})
+                if not board.submit(table_id, seat, decision_id, action):
+                    return self.reply({"success": False, "error": "Unknown decision id"})
+                return self.reply({"success": True})
+            return self.reply({"success": False, "error": "Not found"}, 404)
+
+    return Handler
@@ -9,13 +9,33 @@ from env.deck import Deck, Wall
 from env.ruleset import Ruleset
 from env.player import Player
 from env.action import Action
+from env.meld import Meld, get_index
+from env.views import FrozenList, HandView, RiverView
+from env.unseen import UnseenCounter
+from env.discards import DiscardIndex
+from env.river import River, FLAG_TSUMOGIRI, FLAG_REACH, FLAG_CALLED
 from env.tiles import Tile
-from env.utils import get_value
-import random
-import pickle
+from env.yaku import get_situation
+from env.utils import get_value, get_tile_counts, get_waits_batch, may_claim_counts, TILE_INDEX, KOKUSHI_INDICES
+from env.metrics import HAND_LENGTH_BUCKETS
+from time import perf_counter
+from types import MappingProxyType
 import random
 import os
 
+# Priority of the claims on a discard: ron beats pon and kan, which beat chii
+CLAIM_PRIORITY = {"ron": 3, "pon": 2, "mkan": 2, "chii": 1}
+
+# Threads querying concurrent agents, created on first use
+_executor = None
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _executor = ThreadPoolExecutor(thread_name_prefix="mahjong-ask")
+    return _executor
+
 class MahjongRuleError(Exception):
     
     def __init__(self, message, world_state):
@@ -26,7 +46,8 @@ class MahjongRuleError(Exception):
         # Create a random 4-letter code for the error
         error_id = ''.join(random.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz') for _ in range(5))
         # Dump the world state to a pickle file
-        os.makedirs('errors_log', exist_ok=True)
+        import pickle
+        os.makedirs('error_log', exist_ok=True)
         with open('error_log/' + error_id + '.pkl', 'wb') as f:
             pickle.dump(self.world_state, f)
         return "MahjongRuleError: {}\nError ID: {} (state dumped to error_log/{}.pkl)".format(self.message, error_id, error_id)
@@ -92,11 +113,35 @@ class MahjongGame():
             - `wall`: `Wall` or `str` or `int`
                 The wall to use. If a string is given, it will be interpreted as a file
                 path. If an integer is given, it will be interpreted as the random seed.
+            - `wall_bank`: `WallBank`
+                Takes the walls from a bank instead, see `env.wall_bank.WallBank`.
+                Every call of `initialize_game()` uses the next wall.
+            - `wall_index`: `int`
+                The index of the first wall to take from `wall_bank`. Defaults to 0.
+            - `profiler`: `StepProfiler`
+                Times the phases of every step, see `env.profiler.StepProfiler`.
+                Profiling is disabled by default.
+            - `metrics`: `MetricsRegistry`
+                Counts games, decisions, outcomes and rule errors, and records
+                agent latency and hand length, see `env.metrics.MetricsRegistry`.
+            - `stream_events`: `bool`
+                Whether to record per-seat events. If `True`, every observation
+                carries the `"events"` since the previous observation of the same
+                seat, see `env.events.ObservationTracker`. Defaults to `False`.
+            - `fast_forward`: `bool`
+                Whether to skip the passive players that can only answer noop
+                after a discard, without building their observation or asking
+                their agent. Skipped decisions are not recorded, and are
+                counted in `skipped_decisions`. Defaults to `False`.
         '''
         # Apply ruleset
         self.ruleset = ruleset
         # kwargs has Wall then use it
-        if 'wall' in kwargs:
+        self.wall_bank = kwargs.get("wall_bank", None)
+        self.wall_index = kwargs.get("wall_index", 0)
+        if self.wall_bank is not None:
+            self.wall = self.wall_bank[self.wall_index]
+        elif 'wall' in kwargs:
             if isinstance(kwargs['wall'], Wall):
                 self.wall = kwargs['wall']
             elif isinstance(kwargs['wall'], str):
@@ -109,8 +154,21 @@ class MahjongGame():
         self.players = []
         for i in range(ruleset.get_rule("players")):
             self.players.append(Player("Player {}".format(i+1), is_manual=True))
+            self.players[i].ruleset = ruleset
         # Initialize game state
         self.state = {}
+        # Read-only views of the state shared by observations
+        self.views = {}
+        # Optional step profiler
+        self.profiler = kwargs.get("profiler", None)
+        # Optional metrics registry
+        self.metrics = kwargs.get("metrics", None)
+        # Per-seat event queues, only kept when streaming events
+        self.stream_events = kwargs.get("stream_events", False)
+        self.event_queues = None
+        # Fast-forward of passive players without a legal claim
+        self.fast_forward = kwargs.get("fast_forward", False)
+        self.skipped_decisions = 0
 
     def set_player(self, player_idx: int, player: Player):
         '''
@@ -125,8 +183,9 @@ class MahjongGame():
         - `player_idx`: `int`
             The index of the player.
         - `player`: `Player`
-            The player to set.
+            The player to set. It plays under the ruleset of the game.
         '''
+        player.ruleset = self.ruleset
         self.players[player_idx] = player
         
     def initialize_game(self):
@@ -137,6 +196,10 @@ class MahjongGame():
         
         Initializes the game.
         '''
+        # Take the next wall of the bank
+        if self.wall_bank is not None:
+            self.wall = self.wall_bank[self.wall_index]
+            self.wall_index += 1
         self.state = {
             "dora_revealed": 1,
             "player_idx": 0,
@@ -154,6 +217,9 @@ class MahjongGame():
             "calls": [
                 [] for _ in range(len(self.players))
             ],
+            "melds": [
+                [] for _ in range(len(self.players))
+            ],
             "reach": [
                 False for _ in range(len(self.players))
             ],
@@ -171,11 +237,62 @@ class MahjongGame():
         self.history = {
             "actions": [],
         }
+        self.views = {}
+        if self.profiler is not None:
+            self.profiler.new_game()
+        if self.metrics is not None:
+            self.metrics.inc("games_started_total")
         # Initialize players
         for i in range(len(self.players)):
             self.players[i].initialize()
         # Initialize player hands
         self.hands = [self.wall.get_starting_hand(i) for i in range(len(self.players))]
+        # Initialize the unseen tiles of every seat
+        self.unseen = UnseenCounter(self.hands, self.wall.get_dora_indicators()[0:self.state["dora_revealed"]])
+        # Initialize the discard sets of every seat
+        self.discards = DiscardIndex(len(self.players))
+        # Initialize the rivers of every seat, see `River`
+        self.rivers = [River() for _ in range(len(self.players))]
+        # Initialize event queues
+        if self.stream_events:
+            self.event_queues = [[] for _ in range(len(self.players))]
+            dora_indicators = [tile.get_id() for tile in self.wall.get_dora_indicators()[0:self.state["dora_revealed"]]]
+            for i in range(len(self.players)):
+                self.event_queues[i].append({
+                    "type": "start",
+                    "player_idx": i,
+                    "hand": [tile.get_id() for tile in self.hands[i]],
+                    "dora_indicators": dora_indicators,
+                    "players": len(self.players)
+                })
+
+    def emit(self, event: dict, private_to: int = -1, private: dict = None):
+        '''
+        Method: emit()
+
+        ## Description
+
+        Appends an event to the queue of every seat. Does nothing unless the
+        game streams events.
+
+        ## Parameters
+
+        - `event`: `dict`
+            The public part of the event.
+        - `private_to`: `int`
+            The seat that also receives the `private` fields.
+        - `private`: `dict`
+            Fields only visible to `private_to`, e.g. the drawn tile.
+        '''
+        if self.event_queues is None:
+            return
+        for i in range(len(self.event_queues)):
+            if i == private_to and private is not None:
+                own_event = dict(event)
+                own_event.update(private)
+                self.event_queues[i].append(own_event)
+            else:
+                self.event_queues[i].append(event)
 
     def record(self, obs, action):
         '''
@@ -185,9 +302,166 @@ class MahjongGame():
 
         Records the action.
         '''
+        profiler = self.profiler
+        if profiler is not None:
+            t = profiler.clock()
         self.history["actions"].append((obs, action))
         with open("game-log.log", "w") as f:
             f.write(str(self.history))
+        if profiler is not None:
+            profiler.add("record", profiler.clock() - t)
+
+    def ask(self, player_idx: int, obs: dict) -> Action:
+        '''
+        Method: ask()
+
+        ## Description
+
+        Queries a player for an action and records the decision.
+        '''
+        metrics = self.metrics
+        if metrics is None:
+            return self.players[player_idx].act(obs, self.profiler)
+        t = perf_counter()
+        action = self.players[player_idx].act(obs, self.profiler)
+        metrics.observe("agent_latency_seconds", perf_counter() - t)
+        metrics.inc("decisions_total")
+        return action
+
+    def ask_all(self, seats: list, observations: list) -> list:
+        '''
+        Method: ask_all()
+
+        ## Description
+
+        Queries several players for an action at once, e.g. the passive
+        players after a discard.
+
+        ## Parameters
+
+        - `seats`: `list`
+            The seats to query.
+        - `observations`: `list`
+            The observation of every seat.
+
+        ## Returns
+
+        `list`
+            The actions, in the order of `seats`.
+
+        ## Details
+
+        Seats played by the same agent are queried with one
+        `Agent.query_batch()` call, so a batched policy can serve them in a
+        single forward pass. Agents that allow it (`Agent.concurrent`, e.g.
+        `FlaskAgent`) are queried in threads while the others decide, and
+        are not profiled. Only `Agent.query()` runs in the threads: the
+        action spaces are computed on the calling thread, as the
+        calculators of the `mahjong` library they use are shared and not
+        thread-safe.
+        '''
+        groups = {}
+        for k, i in enumerate(seats):
+            player = self.players[i]
+            groups.setdefault(("seat", i) if player.is_manual else ("agent", id(player.agent)), []).append(k)
+        actions = [None] * len(seats)
+        def observe(positions, t):
+            if self.metrics is not None:
+                elapsed = perf_counter() - t
+                for _ in positions:
+                    self.metrics.observe("agent_latency_seconds", elapsed)
+                self.metrics.inc("decisions_total", len(positions))
+        def ask_group(positions, profiler):
+            t = perf_counter()
+            if len(positions) == 1:
+                k = positions[0]
+                actions[k] = self.players[seats[k]].act(observations[k], profiler)
+            else:
+                agent = self.players[seats[positions[0]]].agent
+                action_spaces = [self.players[seats[k]].get_action_space(observations[k]) for k in positions]
+                for k, action in zip(positions, agent.query_batch([observations[k] for k in positions], action_spaces)):
+                    actions[k] = action
+            observe(positions, t)
+        def query_group(positions, action_spaces, t):
+            agent = self.players[seats[positions[0]]].agent
+            if len(positions) == 1:
+                actions[positions[0]] = agent.query(observations[positions[0]], action_spaces[0])
+            else:
+                for k, action in zip(positions, agent.query_batch([observations[k] for k in positions], action_spaces)):
+                    actions[k] = action
+            observe(positions, t)
+        futures = []
+        for positions in groups.values():
+            player = self.players[seats[positions[0]]]
+            if len(groups) > 1 and not player.is_manual and player.agent.concurrent:
+                t = perf_counter()
+                action_spaces = [self.players[seats[k]].get_action_space(observations[k]) for k in positions]
+                futures.append(_get_executor().submit(query_group, positions, action_spaces, t))
+            else:
+                ask_group(positions, self.profiler)
+        for future in futures:
+            future.result()
+        return actions
+
+    def get_claiming_seats(self, seats: list, tile: Tile) -> list:
+        '''
+        Method: get_claiming_seats()
+
+        ## Description
+
+        Returns the seats, among `seats`, that may have a claim on a
+        discarded tile, see `may_claim_counts()`. The other seats can only
+        answer noop; they are added to `skipped_decisions`.
+        '''
+        index = TILE_INDEX.get(tile.get_id())
+        if index is None:
+            return seats
+        claiming = []
+        for i in seats:
+            counts = get_tile_counts(self.hands[i].get_tiles())
+            if counts is None or may_claim_counts(counts, index, chii=i == (self.state["player_idx"] + 1) % len(self.players), reach=self.state["reach"][i]):
+                claiming.append(i)
+        skipped = len(seats) - len(claiming)
+        self.skipped_decisions += skipped
+        if self.metrics is not None and skipped > 0:
+            self.metrics.inc("decisions_skipped_total", skipped)
+        return claiming
+
+    def resolve_claims(self, observations: list, actions: list):
+        '''
+        Method: resolve_claims()
+
+        ## Description
+
+        Performs the claims on a discard that win the arbitration, given the
+        passive observations and actions in turn order from the discarder.
+
+        ## Details
+
+        Ron beats pon and kan, which beat chii. With `enableMultiRon`, every
+        player calling ron wins and the credits of all wins are summed;
+        otherwise only the first one in turn order wins (head bump). Pon and
+        kan can only be called by one player, and chii only by the next one.
+        The other actions are dropped.
+        '''
+        claims = [(obs, action) for obs, action in zip(observations, actions) if action.action_type in CLAIM_PRIORITY]
+        if len(claims) == 0:
+            return
+        priority = max(CLAIM_PRIORITY[action.action_type] for _, action in claims)
+        claims = [(obs, action) for obs, action in claims if CLAIM_PRIORITY[action.action_type] == priority]
+        if priority == CLAIM_PRIORITY["ron"]:
+            if not self.ruleset.get_rule("enableMultiRon"):
+                claims = claims[:1]
+            credits = [0 for _ in range(len(self.players))]
+            for obs, action in claims:
+                for i, credit in enumerate(self.calculate_credits(obs["player_idx"], "ron", obs["active_player"], obs=obs)):
+                    credits[i] += credit
+            self.end_game({
+                "reason": "ron",
+                "credits": credits
+            })
+        obs, action = claims[0]
+        self.perform_action(action, obs)
 
     def step(self):
         '''
@@ -197,24 +471,57 @@ class MahjongGame():
         
         Performs a step in the game.
         '''
+        profiler = self.profiler
+        if self.metrics is None and profiler is None:
+            return self.step_game()
+        if profiler is not None:
+            t = profiler.clock()
+        try:
+            self.step_game()
+        except MahjongRuleError:
+            if self.metrics is not None:
+                self.metrics.inc("rule_errors_total")
+            raise
+        finally:
+            # Steps that end the game are timed too
+            if profiler is not None:
+                profiler.add("step", profiler.clock() - t)
+
+    def step_game(self):
+        '''
+        Method: step_game()
+
+        ## Description
+
+        Performs a step in the game, see `step()`.
+        '''
+        profiler = self.profiler
+        # The phases are closed in `finally`, as the game may end in any of
+        # them (`MahjongEndGame`)
+        if profiler is not None:
+            t = profiler.clock()
         # Get current player
         player_idx = self.state["player_idx"]
         # Get player
         player = self.players[player_idx]
+        # The turn of the player ends its temporary furiten
+        self.discards.turn(player_idx)
         # Draw a tile from the wall
-        if self.state["no_draw"]:
-            tile = None
-            self.state["no_draw"] = False
-        else:
-            if len(self.wall.mountain) == 0:
-                # Start ten / no ten quer
-                # TODO
-                self.end_game({
-                    "reason": "wall_empty",
-                    "credits": [0, 0, 0, 0]
-                })
+        try:
+            if self.state["no_draw"]:
+                tile = None
+                self.state["no_draw"] = False
             else:
-                tile = self.wall.mountain.pop()
+                if len(self.wall.mountain) == 0:
+                    # Exhaustive draw, ends the game
+                    self.exhaustive_draw()
+                else:
+                    tile = self.wall.mountain.pop()
+                    self.unseen.draw(player_idx, tile)
+                    self.emit({"type": "draw", "player_idx": player_idx}, player_idx, {"tile": tile.get_id()})
+        finally:
+            if profiler is not None:
+                profiler.add("draw", profiler.clock() - t)
             
         rinshan_continue = True # 嶺上
         # Perform action
@@ -222,22 +529,29 @@ class MahjongGame():
         while rinshan_continue:
             rinshan_continue = False
             # Query player for action: active
+            if profiler is not None:
+                t = profiler.clock()
             obs = self.get_observation(player_idx, {
                 "player_state": "active",
-                "incoming_tile": tile
+                "incoming_tile": tile,
+                "rinshan": self.state["rinshan"]
             })
-            action = player.act(obs)
+            if profiler is not None:
+                profiler.add("observation", profiler.clock() - t)
+            action = self.ask(player_idx, obs)
             # Record action
             self.record(obs, action)
             # Perform action
-            discarded_tile = self.perform_action(action, obs)
+            if profiler is not None:
+                t = profiler.clock()
+            try:
+                discarded_tile = self.perform_action(action, obs)
+            finally:
+                if profiler is not None:
+                    profiler.add("perform_action", profiler.clock() - t)
             if action.action_type == "kan" or action.action_type == "akan" or action.action_type == "mkan" or action.action_type == "nukidora":
                 # Check for Suukaikan
-                kans = []
-                for i in range(len(self.players)):
-                    for call in self.state["calls"][i]:
-                        if call.find("k") != -1:
-                            kans.append(i)
+                kans = [i for i in range(len(self.players)) for meld in self.state["melds"][i] if meld.is_kan()]
                 if len(kans) >= 5 or len(kans) == 4 and len(set(kans)) != 1:
                     self.end_game({
                         "reason": "suukaikan",
@@ -245,6 +559,8 @@ class MahjongGame():
                     })
                 # Add one dora indicator
                 self.state["dora_revealed"] += 1
+                self.unseen.dora(self.wall.get_dora_indicators()[self.state["dora_revealed"] - 1])
+                self.emit({"type": "dora", "tile": self.wall.get_dora_indicators()[self.state["dora_revealed"] - 1].get_id()})
                 # kan cancels all ippatsu
                 self.state["ippatsu"] = [
                     False for i in range(len(self.players))
@@ -252,32 +568,52 @@ class MahjongGame():
                 rinshan_continue = True
                 self.state["rinshan"] = True
                 # Rinshan draw
+                if profiler is not None:
+                    t = profiler.clock()
                 try:
                     tile = self.wall.get_replacements().pop()
+                    self.unseen.draw(player_idx, tile)
+                    self.emit({"type": "draw", "player_idx": player_idx}, player_idx, {"tile": tile.get_id()})
                 except IndexError:
                     # Suukaikan but the same player, no more tiles to draw
                     self.end_game({
                         "reason": "suukaikan",
                         "credits": [0, 0, 0, 0]
                     })
+                finally:
+                    if profiler is not None:
+                        profiler.add("draw", profiler.clock() - t)
             else:
                 rinshan_continue = False
                 self.state["rinshan"] = False
         # Query other players for action: passive
-        for i in range(len(self.players)):
-            if i != player_idx:
-                passive_obs = self.get_observation(i, {
-                    "player_state": "passive",
-                    "incoming_tile": discarded_tile
-                })
-                passive_action = self.players[i].act(passive_obs)
-                # Record action
-                self.record(passive_obs, passive_action)
-                # Perform action
-                self.perform_action(passive_action, passive_obs)
+        if profiler is not None:
+            t = profiler.clock()
+        try:
+            # All other players answer the discard before any claim is made,
+            # in turn order from the discarder
+            seats = [(player_idx + k) % len(self.players) for k in range(1, len(self.players))]
+            if self.fast_forward:
+                seats = self.get_claiming_seats(seats, discarded_tile)
+            public = self.get_public_observation()
+            passive_obs = [self.get_observation(i, {
+                "player_state": "passive",
+                "incoming_tile": discarded_tile
+            }, public) for i in seats]
+            passive_actions = self.ask_all(seats, passive_obs)
+            # Record actions
+            for obs, action in zip(passive_obs, passive_actions):
+                self.record(obs, action)
+            # Perform the claims that win the arbitration
+            self.resolve_claims(passive_obs, passive_actions)
+            # No one won on the discard, which the other players have passed
+            self.discards.pass_tile(player_idx, discarded_tile)
+        finally:
+            if profiler is not None:
+                profiler.add("passive", profiler.clock() - t)
 
-        # Update game state
-        self.state["player_idx"] = (player_idx + 1) % len(self.players)
+        # Update game state, pon and chii have moved the turn to the caller
+        self.state["player_idx"] = (self.state["player_idx"] + 1) % len(self.players)
 
     def end_game(self, end_game_args: dict):
         '''
@@ -290,10 +626,95 @@ class MahjongGame():
         # End game event
         self.state["end_game"] = end_game_args
         print(end_game_args)
+        if self.metrics is not None:
+            self.metrics.inc("games_finished_total", reason=end_game_args["reason"])
+            self.metrics.observe("hand_length", sum(len(discards) for discards in self.state["discarded_tiles"]), HAND_LENGTH_BUCKETS)
         for player_idx in range(len(self.players)):
             self.state["credits"][player_idx] += end_game_args["credits"][player_idx]
         raise MahjongEndGame(self.state["end_game"])
         
+    def exhaustive_draw(self):
+        '''
+        Method: exhaustive_draw()
+
+        ## Description
+
+        Ends the game when the wall is empty (ryuukyoku).
+
+        ## Details
+
+        A player whose discards are all terminals and honors, none of them
+        called, wins nagashi mangan, paid as a mangan tsumo. Otherwise the
+        tenpai of every hand is evaluated in one `get_waits_batch()` call,
+        and the tenpai players are asked to declare `ten` or `noten`
+        (`"end_game"` observations, with `"tenpai": True`). With
+        `enableNoTenPenalty`, the noten players pay 3000 in total to the
+        players that declared tenpai. Noten players can only declare
+        `noten`; with `fast_forward`, they are not asked.
+
+        ## Raises
+
+        - `MahjongEndGame`:
+            Always, see `end_game()`.
+        '''
+        players = len(self.players)
+        dealer = self.state["wind_e"]
+        credits = [0] * players
+        # Nagashi mangan, from the flags of the rivers
+        nagashi = [i for i, river in enumerate(self.rivers) if len(river) > 0 and all(
+            not river.flags[k] & FLAG_CALLED and get_index(river.ids[k]) in KOKUSHI_INDICES
+            for k in range(len(river))
+        )]
+        if len(nagashi) > 0:
+            for i in nagashi:
+                for j in range(players):
+                    if j != i:
+                        payment = 4000 if i == dealer or j == dealer else 2000
+                        credits[i] += payment
+                        credits[j] -= payment
+            self.end_game({
+                "reason": "nagashi_mangan",
+                "credits": credits,
+                "nagashi_mangan": nagashi
+            })
+        # Tenpai of all hands at once
+        counts = [get_tile_counts(self.hands[i].get_tiles()) for i in range(players)]
+        valid = [i for i in range(players) if counts[i] is not None]
+        tenpai = [False] * players
+        if len(valid) > 0:
+            waits = get_waits_batch([counts[i] for i in valid], [len(self.state["melds"][i]) for i in valid])
+            for i, waiting in zip(valid, waits.any(axis=1)):
+                tenpai[i] = bool(waiting)
+        # Tenpai players may hide their hands
+        seats = list(range(players))
+        if self.fast_forward:
+            seats = [i for i in seats if tenpai[i]]
+            skipped = players - len(seats)
+            self.skipped_decisions += skipped
+            if self.metrics is not None and skipped > 0:
+                self.metrics.inc("decisions_skipped_total", skipped)
+        public = self.get_public_observation()
+        declared = [False] * players
+        for i in seats:
+            obs = self.get_observation(i, {
+                "player_state": "end_game",
+                "incoming_tile": None,
+                "tenpai": tenpai[i]
+            }, public)
+            action = self.ask(i, obs)
+            self.record(obs, action)
+            declared[i] = tenpai[i] and action.action_type == "ten"
+        # Noten penalty
+        ten = declared.count(True)
+        if self.ruleset.get_rule("enableNoTenPenalty") and 0 < ten < players:
+            for i in range(players):
+                credits[i] = 3000 // ten if declared[i] else -3000 // (players - ten)
+        self.end_game({
+            "reason": "wall_empty",
+            "credits": credits,
+            "tenpai": declared
+        })
+
     def calculate_credits(self, player_idx: int, ron_or_tsumo: str or int, ron_from: int = -1, obs: dict = None) -> list:
         '''
         Method: calculate_credits()
@@ -326,20 +747,24 @@ class MahjongGame():
             })
             # Create winning deck
             winning_deck = self.hands[player_idx]
-            for call in state["calls"][player_idx]:
-                tiles_in_call = get_tiles_from_call(call)
-                for tile in tiles_in_call:
+            for meld in self.state["melds"][player_idx]:
+                for tile in meld.get_tiles():
                     winning_deck += tile
             winning_deck += obs["incoming_tile"]
             dora_indicators = self.wall.get_dora_indicators()[0:self.state["dora_revealed"]]
             agari_output = get_value(
                 deck=winning_deck,
                 incoming_tile = obs["incoming_tile"],
-                melds=self.state["calls"][player_idx],
+                melds=self.state["melds"][player_idx],
                 game_state=state,
                 ruleset=self.ruleset,
-                dora_indicators=dora_indicators
+                dora_indicators=dora_indicators,
+                has_open_tanyao=self.ruleset.get_rule("enableKuitan"),
+                is_daburu_riichi=self.state["double_reach"][player_idx],
+                **get_situation(obs, False, self.ruleset)
             )
+            if agari_output.cost is None:
+                raise MahjongRuleError("Ron failed: {}".format(agari_output.error), self)
             print(agari_output)
             print("{} 番 {} 符，{} 点".format(agari_output.han, agari_output.fu, agari_output.cost['main']))
             print("役：{}".format(", ".join([str(yaku) for yaku in agari_output.yaku])))
@@ -353,9 +778,8 @@ class MahjongGame():
                 "is_wall_empty": len(self.wall.mountain) == 0
             })
             winning_deck = self.hands[player_idx]
-            for call in state["calls"][player_idx]:
-                tiles_in_call = get_tiles_from_call(call)
-                for tile in tiles_in_call:
+            for meld in self.state["melds"][player_idx]:
+                for tile in meld.get_tiles():
                     winning_deck += tile
             winning_deck += obs["incoming_tile"]
             dora_indicators = self.wall.get_dora_indicators()[0:self.state["dora_revealed"]]
@@ -364,16 +788,25 @@ class MahjongGame():
             agari_output = get_value(
                 deck=winning_deck,
                 incoming_tile = obs["incoming_tile"],
-                melds=self.state["calls"][player_idx],
+                melds=self.state["melds"][player_idx],
                 game_state=state,
                 ruleset=self.ruleset,
-                dora_indicators = dora_indicators
+                dora_indicators = dora_indicators,
+                has_open_tanyao=self.ruleset.get_rule("enableKuitan"),
+                is_daburu_riichi=self.state["double_reach"][player_idx],
+                **get_situation(obs, True, self.ruleset)
             )
+            if agari_output.cost is None:
+                raise MahjongRuleError("Tsumo failed: {}".format(agari_output.error), self)
             print(agari_output)
             print("{} 番 {} 符，{} 点".format(agari_output.han, agari_output.fu, agari_output.cost['main']))
             print("役：{}".format(", ".join([str(yaku) for yaku in agari_output.yaku])))
-            credits[0] = credits[1] = credits[2] = credits[3] = -agari_output.cost['additional']
-            credits[player_idx] = agari_output.cost['main']
+            # The dealer pays the main cost, the other players the
+            # additional cost (the same when the dealer wins)
+            for i in range(len(credits)):
+                if i != player_idx:
+                    credits[i] = -agari_output.cost['main' if i == self.state["wind_e"] else 'additional']
+            credits[player_idx] = -sum(credits)
         return credits
             
     def perform_action(self, action: Action, obs: dict = None):
@@ -405,30 +838,31 @@ class MahjongGame():
             tile = obs["incoming_tile"]
             kanned = False
             # Check wheter the player previously has called pon
-            for call_idx in range(len(self.state["calls"][player_idx])):
-                call = self.state["calls"][player_idx][call_idx]
-                if call.find("p") != -1 and get_tiles_from_call(call)[0] == tile:
+            for call_idx, meld in enumerate(self.state["melds"][player_idx]):
+                if meld.type == "pon" and meld.tiles[0] == tile.get_id():
                     # Kakan OK, replace the pon with the kan
-                    self.state["calls"][player_idx][call_idx] = action.action_string
+                    self.add_meld(player_idx, Meld("kan", meld.tiles + (tile.get_id(),), meld.from_seat, meld.called, action.action_string), call_idx)
                     kanned = True
                     break
             # If kan failed, raise an error
             if not kanned:
                 raise MahjongRuleError("Kakan failed: player {} does not have pon for tile {}".format(player_idx, tile), self)
             # Whether the rest players can call ron due to chankan
+            public = self.get_public_observation()
             for i in range(len(self.players)):
                 if i != player_idx:
                     chankan_obs = self.get_observation(i, {
                         "player_state": "chankan",
                         "incoming_tile": tile
-                    })
-                    action = self.players[i].act(chankan_obs)
+                    }, public)
+                    action = self.ask(i, chankan_obs)
                     self.record(chankan_obs, action)
                     if action.action_type == "ron":
                         self.state["chankan"] = True
                         self.perform_action(action, chankan_obs)
                     else:
                         self.perform_action(action, chankan_obs)
+            self.discards.pass_tile(player_idx, tile)
             return None
         elif action.action_type == "mkan":
             # 明槓
@@ -436,23 +870,25 @@ class MahjongGame():
             # Add the incoming tile to player's hand
             self.hands[player_idx] += obs["incoming_tile"]
             # Remove kanned tiles
-            tiles_kanned = get_tiles_from_call(action.action_string)
-            for tile_kanned in tiles_kanned:
+            meld = Meld.from_string(action.action_string, player_idx, "mkan", len(self.players))
+            for tile_kanned in meld.get_tiles():
                 try:
                     self.hands[player_idx].remove(tile_kanned)
                 except ValueError:
                     raise MahjongRuleError("Ankan failed: player {} does not have tile {}".format(player_idx, tile_kanned), self)
             # Append to the calls
-            self.state["calls"][player_idx].append(action.action_string)
+            self.add_meld(player_idx, meld)
+            self.rivers[obs["active_player"]].mark_called()
             # Whether the rest players can call ron due to chankan
+            public = self.get_public_observation()
             for i in range(len(self.players)):
                 if i != player_idx:
                     chankan_obs = self.get_observation(i, {
                         "player_state": "chankan",
                         "is_ankan": True,
                         "incoming_tile": tile
-                    })
-                    action = self.players[i].act(chankan_obs)
+                    }, public)
+                    action = self.ask(i, chankan_obs)
                     self.record(chankan_obs, action)
                     if action.action_type == "ron":
                         self.state["chankan"] = True
@@ -483,8 +919,9 @@ class MahjongGame():
             #     raise MahjongRuleError("Ankan must be called with the incoming tile {}, but got {} from action string".format(obs["incoming_tile"], get_tiles_from_call(action.action_string)[0]), self)
             # Get the tile to kan
             tile = obs["incoming_tile"]
-            tiles_kanned = get_tiles_from_call(action.action_string)
-            for tile_kanned in tiles_kanned:
+            meld = Meld.from_string(action.action_string, player_idx, "akan", len(self.players))
+            kanned = meld.get_tiles()[0]
+            for tile_kanned in meld.get_tiles():
                 try:
                     self.hands[player_idx].remove(tile_kanned)
                 except ValueError:
@@ -492,36 +929,42 @@ class MahjongGame():
             # Append the incoming tile to the hand
             self.hands[player_idx].append(tile)
             # Append to the calls
-            self.state["calls"][player_idx].append(action.action_string)
+            self.add_meld(player_idx, meld)
             # Whether the rest players can call ron due to chankan
+            public = self.get_public_observation()
             for i in range(len(self.players)):
                 if i != player_idx:
                     chankan_obs = self.get_observation(i, {
                         "player_state": "chankan",
                         "is_ankan": True,
-                        "incoming_tile": tile
-                    })
-                    action = self.players[i].act(chankan_obs)
+                        "incoming_tile": kanned
+                    }, public)
+                    action = self.ask(i, chankan_obs)
                     self.record(chankan_obs, action)
                     if action.action_type == "ron":
                         self.state["chankan"] = True
                         self.perform_action(action, chankan_obs)
                     else:
                         self.perform_action(action, chankan_obs)
+            # Only a kokushi mosou can be won on an ankan, so only the seats
+            # waiting for one have passed the kanned tile
+            self.discards.pass_tile(player_idx, kanned, [i for i in range(len(self.players)) if i != player_idx and self.waits_kokushi(i, kanned)])
             return None
         elif action.action_type == "chii":
             player_idx = obs["player_idx"]
             action_string = action.action_string
-            # Append the chi to the player's calls
-            self.state["calls"][player_idx].append(action_string)
+            meld = Meld.from_string(action_string, player_idx, "chii", len(self.players))
             # Append the incoming tile to the player's hand
             self.hands[player_idx].append(obs["incoming_tile"])
             # Remove the tiles used in the chii
-            for tile in get_tiles_from_call(action_string):
+            for tile in meld.get_tiles():
                 try:
                     self.hands[player_idx].remove(tile)
                 except ValueError:
                     raise MahjongRuleError("Chii failed: player {} does not have tile {}".format(player_idx, tile), self)
+            # Append the chi to the player's calls
+            self.add_meld(player_idx, meld)
+            self.rivers[obs["active_player"]].mark_called()
             # Set the active player to be the previous player, so as to step to the chi caller
             self.state["player_idx"] = (player_idx - 1) % len(self.players)
             # Disallow the next draw tile
@@ -534,16 +977,18 @@ class MahjongGame():
         elif action.action_type == "pon":
             player_idx = obs["player_idx"]
             action_string = action.action_string
-            # Append the pon to the player's calls
-            self.state["calls"][player_idx].append(action_string)
+            meld = Meld.from_string(action_string, player_idx, "pon", len(self.players))
             # Append the incoming tile to the player's hand
             self.hands[player_idx].append(obs["incoming_tile"])
             # Remove the tiles used in the pon
-            for tile in get_tiles_from_call(action_string):
+            for tile in meld.get_tiles():
                 try:
                     self.hands[player_idx].remove(tile)
                 except ValueError:
                     raise MahjongRuleError("Pon failed: player {} does not have tile {}".format(player_idx, tile), self)
+            # Append the pon to the player's calls
+            self.add_meld(player_idx, meld)
+            self.rivers[obs["active_player"]].mark_called()
             # Set the active player to be the previous player, so as to step to the pon caller
             self.state["player_idx"] = (player_idx - 1) % len(self.players)
             # Disallow the next draw tile
@@ -571,11 +1016,14 @@ class MahjongGame():
                 # Discard the incoming tile
                 tile = obs["incoming_tile"]
                 # Add the discarded tile to the player's discarded tiles
-                self.state["discarded_tiles"][player].append(tile)
+                self.discard_tile(player_idx, tile, True, True)
                 # Reach state
                 self.state["reach"][player_idx] = True
+                self.discards.declare_reach(player_idx)
                 self.state["ippatsu"][player_idx] = True
-                if len(self.state["discarded_tiles"][player_idx]) == 0:
+                # Reach on the first discard, before any call (the reach
+                # tile is already in the river)
+                if len(self.state["discarded_tiles"][player_idx]) == 1 and not any(self.state["melds"]):
                     self.state["double_reach"][player_idx] = True
                 # Return the discarded tile
                 return tile
@@ -589,12 +1037,15 @@ class MahjongGame():
                     raise ValueError("Player {} does not have the tile {}.".format(player_idx, tile))
                 # Add the drawn tile to the player's hand
                 self.hands[player_idx].add_tile(obs["incoming_tile"])
-                # Add the drawn tile to the player's discarded tiles
-                self.state["discarded_tiles"][player_idx].append(obs["incoming_tile"])
+                # Add the cut tile to the player's discarded tiles
+                self.discard_tile(player_idx, tile, False, True)
                 # Reach state
                 self.state["reach"][player_idx] = True
+                self.discards.declare_reach(player_idx)
                 self.state["ippatsu"][player_idx] = True
-                if len(self.state["discarded_tiles"][player_idx]) == 0:
+                # Reach on the first discard, before any call (the reach
+                # tile is already in the river)
+                if len(self.state["discarded_tiles"][player_idx]) == 1 and not any(self.state["melds"]):
                     self.state["double_reach"][player_idx] = True
                 # Return the tile
                 return tile
@@ -612,7 +1063,7 @@ class MahjongGame():
             player_idx = obs["player_idx"]
             tile = obs["incoming_tile"]
             # Add the discarded tile to the player's discarded tiles
-            self.state["discarded_tiles"][player_idx].append(tile)
+            self.discard_tile(player_idx, tile, True)
             # Return the discarded tile
             return tile
         elif action.action_type == "replace":
@@ -626,7 +1077,7 @@ class MahjongGame():
             except ValueError:
                 raise ValueError("Player {} does not have the tile {}.".format(obs["player_idx"], tile))
             # Add the discarded tile to the player's discarded tiles
-            self.state["discarded_tiles"][obs["player_idx"]].append(tile)
+            self.discard_tile(obs["player_idx"], tile, False)
             # Add the drawn tile to the player's hand
             if obs["incoming_tile"] is not None:
                 self.hands[obs["player_idx"]].add_tile(obs["incoming_tile"])
@@ -637,42 +1088,217 @@ class MahjongGame():
         elif action.action_type == "noten":
             pass
 
-    def get_observation(self, player_idx: int, additional_dict: dict = []) -> dict:
+    def waits_kokushi(self, player_idx: int, tile: Tile) -> bool:
+        '''
+        Method: waits_kokushi()
+
+        ## Description
+
+        Whether the hand of a player is completed to kokushi mosou by a
+        tile, the only hand that can be won on an ankan.
+        '''
+        if len(self.state["melds"][player_idx]) > 0:
+            return False
+        counts = get_tile_counts(self.hands[player_idx].get_tiles() + [tile])
+        return counts is not None and all(counts[index] > 0 for index in KOKUSHI_INDICES) and sum(counts[index] for index in KOKUSHI_INDICES) == 14
+
+    def discard_tile(self, player_idx: int, tile: Tile, tsumogiri: bool, reach: bool = False):
+        '''
+        Method: discard_tile()
+
+        ## Description
+
+        Adds a tile to the river of a player, with the drawn tile
+        (`tsumogiri`) or a tile from the hand, optionally declaring reach,
+        and emits the events. The discards are kept in
+        `state["discarded_tiles"]` as `Tile`s and in `rivers` with their
+        flags; the unseen counts and the discard sets are updated. Any
+        discard but the reach discard ends the ippatsu of the player.
+        '''
+        self.state["discarded_tiles"][player_idx].append(tile)
+        self.rivers[player_idx].append(tile.get_id(), (FLAG_TSUMOGIRI if tsumogiri else 0) | (FLAG_REACH if reach else 0))
+        self.unseen.discard(player_idx, tile)
+        self.discards.discard(player_idx, tile)
+        if not reach:
+            # The discard after the reach discard ends ippatsu
+            self.state["ippatsu"][player_idx] = False
+        if reach:
+            self.emit({"type": "reach", "player_idx": player_idx})
+        self.emit({"type": "discard", "player_idx": player_idx, "tile": tile.get_id(), "tsumogiri": tsumogiri})
+
+    def add_meld(self, player_idx: int, meld: Meld, call_idx: int = None):
+        '''
+        Method: add_meld()
+
+        ## Description
+
+        Appends a meld to the calls of a player, or replaces the meld at
+        `call_idx` (kakan). The call strings of `state["calls"]`, which
+        observations show, are kept in step with `state["melds"]`.
+        '''
+        self.views.pop("calls", None)
+        if call_idx is None:
+            self.unseen.call(player_idx, meld)
+            self.state["melds"][player_idx].append(meld)
+            self.state["calls"][player_idx].append(meld.to_string())
+        else:
+            self.unseen.call(player_idx, meld, self.state["melds"][player_idx][call_idx])
+            self.state["melds"][player_idx][call_idx] = meld
+            self.state["calls"][player_idx][call_idx] = meld.to_string()
+        self.emit_call(player_idx, meld, call_idx)
+
+    def emit_call(self, player_idx: int, meld: Meld, call_idx: int = None):
+        '''
+        Method: emit_call()
+
+        ## Description
+
+        Emits a call event, with the call string and the fields of the
+        meld. The calling player also receives its new hand. `call_idx` is
+        the index of the replaced call for kakan, otherwise the call was
+        just appended.
+        '''
+        if self.event_queues is None:
+            return
+        if call_idx is None:
+            call_idx = len(self.state["calls"][player_idx]) - 1
+        self.emit({
+            "type": "call",
+            "player_idx": player_idx,
+            "call": meld.to_string(),
+            "meld": {"type": meld.type, "tiles": list(meld.tiles), "from_seat": meld.from_seat, "called": meld.called},
+            "call_idx": call_idx
+        }, player_idx, {"hand": [tile.get_id() for tile in self.hands[player_idx]]})
+
+    def get_public_observation(self) -> MappingProxyType:
+        '''
+        Method: get_public_observation()
+
+        ## Description
+
+        Returns the part of the observation that every player sees, as a
+        read-only mapping. When several players observe the same event
+        (e.g. the passive players after a discard), it is built once and
+        passed to `get_observation()` of every seat.
+
+        ## Details
+
+        The values are read-only views (`env.views`) that do not change
+        with the game: lists are `FrozenList`s and the rivers are
+        `RiverView`s, which share the tiles of the game. The views of the
+        rivers, calls and dora indicators are kept until a tile is
+        discarded or called or a dora is revealed, so consecutive
+        observations share them too.
+        '''
+        views = self.views
+        lengths = [len(discards) for discards in self.state["discarded_tiles"]]
+        if views.get("lengths") != lengths:
+            views["lengths"] = lengths
+            views["discarded_tiles"] = FrozenList([RiverView(discards) for discards in self.state["discarded_tiles"]])
+        if "calls" not in views:
+            views["calls"] = FrozenList([FrozenList(calls) for calls in self.state["calls"]])
+            views["melds"] = FrozenList([FrozenList(melds) for melds in self.state["melds"]])
+        versions = [river.version for river in self.rivers]
+        if views.get("river_versions") != versions:
+            views["river_versions"] = versions
+            views["river_flags"] = FrozenList([FrozenList(river.get_flags()) for river in self.rivers])
+        if views.get("discards_version") != self.discards.version:
+            views["discards_version"] = self.discards.version
+            views["discard_bits"] = FrozenList(self.discards.discarded)
+            views["safe_bits"] = FrozenList([self.discards.get_safe(i) for i in range(len(self.players))])
+        if views.get("dora_revealed") != self.state["dora_revealed"]:
+            views["dora_revealed"] = self.state["dora_revealed"]
+            views["dora_indicators"] = FrozenList(self.wall.get_dora_indicators()[0:self.state["dora_revealed"]])
+        return MappingProxyType({
+            # The active player
+            "active_player": self.state["player_idx"],
+            # The revealed dora indicators
+            "dora_indicators": views["dora_indicators"],
+            # The discarded tiles from all players
+            "discarded_tiles": views["discarded_tiles"],
+            # The flags of the discards, see `River`
+            "river_flags": views["river_flags"],
+            # The discarded tiles and the tiles safe against every player,
+            # as 34-bit integers, see `DiscardIndex`
+            "discard_bits": views["discard_bits"],
+            "safe_bits": views["safe_bits"],
+            # The calls from all players
+            "calls": views["calls"],
+            "melds": views["melds"],
+            # The wind, the repeat and the wind east
+            "wind": self.state["wind"],
+            "repeat": self.state["repeat"],
+            "wind_e": self.state["wind_e"],
+            # All players' credit
+            "credits": self.get_view("credits"),
+            # Whether a player is reach, and whether ippatsu is available
+            "reach": self.get_view("reach"),
+            "ippatsu": self.get_view("ippatsu"),
+            # How many tiles are left in the wall
+            "tiles_left": len(self.wall.get_mountain())
+        })
+
+    def get_view(self, key: str) -> FrozenList:
+        '''
+        Method: get_view()
+
+        ## Description
+
+        Returns a `FrozenList` of the list `state[key]`, reusing the
+        previous one while the list is unchanged.
+        '''
+        view = self.views.get(key)
+        if view is None or view != self.state[key]:
+            view = self.views[key] = FrozenList(self.state[key])
+        return view
+
+    def get_observation(self, player_idx: int, additional_dict: dict = [], public: MappingProxyType = None) -> dict:
         '''
         Method: get_observation()
 
         ## Description
         
         Gets the observation of the player.
+
+        ## Parameters
+
+        - `player_idx`: `int`
+            The player.
+        - `additional_dict`: `dict`
+            Fields merged into the observation, e.g. `"player_state"` and
+            `"incoming_tile"`.
+        - `public`: `MappingProxyType` or `None`
+            The public part of the observation, see
+            `get_public_observation()`. Built from the current state if
+            `None`; it must be rebuilt after the state changes.
+
+        ## Details
+
+        Observations never change once returned, so they can be stored
+        without copying them. The hand is a read-only `HandView` of a copy of
+        the hand of the player, shared by its observations until the hand
+        changes.
         '''
-        
-        obs = {}
-        # Get player
-        obs["active_player"] = self.state["player_idx"]
-        # Get player
+        if public is None:
+            public = self.get_public_observation()
+        obs = public.copy()
         obs["player_idx"] = player_idx
-        # Create observation dictionary
-        # A player can see the hand
-        obs["hand"] = self.hands[player_idx]
-        # A player can see the revealed dora indicators
-        obs["dora_indicators"] = self.wall.get_dora_indicators()[0:self.state["dora_revealed"]]
-        # A player can see the discarded tiles from all players
-        obs["discarded_tiles"] = self.state["discarded_tiles"]
-        # A player can see the calls from all players
-        obs["calls"] = self.state["calls"]
-        # A player can see the wind
-        obs["wind"] = self.state["wind"]
-        # A player can see the repeat
-        obs["repeat"] = self.state["repeat"]
-        # A player can see the wind east
-        obs["wind_e"] = self.state["wind_e"]
-        # A player can see all players' credit
-        obs["credits"] = self.state["credits"]
-        # A player can see whether a player is reach, and whether ippatsu is available
-        obs["reach"] = self.state["reach"]
-        obs["ippatsu"] = self.state["ippatsu"]
-        # A player can see how many tiles are left in the wall
-        obs["tiles_left"] = len(self.wall.get_mountain())
+        # A player can see the hand, as a view kept while it is unchanged
+        hand = self.views.get(("hand", player_idx))
+        if hand is None or hand.tiles != self.hands[player_idx].tiles:
+            hand = self.views[("hand", player_idx)] = HandView(self.hands[player_idx])
+        obs["hand"] = hand
+        # The tiles the player has not seen yet, see `UnseenCounter`
+        unseen = self.views.get(("unseen", player_idx))
+        if unseen is None or unseen[0] != self.unseen.versions[player_idx]:
+            unseen = self.views[("unseen", player_idx)] = (self.unseen.versions[player_idx], FrozenList(self.unseen.get_counts(player_idx)))
+        obs["unseen"] = unseen[1]
+        # The tiles the player passed since its last turn
+        obs["passed_bits"] = self.discards.passed[player_idx]
+        # The events since the previous observation of this player
+        if self.event_queues is not None:
+            obs["events"] = self.event_queues[player_idx]
+            self.event_queues[player_idx] = []
         # Merge additional dict
         obs.update(additional_dict)
         return obs
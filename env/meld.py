@@ -0,0 +1,197 @@
+'''
+File: meld.py
+Author: Kunologist
+Description:
+    The Meld record, which is how the game engine stores calls (chii, pon,
+    kan). Call strings are only parsed when a meld is created and only
+    formatted for observations and logs.
+'''
+
+from env.tiles import Tile
+
+# The letter marking every meld type in call strings
+MARKERS = {"chii": "c", "pon": "p", "kan": "k", "mkan": "m", "akan": "a"}
+KAN_TYPES = ["kan", "mkan", "akan"]
+
+def get_index(tile_id: int) -> int:
+    '''
+    Function: get_index()
+
+    ## Description
+
+    Returns the 34-index of a tile ID (1m..9m, 1p..9p, 1s..9s, 1z..7z),
+    red fives having the index of fives.
+    '''
+    if tile_id > 50:
+        tile_id = (tile_id - 50) * 10 + 5
+    return (tile_id // 10 - 1) * 9 + tile_id % 10 - 1
+
+def get_melds(obs: dict, player_idx: int) -> list:
+    '''
+    Function: get_melds()
+
+    ## Description
+
+    Returns the melds of a player in an observation. Observations made by
+    the engine carry the `Meld`s; observations rebuilt from json or from
+    the wire only have the call strings, which are parsed.
+    '''
+    melds = obs.get("melds")
+    if melds is not None and len(melds[player_idx]) == len(obs["calls"][player_idx]) and all(isinstance(meld, Meld) for meld in melds[player_idx]):
+        return melds[player_idx]
+    return [Meld.from_string(call, player_idx, players=len(obs["calls"])) for call in obs["calls"][player_idx]]
+
+class Meld:
+    '''
+    Class: Meld
+
+    ## Description
+
+    A call of a player.
+
+    ## Details
+
+    - `type`: `"chii"`, `"pon"`, `"kan"` (kakan), `"mkan"` (minkan) or
+      `"akan"` (ankan)
+    - `tile`: the 34-index of the lowest tile
+    - `red`: the number of red fives in the meld
+    - `from_seat`: the seat the tile was called from, `None` for ankan
+    - `called`: the tile ID of the called tile, `None` for ankan
+    - `tiles`: the tile IDs of the meld, in the order of the call string
+    - `string`: the call string, see `Action`
+    '''
+    __slots__ = ["type", "tile", "red", "from_seat", "called", "tiles", "string"]
+
+    def __init__(self, type: str, tiles: tuple, from_seat: int = None, called: int = None, string: str = None):
+        '''
+        Constructor: __init__
+
+        ## Parameters
+
+        - `type`: `str`
+            The meld type.
+        - `tiles`: `tuple`
+            The tile IDs of the meld.
+        - `from_seat`: `int` or `None`
+            The seat the tile was called from.
+        - `called`: `int` or `None`
+            The tile ID of the called tile.
+        - `string`: `str` or `None`
+            The call string. Defaults to the tiles with the marker of the
+            type before the first tile.
+        '''
+        assert type in MARKERS, "Invalid meld type {}".format(type)
+        self.type = type
+        self.tiles = tuple(tiles)
+        self.tile = min(get_index(id) for id in self.tiles)
+        self.red = sum(1 for id in self.tiles if id > 50)
+        self.from_seat = from_seat
+        self.called = called
+        self.string = string if string is not None else MARKERS[type] + "".join(str(id) for id in self.tiles)
+
+    @classmethod
+    def from_string(cls, call: str, player_idx: int = None, type: str = None, players: int = 4):
+        '''
+        Method: from_string()
+
+        ## Description
+
+        Parses a call string.
+
+        ## Parameters
+
+        - `call`: `str`
+            The call string, see `Action`.
+        - `player_idx`: `int` or `None`
+            The seat of the calling player. Without it, `from_seat` is
+            `None`.
+        - `type`: `str` or `None`
+            The meld type. By default, it is read from the marker, as the
+            action type is not always recoverable from the string (e.g.
+            kakan strings built from pon strings keep the `"p"`).
+        - `players`: `int`
+            The number of players.
+
+        ## Returns
+
+        `Meld`
+        '''
+        tiles = []
+        marker = None
+        position = 0
+        i = 0
+        while i < len(call):
+            if call[i].isdigit():
+                tiles.append(int(call[i:i + 2]))
+                i += 2
+            else:
+                marker = call[i]
+                position = len(tiles)
+                i += 1
+        if type is None:
+            type = {"c": "chii", "k": "kan", "m": "mkan", "a": "akan"}.get(marker, "pon" if len(tiles) == 3 else "kan")
+        if type == "akan":
+            return cls(type, tiles, string=call)
+        called = tiles[position] if position < len(tiles) else tiles[-1]
+        from_seat = None
+        if player_idx is not None:
+            if type == "chii" or position == 0:
+                # The previous player
+                from_seat = (player_idx - 1) % players
+            elif position == 1:
+                # The opposing player
+                from_seat = (player_idx + 2) % players
+            else:
+                # The next player
+                from_seat = (player_idx + 1) % players
+        return cls(type, tiles, from_seat, called, call)
+
+    def is_kan(self) -> bool:
+        return self.type in KAN_TYPES
+
+    def is_open(self) -> bool:
+        return self.type != "akan"
+
+    def get_tiles(self) -> list:
+        '''
+        Method: get_tiles()
+
+        ## Description
+
+        Returns the tiles of the meld as `Tile`s.
+        '''
+        return [Tile(id) for id in self.tiles]
+
+    def get_136_array(self) -> list:
+        '''
+        Method: get_136_array()
+
+        ## Description
+
+        Returns the tiles of the meld in the 136 format of
+        `Deck.get_136_array()`.
+        '''
+        seen = {}
+        array = []
+        for id in self.tiles:
+            array.append(Tile.mapping_136[id] + seen.get(id, 0))
+            seen[id] = seen.get(id, 0) + 1
+        return array
+
+    def to_string(self) -> str:
+        return self.string
+
+    def to_json(self) -> str:
+        return self.string
+
+    def __str__(self):
+        return self.string
+
+    def __repr__(self):
+        return "Meld('{}', {})".format(self.type, self.string)
+
+    def __eq__(self, other):
+        return isinstance(other, Meld) and self.type == other.type and self.tiles == other.tiles and self.from_seat == other.from_seat
+
+    def __hash__(self):
+        return hash((self.type, self.tiles, self.from_seat))
@@ -0,0 +1,360 @@
+'''
+File: metrics.py
+Author: Kunologist
+Description:
+    Counters and histograms of long-running self-play, fed by the game
+    engine, exported in the Prometheus text exposition format and
+    aggregated across worker processes.
+'''
+
+import os
+import json
+import glob
+import bisect
+import threading
+
+# Upper bounds of the agent latency buckets, in seconds
+LATENCY_BUCKETS = [0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0]
+# Upper bounds of the hand length buckets, in discards
+HAND_LENGTH_BUCKETS = [10, 20, 30, 40, 50, 60, 70, 80, 90, 100, 120, 140]
+
+# Metrics reported by the engine, and their help texts
+HELP = {
+    "games_started_total": "Games initialized.",
+    "games_finished_total": "Games finished, by reason (tsumo, ron, wall_empty, nagashi_mangan, suukaikan, ...).",
+    "decisions_total": "Actions queried from players.",
+    "decisions_skipped_total": "Passive decisions skipped by fast-forward, noop being the only legal action.",
+    "rule_errors_total": "MahjongRuleError raised while stepping a game.",
+    "agent_latency_seconds": "Time taken by a player to return an action.",
+    "hand_length": "Discards made in a finished game."
+}
+
+def _key(name: str, labels: dict) -> str:
+    if not labels:
+        return name
+    return "{}{{{}}}".format(name, ",".join('{}="{}"'.format(key, labels[key]) for key in sorted(labels)))
+
+def _base_name(key: str) -> str:
+    return key.split("{", 1)[0]
+
+class MetricsRegistry:
+    '''
+    Class: MetricsRegistry
+
+    ## Description
+
+    Holds the counters and histograms of one process. Pass it to
+    `MahjongGame(ruleset, metrics=registry)` to have the engine count games,
+    decisions, outcomes, rule errors, agent latency and hand length.
+
+    ## Details
+
+    A registry is a few dicts of numbers behind one lock, so updating it
+    costs about as much as a dict lookup. Every worker process keeps its
+    own registry and periodically calls `write()` to store a snapshot in a
+    shared directory; `collect()` sums the snapshots of all workers. Rates
+    such as games or decisions per second are left to the consumer (e.g.
+    Prometheus `rate()`), as counters only ever increase.
+
+    ## Examples
+
+    ```python
+    >>> metrics = MetricsRegistry()
+    >>> game = MahjongGame(ruleset, metrics=metrics)
+    >>> print(metrics.render())
+    ```
+    '''
+
+    def __init__(self, prefix: str = "mahjong"):
+        '''
+        Constructor: __init__
+
+        ## Parameters
+
+        - `prefix`: `str`
+            Prepended to every metric name when rendered.
+        '''
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        '''
+        Method: inc()
+
+        ## Description
+
+        Increments a counter, e.g. `inc("games_finished_total", reason="ron")`.
+        '''
+        key = _key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: list = LATENCY_BUCKETS):
+        '''
+        Method: observe()
+
+        ## Description
+
+        Adds a value to a histogram. `buckets` are the upper bounds of the
+        buckets and are fixed by the first observation.
+        '''
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = {
+                    "buckets": list(buckets),
+                    "counts": [0] * (len(buckets) + 1),
+                    "sum": 0.0,
+                    "count": 0
+                }
+            histogram["counts"][bisect.bisect_left(histogram["buckets"], value)] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def get(self, name: str, **labels) -> float:
+        '''
+        Method: get()
+
+        ## Description
+
+        Returns the value of a counter, `0` if it was never incremented.
+        '''
+        return self.counters.get(_key(name, labels), 0)
+
+    def snapshot(self) -> dict:
+        '''
+        Method: snapshot()
+
+        ## Description
+
+        Returns a json-serializable copy of all metrics.
+        '''
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {name: {
+                    "buckets": list(histogram["buckets"]),
+                    "counts": list(histogram["counts"]),
+                    "sum": histogram["sum"],
+                    "count": histogram["count"]
+                } for name, histogram in self.histograms.items()}
+            }
+
+    def write(self, directory: str):
+        '''
+        Method: write()
+
+        ## Description
+
+        Stores the snapshot of this process in `directory`, as
+        `metrics-<pid>.json`. The file is replaced atomically, so a reader
+        never sees a partial snapshot.
+        '''
+        os.makedirs(directory, exist_ok=True)
+        filename = os.path.join(directory, "metrics-{}.json".format(os.getpid()))
+        with open(filename + ".tmp", "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(filename + ".tmp", filename)
+
+    def render(self, snapshot: dict = None) -> str:
+        '''
+        Method: render()
+
+        ## Description
+
+        Renders a snapshot (by default, the one of this registry) in the
+        Prometheus text exposition format.
+        '''
+        if snapshot is None:
+            snapshot = self.snapshot()
+        lines = []
+        documented = set()
+        def header(name, kind):
+            if name not in documented:
+                documented.add(name)
+                if name in HELP:
+                    lines.append("# HELP {}_{} {}".format(self.prefix, name, HELP[name]))
+                lines.append("# TYPE {}_{} {}".format(self.prefix, name, kind))
+        for key in sorted(snapshot["counters"]):
+            header(_base_name(key), "counter")
+            lines.append("{}_{} {}".format(self.prefix, key, snapshot["counters"][key]))
+        for name in sorted(snapshot["histograms"]):
+            histogram = snapshot["histograms"][name]
+            header(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(histogram["buckets"] + ["+Inf"], histogram["counts"]):
+                cumulative += count
+                lines.append('{}_{}_bucket{{le="{}"}} {}'.format(self.prefix, name, bound, cumulative))
+            lines.append("{}_{}_sum {}".format(self.prefix, name, histogram["sum"]))
+            lines.append("{}_{}_count {}".format(self.prefix, name, histogram["count"]))
+        return "\n".join(lines) + "\n"
+
+def merge(snapshots: list) -> dict:
+    '''
+    Function: merge()
+
+    ## Description
+
+    Sums snapshots of several registries.
+
+    ## Raises
+
+    - `ValueError`:
+        If the same histogram has different buckets in two snapshots.
+    '''
+    merged = {"counters": {}, "histograms": {}}
+    for snapshot in snapshots:
+        for key, value in snapshot["counters"].items():
+            merged["counters"][key] = merged["counters"].get(key, 0) + value
+        for name, histogram in snapshot["histograms"].items():
+            target = merged["histograms"].get(name)
+            if target is None:
+                merged["histograms"][name] = {
+                    "buckets": list(histogram["buckets"]),
+                    "counts": list(histogram["counts"]),
+                    "sum": histogram["sum"],
+                    "count": histogram["count"]
+                }
+                continue
+            if target["buckets"] != histogram["buckets"]:
+                raise ValueError("Histogram {} has different buckets in two snapshots".format(name))
+            target["counts"] = [a + b for a, b in zip(target["counts"], histogram["counts"])]
+            target["sum"] += histogram["sum"]
+            target["count"] += histogram["count"]
+    return merged
+
+def collect(directory: str, skip_pid: int = None) -> dict:
+    '''
+    Function: collect()
+
+    ## Description
+
+    Merges the snapshots written by `MetricsRegistry.write()` in a
+    directory. Files that cannot be read are skipped, as is the file of
+    process `skip_pid`.
+    '''
+    snapshots = []
+    skipped = os.path.join(directory, "metrics-{}.json".format(skip_pid))
+    for filename in glob.glob(os.path.join(directory, "metrics-*.json")):
+        if filename == skipped:
+            continue
+        try:
+            with open(filename) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return merge(snapshots)
+
+class MetricsServer:
+    '''
+    Class: MetricsServer
+
+    ## Description
+
+    Serves `GET /metrics` in the Prometheus text exposition format from a
+    background thread, using only the standard library.
+
+    ## Examples
+
+    ```python
+    >>> server = MetricsServer(registry, directory="metrics/", port=9108)
+    >>> server.start()
+    'http://localhost:9108/'
+    ```
+    '''
+
+    def __init__(self, registry: MetricsRegistry = None, directory: str = None, host: str = "localhost", port: int = 0):
+        '''
+        Constructor: __init__
+
+        ## Parameters
+
+        - `registry`: `MetricsRegistry` or `None`
+            The registry of this process.
+        - `directory`: `str` or `None`
+            A directory of worker snapshots to merge in, see `collect()`.
+        - `host`: `str`
+            The host to bind.
+        - `port`: `int`
+            The port to bind. `0` picks a free port.
+        '''
+        assert registry is not None or directory is not None, "A registry or a directory is required"
+        self.registry = registry if registry is not None else MetricsRegistry()
+        self.directory = directory
+        self.host = host
+        self.port = port
+        self.httpd = None
+
+    def render(self) -> str:
+        '''
+        Method: render()
+
+        ## Description
+
+        Renders the metrics of the registry and of the worker directory.
+        The snapshot this process may have written to the directory is
+        not counted twice.
+        '''
+        snapshots = [self.registry.snapshot()]
+        if self.directory is not None:
+            snapshots.append(collect(self.directory, skip_pid=os.getpid()))
+        return self.registry.render(merge(snapshots))
+
+    def start(self) -> str:
+        '''
+        Method: start()
+
+        ## Description
+
+        Starts serving in a background thread.
+
+        ## Returns
+
+        `str`
+            The base url of the server.
+        '''
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics_server = self
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics_server.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+        self.httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        return self.get_url()
+
+    def stop(self):
+        '''
+        Method: stop()
+
+        ## Description
+
+        Stops the server and releases the port.
+        '''
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def get_url(self) -> str:
+        '''
+        Method: get_url()
+
+        ## Description
+
+        Returns the base url of the server.
+        '''
+        return "http://{}:{}/".format(self.host, self.port)
@@ -10,8 +10,11 @@ from env import action
 from env.deck import Deck
 from env.tiles import Tile
 from env.action import Action
+from env.meld import get_melds
 from env.agent import Agent
-from env.utils import check_reach, check_agari, check_tenpai
+from env.utils import check_reach, check_agari, check_tenpai, get_tile_counts, get_waits_counts
+from env.discards import is_furiten
+from env.yaku import has_yaku
 
 def can_chii(tile_list, incoming_tile, obs):
     '''
@@ -303,11 +306,13 @@ class Player():
         assert isinstance(is_manual, bool)
         self.name = name
         self.is_manual = is_manual
+        # Set by the game, see `MahjongGame.set_player()`
+        self.ruleset = None
         if not is_manual:
             assert isinstance(agent, Agent)
             self.agent = agent
     
-    def act(self, obs: dict):
+    def act(self, obs: dict, profiler = None):
         '''
         Method: act(obs)
         
@@ -321,19 +326,30 @@ class Player():
         
         - `obs`: `dict`
             The observation of the game.
+        - `profiler`: `StepProfiler` or `None`
+            If given, the `action_space` and `query` phases are timed.
         
         ## Returns
 
         `Action`
             The action that the agent wants to perform.
         '''
+        if profiler is not None:
+            t = profiler.clock()
         # Get action space
         action_space = self.get_action_space(obs)
+        if profiler is not None:
+            now = profiler.clock()
+            profiler.add("action_space", now - t)
+            t = now
         # Query for action
         if self.is_manual:
-            return self.manual_act(obs, action_space)
+            action = self.manual_act(obs, action_space)
         else:
-            return self.agent.query(obs, action_space)
+            action = self.agent.query(obs, action_space)
+        if profiler is not None:
+            profiler.add("query", profiler.clock() - t)
+        return action
     
     def manual_act(self, obs, action_space):
         '''
@@ -371,7 +387,7 @@ class Player():
         p = -1
         for discarded_tiles in obs["discarded_tiles"]:
             p += 1
-            s += "> P{}: {}\n".format(p, Deck(discarded_tiles).get_unicode_str())
+            s += "> P{}: {}\n".format(p, Deck(list(discarded_tiles)).get_unicode_str())
 
         s += "Calls:\n"
         p = -1
@@ -448,6 +464,7 @@ class Player():
         player_idx = obs["player_idx"]
         hand = obs["hand"].get_tiles().copy()
         calls = obs["calls"][player_idx]
+        melds = get_melds(obs, player_idx)
         # Check if the player is active
         if obs["player_state"] == "active":
 
@@ -459,8 +476,9 @@ class Player():
             if obs["reach"][player_idx]:
                 # If the player is in REACH state, he can only discard
                 action_space.append(Action.DISCARD())
-                # Check for tsumo
-                if check_agari(hand, calls): # and han_count(hand, calls) > 0:
+                # Check for tsumo, with the incoming tile
+                hand.append(obs["incoming_tile"])
+                if check_agari(hand, calls) and has_yaku(hand, melds, obs["incoming_tile"], obs, True, self.ruleset):
                     action_space.append(Action.TSUMO())
             else:                
                 # Default: allow discard
@@ -476,12 +494,11 @@ class Player():
                 # Player with incoming tile can call: kan, akan, discard, replace, reach, tsumo
 
                 # Check for kan
-                for call in calls:
-                    if call.find("p") != -1:
+                for meld in melds:
+                    if meld.type == "pon":
                         # Pon found, check for kan
-                        tile_id = int(call[-2:])
-                        if Tile(tile_id) in hand:
-                            action_space.append(Action.KAN(call))
+                        if Tile(meld.tiles[-1]) in hand:
+                            action_space.append(Action.KAN(meld.to_string()))
                 
                 # Check for akan
                 same_tile = 1
@@ -510,16 +527,16 @@ class Player():
                                 action_space.append(Action.REACH(reach_discard_tile.get_id()))
                 
                 # Check for tsumo
-                if check_agari(hand, calls): # and han_count(hand, calls) > 0:
+                if check_agari(hand, calls) and has_yaku(hand, melds, obs["incoming_tile"], obs, True, self.ruleset):
                     action_space.append(Action.TSUMO())
         
         elif obs["player_state"] == "end_game":
 
             # Player about to end game can call: ten, noten
 
-            # Check for ten
-
-            if check_tenpai(hand, calls):
+            # Check for ten, which the engine evaluates for all hands at
+            # once
+            if obs["tenpai"] if "tenpai" in obs else check_tenpai(hand, calls):
                 action_space.append(Action.TEN())
 
             # Always allow noten
@@ -555,7 +572,10 @@ class Player():
                 _, yaku = check_agari(hand, calls)
                 # Only kokushi mosou can be ronned upon ankan
                 if yaku == "kokushi_musou" or not "is_ankan" in obs:
-                    action_space.append(Action.RON())
+                    # No ron on any wait the player discarded or passed
+                    counts = get_tile_counts(hand[:-1])
+                    if (counts is None or not is_furiten(obs, get_waits_counts(counts))) and has_yaku(hand, melds, incoming_tile, obs, False, self.ruleset):
+                        action_space.append(Action.RON())
             
             # Check for chankan
             # TODO
@@ -0,0 +1,207 @@
+'''
+File: profiler.py
+Author: Kunologist
+Description:
+    Opt-in timing of the phases of `MahjongGame.step()`, with monotonic
+    nanosecond counters and power-of-two histograms.
+'''
+
+import json
+from time import perf_counter_ns
+
+# Phases timed by MahjongGame.step(), in order
+PHASES = ["draw", "observation", "action_space", "query", "perform_action", "passive", "record", "step"]
+
+# Histogram bucket b counts durations d with 2 ** (b - 1) <= d < 2 ** b ns
+BUCKETS = 64
+
+class PhaseStats:
+    '''
+    Class: PhaseStats
+
+    ## Description
+
+    Count, total, maximum and log2 histogram of the durations of one phase.
+    '''
+    __slots__ = ["count", "total_ns", "max_ns", "histogram"]
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.histogram = [0] * BUCKETS
+
+    def add(self, elapsed_ns: int):
+        self.count += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        self.histogram[min(elapsed_ns.bit_length(), BUCKETS - 1)] += 1
+
+    def percentile(self, q: float) -> int:
+        '''
+        Method: percentile()
+
+        ## Description
+
+        Estimates a percentile from the histogram. The upper bound of the
+        bucket holding the percentile is returned, so the estimate is at
+        most twice the exact value.
+
+        ## Returns
+
+        `int`
+            Nanoseconds.
+        '''
+        if self.count == 0:
+            return 0
+        rank = q * self.count
+        seen = 0
+        for bucket in range(BUCKETS):
+            seen += self.histogram[bucket]
+            if seen >= rank and seen > 0:
+                return min(1 << bucket, self.max_ns)
+        return self.max_ns
+
+    def to_json(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ms": self.total_ns / 1e6,
+            "mean_us": self.total_ns / self.count / 1e3 if self.count > 0 else 0.0,
+            "p50_us": self.percentile(0.5) / 1e3,
+            "p90_us": self.percentile(0.9) / 1e3,
+            "p99_us": self.percentile(0.99) / 1e3,
+            "max_us": self.max_ns / 1e3
+        }
+
+class StepProfiler:
+    '''
+    Class: StepProfiler
+
+    ## Description
+
+    Collects the time spent in every phase of `MahjongGame.step()`. Pass
+    one to the game to enable profiling; without it, the game only checks
+    `self.profiler is None` once per phase.
+
+    ## Details
+
+    The phases are:
+
+    - `draw`: drawing from the wall, including rinshan draws and the
+      exhaustive draw (`MahjongGame.exhaustive_draw()`)
+    - `observation`: building the observation of the active player
+    - `action_space`: `Player.get_action_space()`, for every player asked
+    - `query`: `Agent.query()`, for every player asked
+    - `perform_action`: performing the action of the active player
+    - `passive`: the whole loop asking the passive players, which also
+      includes their `action_space` and `query` time
+    - `record`: `MahjongGame.record()`
+    - `step`: the whole step
+
+    A phase is recorded even if the game ends in it, e.g. by a ron in
+    the `passive` phase.
+
+    Statistics are kept for the current game (reset by
+    `MahjongGame.initialize_game()`) and for all games seen so far, so one
+    profiler can be shared by many games.
+
+    ## Examples
+
+    ```python
+    >>> profiler = StepProfiler()
+    >>> game = MahjongGame(ruleset, profiler=profiler)
+    >>> game.play()
+    >>> profiler.summary()["query"]["mean_us"]
+    ```
+    '''
+
+    def __init__(self):
+        self.games = 0
+        self.game = {phase: PhaseStats() for phase in PHASES}
+        self.total = {phase: PhaseStats() for phase in PHASES}
+
+    def new_game(self):
+        '''
+        Method: new_game()
+
+        ## Description
+
+        Starts the statistics of a new game. The totals are kept.
+        '''
+        self.games += 1
+        self.game = {phase: PhaseStats() for phase in PHASES}
+
+    def add(self, phase: str, elapsed_ns: int):
+        '''
+        Method: add()
+
+        ## Description
+
+        Records a duration of a phase, in nanoseconds.
+        '''
+        self.game[phase].add(elapsed_ns)
+        self.total[phase].add(elapsed_ns)
+
+    def clock(self) -> int:
+        '''
+        Method: clock()
+
+        ## Description
+
+        The monotonic clock used for the durations, in nanoseconds.
+        '''
+        return perf_counter_ns()
+
+    def summary(self, scope: str = "total") -> dict:
+        '''
+        Method: summary()
+
+        ## Description
+
+        Returns the aggregates of every phase.
+
+        ## Parameters
+
+        - `scope`: `str`
+            `"total"` for all games, `"game"` for the current game.
+
+        ## Returns
+
+        `dict`
+            Per phase: `count`, `total_ms`, `mean_us`, `p50_us`, `p90_us`,
+            `p99_us` and `max_us`.
+        '''
+        assert scope in ["total", "game"], "Invalid scope {}, expected total or game".format(scope)
+        stats = self.total if scope == "total" else self.game
+        return {phase: stats[phase].to_json() for phase in PHASES}
+
+    def get_histogram(self, phase: str, scope: str = "total") -> list:
+        '''
+        Method: get_histogram()
+
+        ## Description
+
+        Returns the non-empty buckets of the histogram of a phase as
+        `(upper_bound_ns, count)` tuples.
+        '''
+        stats = self.total if scope == "total" else self.game
+        histogram = stats[phase].histogram
+        return [(1 << bucket, histogram[bucket]) for bucket in range(BUCKETS) if histogram[bucket] > 0]
+
+    def dump(self, filename: str, scope: str = "game"):
+        '''
+        Method: dump()
+
+        ## Description
+
+        Writes the summary and histograms of the current game (or of all
+        games) to a json file.
+        '''
+        with open(filename, "w") as f:
+            json.dump({
+                "scope": scope,
+                "games": self.games,
+                "phases": self.summary(scope),
+                "histograms": {phase: self.get_histogram(phase, scope) for phase in PHASES}
+            }, f, indent=2)
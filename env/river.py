@@ -0,0 +1,118 @@
+'''
+File: river.py
+Author: Kunologist
+Description:
+    The river of a seat as two fixed-capacity byte arrays, the tile IDs of
+    the discards and a flag byte per discard, which the game engine fills
+    as tiles are discarded and called.
+'''
+
+# Flags of a discard
+FLAG_TSUMOGIRI = 1
+FLAG_REACH = 2
+FLAG_CALLED = 4
+
+# No seat discards more than its draws and calls, well below this
+RIVER_CAPACITY = 32
+
+class River:
+    '''
+    Class: River
+
+    ## Description
+
+    The discards of a seat. `ids[:length]` are the tile IDs and
+    `flags[:length]` their flags: `FLAG_TSUMOGIRI` if the drawn tile was
+    discarded, `FLAG_REACH` for the tile discarded with reach and
+    `FLAG_CALLED` if another player called the tile.
+
+    ## Details
+
+    The arrays are allocated once, with `RIVER_CAPACITY` bytes, and the
+    bytes past `length` are zero. `version` changes whenever the river
+    does.
+    '''
+    __slots__ = ["ids", "flags", "length", "version"]
+
+    def __init__(self, capacity: int = RIVER_CAPACITY):
+        '''
+        Constructor: __init__
+
+        ## Parameters
+
+        - `capacity`: `int`
+            The maximum number of discards.
+        '''
+        self.ids = bytearray(capacity)
+        self.flags = bytearray(capacity)
+        self.length = 0
+        self.version = 0
+
+    def __len__(self):
+        return self.length
+
+    def append(self, tile_id: int, flags: int = 0):
+        '''
+        Method: append()
+
+        ## Description
+
+        Adds a discard.
+
+        ## Raises
+
+        - `IndexError`:
+            If the river is full.
+        '''
+        if self.length == len(self.ids):
+            raise IndexError("River is full ({} discards)".format(self.length))
+        self.ids[self.length] = tile_id
+        self.flags[self.length] = flags
+        self.length += 1
+        self.version += 1
+
+    def mark_called(self):
+        '''
+        Method: mark_called()
+
+        ## Description
+
+        Marks the last discard as called by another player.
+        '''
+        self.flags[self.length - 1] |= FLAG_CALLED
+        self.version += 1
+
+    def get_flags(self) -> list:
+        '''
+        Method: get_flags()
+
+        ## Description
+
+        Returns the flags of the discards, as a `list` of `int`s.
+        '''
+        return list(self.flags[:self.length])
+
+def get_river_array(rivers: list):
+    '''
+    Function: get_river_array()
+
+    ## Description
+
+    Returns the rivers of all seats as one `uint8` NumPy array of shape
+    `(players, 2, capacity)`, the tile IDs then the flags of every seat,
+    zero-padded. The bytes of the rivers are copied in one go, without
+    going through `Tile`s; the array is read-only.
+
+    ## Parameters
+
+    - `rivers`: `list` of `River`
+        The rivers, e.g. `game.rivers`.
+
+    ## Returns
+
+    `numpy.ndarray`
+    '''
+    import numpy as np
+
+    data = b"".join([array for river in rivers for array in (river.ids, river.flags)])
+    return np.frombuffer(data, dtype=np.uint8).reshape(len(rivers), 2, len(rivers[0].ids))
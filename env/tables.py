@@ -0,0 +1,220 @@
+'''
+File: tables.py
+Author: Kunologist
+Description:
+    Per-suit lookup tables of the hand evaluator. A suit is encoded by the
+    counts of its tiles as a base-5 number, and the tables tell whether
+    those tiles split into melds, or into melds and one pair. The tables
+    are stored in a versioned binary file next to this module and are
+    memory-mapped, so all processes share the same pages.
+
+    python -m env.tables --output env/data/agari_tables.bin
+'''
+
+import os
+import mmap
+import zlib
+import struct
+import itertools
+
+# Layout of the file: header, number suit table, honor table
+MAGIC = b"MJTABLES"
+VERSION = 1
+HEADER = struct.Struct("<8sIIII") # magic, version, number size, honor size, crc32 of both tables
+NUMBER_SIZE = 5 ** 9
+HONOR_SIZE = 5 ** 7
+
+# Flags of a suit pattern
+MELDS = 1 # the tiles split into sets and runs only
+PAIR = 2 # the tiles split into sets, runs and one pair
+
+DEFAULT_FILENAME = os.path.join(os.path.dirname(os.path.realpath(__file__)), "data", "agari_tables.bin")
+
+# Powers of 5, the weight of every rank in the index of a suit
+POWERS = [5 ** i for i in range(9)]
+
+def _mark(table: bytearray, ranks: int, runs: bool):
+    # Every meld is a list of (rank, count) pairs
+    melds = [[(rank, 3)] for rank in range(ranks)]
+    if runs:
+        melds += [[(rank, 1), (rank + 1, 1), (rank + 2, 1)] for rank in range(ranks - 2)]
+    for size in range(5):
+        for combination in itertools.combinations_with_replacement(melds, size):
+            counts = [0] * ranks
+            for meld in combination:
+                for rank, count in meld:
+                    counts[rank] += count
+            if max(counts, default=0) > 4:
+                continue
+            index = sum(count * POWERS[rank] for rank, count in enumerate(counts))
+            table[index] |= MELDS
+            for rank in range(ranks):
+                if counts[rank] <= 2:
+                    table[index + 2 * POWERS[rank]] |= PAIR
+
+def build_tables() -> tuple:
+    '''
+    Function: build_tables()
+
+    ## Description
+
+    Builds the tables in memory by enumerating every combination of up to
+    four melds, with and without a pair.
+
+    ## Returns
+
+    `tuple`
+        The number suit table (`5 ** 9` bytes) and the honor table
+        (`5 ** 7` bytes), as `bytearray`s indexed by `get_suit_index()`.
+    '''
+    number = bytearray(NUMBER_SIZE)
+    honor = bytearray(HONOR_SIZE)
+    _mark(number, 9, runs=True)
+    _mark(honor, 7, runs=False)
+    return number, honor
+
+def save_tables(filename: str = DEFAULT_FILENAME):
+    '''
+    Function: save_tables()
+
+    ## Description
+
+    Builds the tables and writes them to `filename`, with a header holding
+    the format version and a CRC32 of the tables.
+    '''
+    number, honor = build_tables()
+    crc = zlib.crc32(honor, zlib.crc32(number))
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(filename + ".tmp", "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, NUMBER_SIZE, HONOR_SIZE, crc))
+        f.write(number)
+        f.write(honor)
+    os.replace(filename + ".tmp", filename)
+
+class AgariTables:
+    '''
+    Class: AgariTables
+
+    ## Description
+
+    The number suit and honor tables, either memory-mapped from a file or
+    built in memory. Index them with `get_suit_index()`.
+
+    ## Details
+
+    `source` is `"file"` or `"built"`.
+    '''
+
+    def __init__(self, number, honor, source: str, buffer = None):
+        self.number = number
+        self.honor = honor
+        self.source = source
+        self.buffer = buffer
+
+    @classmethod
+    def load(cls, filename: str = DEFAULT_FILENAME, verify: bool = True):
+        '''
+        Method: load()
+
+        ## Description
+
+        Memory-maps a file written by `save_tables()`.
+
+        ## Raises
+
+        - `OSError`:
+            If the file cannot be read.
+        - `ValueError`:
+            If the file is not a table file, has another version or size,
+            or (with `verify`) its CRC32 does not match.
+        '''
+        with open(filename, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if len(buffer) != HEADER.size + NUMBER_SIZE + HONOR_SIZE:
+                raise ValueError("Invalid table file {}, unexpected size {}".format(filename, len(buffer)))
+            magic, version, number_size, honor_size, crc = HEADER.unpack_from(buffer)
+            if magic != MAGIC:
+                raise ValueError("Invalid table file {}".format(filename))
+            if version != VERSION or number_size != NUMBER_SIZE or honor_size != HONOR_SIZE:
+                raise ValueError("Table file {} has version {}, expected {}".format(filename, version, VERSION))
+            if verify:
+                with memoryview(buffer) as view:
+                    if zlib.crc32(view[HEADER.size:]) != crc:
+                        raise ValueError("Table file {} is corrupted, CRC32 mismatch".format(filename))
+        except Exception:
+            buffer.close()
+            raise
+        view = memoryview(buffer)
+        return cls(view[HEADER.size:HEADER.size + NUMBER_SIZE], view[HEADER.size + NUMBER_SIZE:], "file", buffer)
+
+# Loaded on first use (or by env.warmup())
+_tables = None
+
+def get_tables() -> AgariTables:
+    '''
+    Function: get_tables()
+
+    ## Description
+
+    Returns the shared tables, loading them on the first call. The file
+    named by `$MAHJONG_TABLES` (by default, the file shipped with the
+    package) is memory-mapped; if it is missing or fails its checks, the
+    tables are built in memory instead.
+    '''
+    global _tables
+    if _tables is None:
+        try:
+            _tables = AgariTables.load(os.environ.get("MAHJONG_TABLES", DEFAULT_FILENAME))
+        except (OSError, ValueError):
+            number, honor = build_tables()
+            _tables = AgariTables(number, honor, "built")
+    return _tables
+
+def get_suit_index(counts: list, start: int, ranks: int) -> int:
+    '''
+    Function: get_suit_index()
+
+    ## Description
+
+    Returns the table index of the suit whose counts are
+    `counts[start:start + ranks]`.
+    '''
+    index = 0
+    for rank in range(ranks - 1, -1, -1):
+        index = index * 5 + counts[start + rank]
+    return index
+
+def is_agari_counts(counts: list) -> bool:
+    '''
+    Function: is_agari_counts()
+
+    ## Description
+
+    Checks whether 34 tile counts (1m..9m, 1p..9p, 1s..9s, 1z..7z) split
+    into melds and exactly one pair. Seven pairs and thirteen orphans are
+    not considered, and neither are more than four tiles of a kind.
+    '''
+    if sum(counts) % 3 != 2 or max(counts) > 4:
+        return False
+    tables = get_tables()
+    pairs = 0
+    for start, ranks, table in [(0, 9, tables.number), (9, 9, tables.number), (18, 9, tables.number), (27, 7, tables.honor)]:
+        remainder = sum(counts[start:start + ranks]) % 3
+        if remainder == 1:
+            return False
+        if remainder == 2:
+            pairs += 1
+        if pairs > 1 or not table[get_suit_index(counts, start, ranks)] & (PAIR if remainder == 2 else MELDS):
+            return False
+    return True
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Generates the agari lookup tables.")
+    parser.add_argument("--output", type=str, default=DEFAULT_FILENAME)
+    args = parser.parse_args()
+    save_tables(args.output)
+    print("Tables version {} written to {}".format(VERSION, args.output))
@@ -6,13 +6,17 @@ Description:
     tile in the mahjong game.
 '''
 
-import random
+import itertools
 
 man_tiles = ["🀇", "🀈", "🀉", "🀊", "🀋", "🀌", "🀍", "🀎", "🀏"]
 pin_tiles = ["🀙", "🀚", "🀛", "🀜", "🀝", "🀞", "🀟", "🀠", "🀡"]
 sou_tiles = ["🀐", "🀑", "🀒", "🀓", "🀔", "🀕", "🀖", "🀗", "🀘"]
 char_tiles = ["🀀", "🀁", "🀂", "🀃", "🀆", "🀅", "🀄"]
 
+# Distinguishes tile objects of the same ID. A counter does not touch any
+# random number generator, so creating tiles cannot disturb a seeded game.
+_hidden_ids = itertools.count(1)
+
 class Tile:
     '''
     Class: Tile
@@ -122,7 +126,7 @@ class Tile:
         >>> tile_r5s = tile('0s')
         ```
         '''
-        self.hidden_id = random.random()
+        self.hidden_id = next(_hidden_ids)
         if isinstance(constructor, Tile):
             self.id = constructor.id
         elif isinstance(constructor, str):
@@ -600,7 +604,7 @@ class Tile:
 
         - `int`: hash of the tile
         '''
-        return hash(self.id + self.hidden_id)
+        return hash((self.id, self.hidden_id))
     
     def to_json(self):
         return {
@@ -0,0 +1,115 @@
+'''
+File: unseen.py
+Author: Kunologist
+Description:
+    Per-seat counts of the tiles a player has not seen yet, kept up to date
+    by the game engine on every draw, discard, call and dora reveal.
+'''
+
+from env.meld import Meld, get_index
+
+class UnseenCounter:
+    '''
+    Class: UnseenCounter
+
+    ## Description
+
+    The number of tiles of every kind (34 counts, 1m..9m, 1p..9p, 1s..9s,
+    1z..7z, red fives counted as fives) that each seat has not seen: not in
+    its hand, in a river, in an open meld or among the dora indicators.
+
+    ## Details
+
+    A called tile is counted once, when it is discarded. `versions[seat]`
+    changes whenever the counts of the seat do, so views of the counts can
+    be kept until then.
+    '''
+    __slots__ = ["counts", "versions"]
+
+    def __init__(self, hands: list, dora_indicators: list = []):
+        '''
+        Constructor: __init__
+
+        ## Parameters
+
+        - `hands`: `list`
+            The starting hand of every seat, as `Deck`s or lists of `Tile`s.
+        - `dora_indicators`: `list`
+            The revealed dora indicators.
+        '''
+        self.counts = [[4] * 34 for _ in hands]
+        self.versions = [0] * len(hands)
+        for seat, hand in enumerate(hands):
+            for tile in hand:
+                self.counts[seat][get_index(tile.get_id())] -= 1
+        for tile in dora_indicators:
+            self.dora(tile)
+
+    def _reveal(self, tile_id: int, skip: int = None):
+        index = get_index(tile_id)
+        for seat in range(len(self.counts)):
+            if seat != skip:
+                self.counts[seat][index] -= 1
+                self.versions[seat] += 1
+
+    def draw(self, seat: int, tile):
+        '''
+        Method: draw()
+
+        ## Description
+
+        A seat draws a tile, only it sees the tile.
+        '''
+        self.counts[seat][get_index(tile.get_id())] -= 1
+        self.versions[seat] += 1
+
+    def discard(self, seat: int, tile):
+        '''
+        Method: discard()
+
+        ## Description
+
+        A seat discards a tile, which the other seats now see.
+        '''
+        self._reveal(tile.get_id(), seat)
+
+    def call(self, seat: int, meld: Meld, previous: Meld = None):
+        '''
+        Method: call()
+
+        ## Description
+
+        A seat makes a call. The other seats see the tiles of the meld that
+        came from the hand of the caller: all tiles of an ankan, the added
+        tile of a kakan (`previous` being the pon it extends) and the tiles
+        besides the called one otherwise.
+        '''
+        tiles = list(meld.tiles)
+        if previous is not None:
+            for id in previous.tiles:
+                tiles.remove(id)
+        elif meld.called is not None:
+            tiles.remove(meld.called)
+        for id in tiles:
+            self._reveal(id, seat)
+
+    def dora(self, tile):
+        '''
+        Method: dora()
+
+        ## Description
+
+        A dora indicator is revealed to every seat.
+        '''
+        self._reveal(tile.get_id())
+
+    def get_counts(self, seat: int) -> list:
+        '''
+        Method: get_counts()
+
+        ## Description
+
+        Returns the counts of a seat. The list is updated in place, copy it
+        to keep it.
+        '''
+        return self.counts[seat]
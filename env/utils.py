@@ -5,15 +5,36 @@ Description:
     Utilities used for other modules.
 '''
 
-from mahjong.hand_calculating.hand import HandCalculator
-from mahjong.tile import TilesConverter
-from mahjong.hand_calculating.hand_config import HandConfig, OptionalRules
-from mahjong.meld import Meld
-from mahjong.shanten import Shanten
+# The mahjong library is only imported, and its calculators only built, on
+# first use (or by env.warmup())
+_calculators = None
 
-__shanten = Shanten()
-__hand_calculator = HandCalculator()
-__tiles_converter = TilesConverter()
+def get_calculators() -> dict:
+    '''
+    Function: get_calculators()
+
+    ## Description
+
+    Returns the shared calculators of the `mahjong` library, importing the
+    library and building them on the first call.
+
+    ## Returns
+
+    `dict`
+        `"shanten"`: `Shanten`, `"hand_calculator"`: `HandCalculator` and
+        `"tiles_converter"`: `TilesConverter`.
+    '''
+    global _calculators
+    if _calculators is None:
+        from mahjong.hand_calculating.hand import HandCalculator
+        from mahjong.tile import TilesConverter
+        from mahjong.shanten import Shanten
+        _calculators = {
+            "shanten": Shanten(),
+            "hand_calculator": HandCalculator(),
+            "tiles_converter": TilesConverter()
+        }
+    return _calculators
 
 def get_value(deck, incoming_tile, melds: list = [], game_state = None, ruleset = None, deduce: bool = False, dora_indicators: list = [], **kwargs) -> int:
     '''
@@ -31,7 +52,7 @@ def get_value(deck, incoming_tile, melds: list = [], game_state = None, ruleset
     - `incoming_tile`: `Tile`
         The incoming tile.
     - `melds`: `list`
-        The meld list.
+        The melds, as `Meld`s or call strings.
     - `game_state`: `GameState`
         The game state. In addition to the default game.state, additional
         information (keys) must be provided:
@@ -83,82 +104,35 @@ def get_value(deck, incoming_tile, melds: list = [], game_state = None, ruleset
     '''
     from env.deck import Deck
     from env.tiles import Tile
+    from mahjong.hand_calculating.hand_config import HandConfig, OptionalRules
+    from env.meld import Meld
+    from mahjong.meld import Meld as LibraryMeld
     assert isinstance(deck, Deck)
     assert isinstance(incoming_tile, Tile)
     assert isinstance(melds, list)
+    calculators = get_calculators()
 
-    tiles_136_array = __tiles_converter.one_line_string_to_136_array(deck.get_short_string(), has_aka_dora=True)
+    tiles_136_array = calculators["tiles_converter"].one_line_string_to_136_array(deck.get_short_string(), has_aka_dora=True)
     win_tile = incoming_tile.get_136_id()
 
-    # Create melds from call strings
+    # Create melds of the mahjong library from Melds or call strings
     meld_objects = []
     for meld in melds:
-        meld_deck = Deck()
-        digits = [int(ch) for ch in meld if ch.isdigit()]
-        for digit_idx in range(0, len(digits), 2):
-            id = digits[digit_idx] * 10 + digits[digit_idx+1]
-            tile = Tile(id)
-            meld_deck.add_tile(tile)
-        # meld is a call string
-        if meld.find("c") != -1:
-            # CHII
-            c_index = meld.find("c")
-            # The next two digits are the called tile
-            called_tile_id = Tile(int(meld[c_index+1:c_index+3])).get_136_id()
-            meld_object = Meld(
-                meld_type=Meld.CHI,
-                tiles=meld_deck.get_136_array(),
-                opened=True,
-                called_tile=called_tile_id
-            )
-            meld_objects.append(meld_object)
-        elif meld.find("p") != -1:
-            # PON
-            p_index = meld.find("p")
-            # The next two digits are the called tile
-            called_tile_id = Tile(int(meld[p_index+1:p_index+3])).get_136_id()
-            meld_object = Meld(
-                meld_type=Meld.PON,
-                tiles=meld_deck.get_136_array(),
-                opened=True,
-                called_tile=called_tile_id
-            )
-            meld_objects.append(meld_object)
-        elif meld.find("k") != -1:
-            # KAN (KAKAN)
-            k_index = meld.find("k")
-            # The next two digits are the called tile
-            called_tile_id = Tile(int(meld[k_index+1:k_index+3])).get_136_id()
-            meld_object = Meld(
-                meld_type=Meld.KAN,
-                tiles=meld_deck.get_136_array(),
-                opened=True,
-                called_tile=called_tile_id
-            )
-            meld_objects.append(meld_object)
-        elif meld.find("a") != -1:
-            # ANKAN
-            a_index = meld.find("a")
-            # The next two digits are the called tile
-            called_tile_id = Tile(int(meld[a_index+1:a_index+3])).get_136_id()
-            meld_object = Meld(
-                meld_type=Meld.KAN,
-                tiles=meld_deck.get_136_array(),
-                opened=False
-            )
-            meld_objects.append(meld_object)
-        elif meld.find("m") != -1:
-            # MINKAN
-            m_index = meld.find("m")
-            # The next two digits are the called tile
-            called_tile_id = Tile(int(meld[m_index+1:m_index+3])).get_136_id()
-            meld_object = Meld(
-                meld_type=Meld.KAN,
-                tiles=meld_deck.get_136_array(),
-                opened=True,
-                called_tile=called_tile_id
-            )
-            meld_objects.append(meld_object)
+        if isinstance(meld, str):
+            meld = Meld.from_string(meld)
+        called_tile_id = Tile.mapping_136[meld.called] if meld.called is not None else None
+        if meld.type == "chii":
+            meld_type = LibraryMeld.CHI
+        elif meld.type == "pon":
+            meld_type = LibraryMeld.PON
+        else:
+            meld_type = LibraryMeld.KAN
+        meld_objects.append(LibraryMeld(
+            meld_type=meld_type,
+            tiles=meld.get_136_array(),
+            opened=meld.is_open(),
+            called_tile=called_tile_id
+        ))
 
     # Create config
     if deduce:
@@ -263,7 +237,7 @@ def get_value(deck, incoming_tile, melds: list = [], game_state = None, ruleset
             options=options
         )
 
-    result = __hand_calculator.estimate_hand_value(tiles_136_array, win_tile, melds=meld_objects, config=config)
+    result = calculators["hand_calculator"].estimate_hand_value(tiles_136_array, win_tile, melds=meld_objects, config=config)
     return result
 
 def shanten_count(deck) -> int:
@@ -285,16 +259,72 @@ def shanten_count(deck) -> int:
         The shanten count of the hand
     '''
     from env.deck import Deck
-    from env.tiles import Tile
+    from env.cache import caches, get_hand_key
 
     assert isinstance(deck, Deck)
 
-    deck_short_string = deck.get_short_string()
-    tiles_34_array = __tiles_converter.one_line_string_to_34_array(deck_short_string, has_aka_dora=True)
+    # The counts are in the order of the 34 array of the mahjong library
+    counts = get_tile_counts(deck.get_tiles())
+    assert counts is not None, "Invalid tile in deck {}".format(deck)
 
-    result = __shanten.calculate_shanten(tiles_34=tiles_34_array)
+    return caches["shanten_count"].get(get_hand_key(counts), get_calculators()["shanten"].calculate_shanten, counts)
 
-    return result
+# Index of every tile ID in the counts of get_tile_counts()
+TILE_INDEX = {id: (id // 10 - 1) * 9 + id % 10 - 1 for id in list(range(11, 20)) + list(range(21, 30)) + list(range(31, 40)) + list(range(41, 48))}
+TILE_INDEX.update({51: 4, 52: 13, 53: 22})
+# The tile ID of every index
+INDEX_TILE = sorted(id for id in TILE_INDEX if id < 50)
+# Indices of the terminals and honors, in kokushi mosou order
+KOKUSHI_INDICES = [0, 8, 9, 17, 18, 26, 27, 28, 29, 30, 31, 32, 33]
+
+def get_tile_counts(deck_list: list) -> list:
+    '''
+    Function: get_tile_counts()
+
+    ## Description
+
+    Counts the tiles of a list by kind, in the order 1m..9m, 1p..9p,
+    1s..9s, 1z..7z. Red fives are counted as fives.
+
+    ## Returns
+
+    `list` or `None`
+        34 counts, or `None` if a tile is not a valid kind.
+    '''
+    counts = [0] * 34
+    for tile in deck_list:
+        index = TILE_INDEX.get(tile.get_id())
+        if index is None:
+            return None
+        counts[index] += 1
+    return counts
+
+def check_agari_counts(counts: list):
+    '''
+    Function: check_agari_counts()
+
+    ## Description
+
+    `check_agari()` on the counts of `get_tile_counts()`.
+    '''
+    from env.tables import is_agari_counts
+    if is_agari_counts(counts):
+        return True, "ordinary"
+    if sum(counts) == 14:
+        if all(counts[index] > 0 for index in KOKUSHI_INDICES) and sum(counts[index] for index in KOKUSHI_INDICES) == 14:
+            return True, "kokushi_mosou"
+        if all(count in [0, 2] for count in counts):
+            return True, "chiitoitsu"
+    return False
+
+def _get_deck_list(deck) -> list:
+    from env.deck import Deck
+    from env.tiles import Tile
+    if isinstance(deck, Deck):
+        return deck.get_tiles()
+    assert isinstance(deck, list)
+    assert all(isinstance(tile, Tile) for tile in deck)
+    return deck
 
 def check_reach(deck, calls: list = []) -> bool or list:
     '''
@@ -319,43 +349,121 @@ def check_reach(deck, calls: list = []) -> bool or list:
         `False` if no such discarding hand exists, a
         `list` of `Tile` if such a hand exists.
     '''
-
-    from env.deck import Deck
     from env.tiles import Tile
-    
+    from env.cache import caches, get_hand_key
+
     assert isinstance(calls, list)
-    
-    if isinstance(deck, Deck):
-        deck_list = deck.get_tiles()
-    else:
-        assert isinstance(deck, list)
-        assert all(isinstance(tile, Tile) for tile in deck)
-        deck_list = deck
-    
-    # Consider red dora as non-red ones
-    deck_list = [Tile((tile.get_id() - 50) * 10 + 5) if tile.is_red_dora() else tile for tile in deck_list]
-    
+
+    deck_list = _get_deck_list(deck)
+
     if len(calls) != 0 and not all(call.find("a") != -1 for call in calls):
         return False
+    counts = get_tile_counts(deck_list)
+    if counts is None:
+        return False
+    discards = caches["check_reach"].get(get_hand_key(counts), get_reach_discards_counts, counts)
+    # Consider red dora as non-red ones
+    reach_discard = [Tile(INDEX_TILE[TILE_INDEX[tile.get_id()]]) if tile.is_red_dora() else tile for tile in deck_list if TILE_INDEX[tile.get_id()] in discards]
+    if len(reach_discard) == 0:
+        return False
     else:
-        reach_discard = []
-        all_valid_tile_id = [11, 12, 13, 14, 15, 16, 17, 18, 19,
-            21, 22, 23, 24 ,25, 26, 27, 28, 29,
-            31, 32, 33, 34, 35, 36, 37, 38, 39,
-            41, 42, 43, 44, 45, 46, 47, 48, 49
-        ]
-        all_tiles = [Tile(i) for i in all_valid_tile_id]
-        for tile in deck_list:
-            deck_remaining = Deck(deck_list.copy()) - tile
-            for additional_tile in all_tiles:
-                deck_tenpai = deck_remaining + additional_tile
-                if check_agari(deck_tenpai, []):
-                    reach_discard.append(tile)
-                    break
-        if len(reach_discard) == 0:
-            return False
-        else:
-            return reach_discard
+        return reach_discard
+
+def get_reach_discards_counts(counts: list) -> frozenset:
+    '''
+    Function: get_reach_discards_counts()
+
+    ## Description
+
+    Returns the indices of the tiles whose discard leaves the counts of
+    `get_tile_counts()` in tenpai.
+    '''
+    discards = []
+    for index in range(34):
+        if counts[index] > 0:
+            counts[index] -= 1
+            if check_tenpai_counts(counts):
+                discards.append(index)
+            counts[index] += 1
+    return frozenset(discards)
+
+def check_tenpai_counts(counts: list) -> bool:
+    '''
+    Function: check_tenpai_counts()
+
+    ## Description
+
+    `check_tenpai()` on the counts of `get_tile_counts()`. The counts are
+    restored before returning.
+    '''
+    for index in range(34):
+        counts[index] += 1
+        agari = check_agari_counts(counts)
+        counts[index] -= 1
+        if agari:
+            return True
+    return False
+
+def get_waits_counts(counts: list) -> frozenset:
+    '''
+    Function: get_waits_counts()
+
+    ## Description
+
+    Returns the indices of the tiles that complete the counts of
+    `get_tile_counts()`, i.e. the wait set of a tenpai hand. Results are
+    cached by the counts of the hand.
+    '''
+    from env.cache import caches, get_hand_key
+
+    def compute(counts):
+        waits = []
+        for index in range(34):
+            counts[index] += 1
+            if check_agari_counts(counts):
+                waits.append(index)
+            counts[index] -= 1
+        return frozenset(waits)
+    return caches["get_waits"].get(get_hand_key(counts), compute, list(counts))
+
+def may_claim_counts(counts: list, index: int, chii: bool = False, reach: bool = False) -> bool:
+    '''
+    Function: may_claim_counts()
+
+    ## Description
+
+    Checks whether a passive player may have any claim on a discarded
+    tile, from the counts of its hand.
+
+    ## Parameters
+
+    - `counts`: `list`
+        The counts of the hand, see `get_tile_counts()`.
+    - `index`: `int`
+        The index of the discarded tile.
+    - `chii`: `bool`
+        Whether the player sits next to the discarder.
+    - `reach`: `bool`
+        Whether the player is in reach, which rules out pon and chii.
+
+    ## Returns
+
+    `bool`
+        `False` if noop is the only legal action of the player. `True`
+        does not guarantee a claim, e.g. the chii may need a red five.
+    '''
+    if index in get_waits_counts(counts):
+        return True
+    if reach:
+        return False
+    if counts[index] >= 2:
+        return True
+    if chii and index < 27:
+        rank = index % 9
+        for low in range(max(rank - 2, 0), min(rank, 6) + 1):
+            if all(counts[index - rank + r] > 0 for r in range(low, low + 3) if r != rank):
+                return True
+    return False
 
 def check_tenpai(deck, calls: list = []) -> bool:
     '''
@@ -377,30 +485,14 @@ def check_tenpai(deck, calls: list = []) -> bool:
     `bool`
         `True` if the deck is tenpai, `False` otherwise.
     '''
-    from env.deck import Deck
-    from env.tiles import Tile
-    
+    from env.cache import caches, get_hand_key
+
     assert isinstance(calls, list)
-    
-    if isinstance(deck, Deck):
-        deck_list = deck.get_tiles()
-    else:
-        assert isinstance(deck, list)
-        assert all(isinstance(tile, Tile) for tile in deck)
-        deck_list = deck
-
-    all_valid_tile_id = [11, 12, 13, 14, 15, 16, 17, 18, 19,
-        21, 22, 23, 24 ,25, 26, 27, 28, 29,
-        31, 32, 33, 34, 35, 36, 37, 38, 39,
-        41, 42, 43, 44, 45, 46, 47, 48, 49
-    ]
-    all_tiles = [Tile(i) for i in all_valid_tile_id]
-    for tile in deck_list:
-        deck_addition = Deck(deck_list.copy()) + tile
-        if check_agari(deck_addition.get_tiles(), calls):
-            return True
-    return False
 
+    counts = get_tile_counts(_get_deck_list(deck))
+    if counts is None:
+        return False
+    return caches["check_tenpai"].get(get_hand_key(counts), check_tenpai_counts, counts)
 
 def check_agari(deck, calls: list = []) -> bool:
     '''
@@ -417,90 +509,143 @@ def check_agari(deck, calls: list = []) -> bool:
  
     ## Returns
     
-    `bool`
-        Whether the given deck is in agari state.
+    `bool` or `tuple`
+        `False` if the deck is not in agari state, otherwise `True` and
+        the form of the hand: `"ordinary"`, `"kokushi_mosou"` or
+        `"chiitoitsu"`.
+
+    ## Details
+
+    Ordinary hands are looked up per suit in the tables of `env.tables`.
+    Results are cached by the counts of the hand, see `env.cache`.
     '''
-    from env.deck import Deck
-    from env.tiles import Tile
-    
+    from env.cache import caches, get_hand_key
+
     assert isinstance(calls, list)
-    
-    # Get tile list
-    if isinstance(deck, Deck):
-        deck_list = deck.get_tiles()
+
+    counts = get_tile_counts(_get_deck_list(deck))
+    if counts is None:
+        return False
+    return caches["check_agari"].get(get_hand_key(counts), check_agari_counts, counts)
+
+# Hand type codes of check_agari_batch()
+HAND_TYPES = [None, "ordinary", "chiitoitsu", "kokushi_mosou"]
+
+def check_agari_batch(counts, meld_counts = None, return_types: bool = False):
+    '''
+    Function: check_agari_batch()
+
+    ## Description
+
+    Checks many hands at once. Every suit of every hand is looked up in the
+    tables of `env.tables` with NumPy indexing, with no Python loop over
+    the hands.
+
+    ## Parameters
+
+    - `counts`: `numpy.ndarray`
+        An `(N, 34)` array of tile counts, as in `get_tile_counts()`.
+    - `meld_counts`: `numpy.ndarray` or `None`
+        The number of calls of every hand, `(N,)`. A hand with `k` calls
+        must have `14 - 3 * k` tiles, and only hands without calls can be
+        seven pairs or thirteen orphans. Without it, the tile count only
+        has to leave a pair, as in `check_agari()`.
+    - `return_types`: `bool`
+        Also return the hand type codes.
+
+    ## Returns
+
+    `numpy.ndarray` or `tuple`
+        A boolean `(N,)` array, and with `return_types` a `uint8` `(N,)`
+        array of indices into `HAND_TYPES`: `0` for no agari, `1`
+        ordinary, `2` chiitoitsu, `3` kokushi mosou.
+
+    ## Examples
+
+    ```python
+    >>> counts = np.array([get_tile_counts(hand.get_tiles()) for hand in hands])
+    >>> agari, types = check_agari_batch(counts, return_types=True)
+    ```
+    '''
+    import numpy as np
+    from env.tables import get_tables, MELDS, PAIR, POWERS
+
+    counts = np.asarray(counts)
+    assert counts.ndim == 2 and counts.shape[1] == 34, "Invalid counts, expected an (N, 34) array"
+    counts = counts.astype(np.int64)
+    tables = get_tables()
+    number = np.frombuffer(tables.number, dtype=np.uint8)
+    honor = np.frombuffer(tables.honor, dtype=np.uint8)
+    weights = np.array(POWERS, dtype=np.int64)
+
+    total = counts.sum(axis=1)
+    valid = (counts.min(axis=1) >= 0) & (counts.max(axis=1) <= 4)
+    if meld_counts is None:
+        valid &= total % 3 == 2
+        closed = np.ones(len(counts), dtype=bool)
     else:
-        assert isinstance(deck, list)
-        assert all(isinstance(tile, Tile) for tile in deck)
-        deck_list = deck
+        meld_counts = np.asarray(meld_counts)
+        valid &= total == 14 - 3 * meld_counts
+        closed = meld_counts == 0
+    # Out of range counts would index outside the tables
+    clipped = np.clip(counts, 0, 4)
+
+    ordinary = valid.copy()
+    pairs = np.zeros(len(counts), dtype=np.int64)
+    for start, ranks, table in [(0, 9, number), (9, 9, number), (18, 9, number), (27, 7, honor)]:
+        suit = clipped[:, start:start + ranks]
+        remainder = suit.sum(axis=1) % 3
+        flags = table[suit @ weights[:ranks]]
+        required = np.where(remainder == 2, PAIR, MELDS)
+        ordinary &= (remainder != 1) & ((flags & required) != 0)
+        pairs += remainder == 2
+    ordinary &= pairs == 1
+
+    full = valid & closed & (total == 14)
+    kokushi = counts[:, KOKUSHI_INDICES]
+    kokushi_mosou = full & (kokushi.min(axis=1) >= 1) & (kokushi.sum(axis=1) == 14)
+    chiitoitsu = full & ((counts == 0) | (counts == 2)).all(axis=1)
+
+    agari = ordinary | kokushi_mosou | chiitoitsu
+    if not return_types:
+        return agari
+    types = np.zeros(len(counts), dtype=np.uint8)
+    types[chiitoitsu] = HAND_TYPES.index("chiitoitsu")
+    types[kokushi_mosou] = HAND_TYPES.index("kokushi_mosou")
+    types[ordinary] = HAND_TYPES.index("ordinary")
+    return agari, types
+
+def get_waits_batch(counts, meld_counts = None):
+    '''
+    Function: get_waits_batch()
 
-    # Sort tile list
-    deck_list.sort()
-    # Consider red dora as non-red ones
-    deck_list = [Tile((tile.get_id() - 50) * 10 + 5) if tile.is_red_dora() else tile for tile in deck_list]
+    ## Description
 
-    deck = Deck(deck_list)
+    `get_waits_counts()` for many hands at once: every hand is completed
+    with each of the 34 tiles, and the `34 * N` hands are checked by one
+    call to `check_agari_batch()`.
 
-    # Ordinary hand
-    toitsu = []
-    for tile in deck_list:
-        if deck_list.count(tile) >= 2 and tile not in toitsu:
-            toitsu.append(tile)
+    ## Parameters
 
-    def is_3_complete(deck_list_):
-        deck_list = deck_list_.copy()
-        if len(deck_list) == 0:
-            return True
-        else:
-            tile = deck_list[0]
-            if tile.get_suit() == "z":
-                if deck_list.count(tile) != 3:
-                    return False
-                deck_list.remove(tile)
-                deck_list.remove(tile)
-                deck_list.remove(tile)
-                return is_3_complete(deck_list)
-            else:
-                res = []
-                if deck_list.count(tile) >= 3:
-                    deck_list.remove(tile)
-                    deck_list.remove(tile)
-                    deck_list.remove(tile)
-                    res.append(is_3_complete(deck_list))
-                elif tile.get_rank() <= 7:
-                    if deck_list.count(Tile(tile.get_id() + 1)) >= 1 and deck_list.count(Tile(tile.get_id() + 2)) >= 1:
-                        deck_list.remove(tile)
-                        deck_list.remove(Tile(tile.get_id() + 1))
-                        deck_list.remove(Tile(tile.get_id() + 2))
-                        res.append(is_3_complete(deck_list))
-                return any(res)
-
-    for toitsu_ in toitsu:
-        check_deck_without_toitsu = Deck(deck_list) - Deck([toitsu_, toitsu_])
-        if is_3_complete(check_deck_without_toitsu.get_tiles()):
-            return True, "ordinary"
-
-    # Kokushi mosou
-    kokushi_mosou_tiles = Deck("1m9m1p9p1s9s1234567z").get_tiles()
-    kokushi_mosou_flag = True
-    tile_1_9_z = 0
-    for tile in kokushi_mosou_tiles:
-        if not tile in deck:
-            kokushi_mosou_flag = False
-            break
-        else:
-            tile_1_9_z += deck.get_tiles().count(tile)
-    if kokushi_mosou_flag and tile_1_9_z == 14:
-        return True, "kokushi_mosou"
-
-    # Chiitoitsu
-    chiitoitsu = True
-    if len(deck_list) == 14:
-        for tile in deck_list:
-            if deck_list.count(tile) != 2:
-                # Chiitoitsu shall not have 4 of a kind
-                chiitoitsu = False
-                break
-        if chiitoitsu:
-            return True, "chiitoitsu"
-    
-    return False
+    - `counts`: `numpy.ndarray`
+        An `(N, 34)` array of tile counts of hands waiting for one tile,
+        as in `get_tile_counts()`.
+    - `meld_counts`: `numpy.ndarray` or `None`
+        The number of calls of every hand, `(N,)`, see
+        `check_agari_batch()`.
+
+    ## Returns
+
+    `numpy.ndarray`
+        A boolean `(N, 34)` array, `True` for the waits of every hand. A
+        tile the hand already holds four of is not a wait. A hand is
+        tenpai if it has any wait, i.e. `waits.any(axis=1)`.
+    '''
+    import numpy as np
+
+    counts = np.asarray(counts, dtype=np.int64)
+    assert counts.ndim == 2 and counts.shape[1] == 34, "Invalid counts, expected an (N, 34) array"
+    completed = (counts[:, None, :] + np.eye(34, dtype=np.int64)).reshape(-1, 34)
+    if meld_counts is not None:
+        meld_counts = np.repeat(np.asarray(meld_counts), 34)
+    return check_agari_batch(completed, meld_counts).reshape(len(counts), 34)
@@ -0,0 +1,123 @@
+'''
+File: views.py
+Author: Kunologist
+Description:
+    Read-only views of the game state handed out in observations. A view
+    never changes after it is created, so agents can keep observations
+    (e.g. to train on a trajectory) without copying them, and views of the
+    rivers share their tiles with the game instead of copying them.
+'''
+
+from collections.abc import Sequence
+from itertools import islice
+
+from env.deck import Deck
+
+class FrozenList(list):
+    '''
+    Class: FrozenList
+
+    ## Description
+
+    A list that cannot be modified. It is still a `list`, so it compares
+    equal to lists and is serialized as one.
+    '''
+    __slots__ = []
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("Observations are read-only")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __reduce__(self):
+        return (FrozenList, (list(self),))
+
+class HandView(Deck):
+    '''
+    Class: HandView
+
+    ## Description
+
+    A hand that cannot be modified. Its tiles are a `FrozenList`, so the
+    methods of `Deck` that add, remove or sort tiles raise `TypeError`,
+    while the others work as usual; `copy()` returns a `Deck` that can be
+    modified.
+    '''
+
+    def __init__(self, deck: Deck):
+        '''
+        Constructor: __init__
+
+        ## Parameters
+
+        - `deck`: `Deck`
+            The hand, whose tiles are copied.
+        '''
+        self.__dict__["tiles"] = FrozenList(deck.tiles)
+        self.__dict__["sort_always"] = deck.sort_always
+
+    def __setattr__(self, name, value):
+        raise TypeError("Observations are read-only")
+
+    __delattr__ = __setattr__
+
+class RiverView(Sequence):
+    '''
+    Class: RiverView
+
+    ## Description
+
+    The first `length` tiles of a river. Rivers only ever grow, so the view
+    keeps showing the discards made until it was created, while sharing the
+    list of the game.
+
+    ## Details
+
+    Indexing and iteration return the `Tile`s of the river; slicing returns
+    a `list`. A view compares equal to any sequence of the same tiles.
+    '''
+    __slots__ = ["tiles", "length"]
+
+    def __init__(self, tiles: list, length: int = None):
+        '''
+        Constructor: __init__
+
+        ## Parameters
+
+        - `tiles`: `list`
+            The river, which may only be appended to.
+        - `length`: `int` or `None`
+            The number of tiles in the view, by default the current length
+            of the river.
+        '''
+        self.tiles = tiles
+        self.length = len(tiles) if length is None else length
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self.tiles[i] for i in range(*key.indices(self.length))]
+        if key < 0:
+            key += self.length
+        if key < 0 or key >= self.length:
+            raise IndexError("River index out of range")
+        return self.tiles[key]
+
+    def __iter__(self):
+        return islice(self.tiles, self.length)
+
+    def __eq__(self, other):
+        if not isinstance(other, (RiverView, list, tuple)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def to_json(self) -> list:
+        return list(self)
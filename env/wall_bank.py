@@ -0,0 +1,194 @@
+'''
+File: wall_bank.py
+Author: Kunologist
+Description:
+    Pre-shuffled walls generated in batches with NumPy. A bank holds K walls
+    as a `(K, 136)` array of tile IDs, can be saved and memory-mapped back,
+    and hands out walls that only create `Tile` objects when they are used.
+'''
+
+import numpy as np
+
+from env.deck import Deck, Wall, get_wall_tile_ids
+from env.ruleset import Ruleset
+
+class BankWall(Wall):
+    '''
+    Class: BankWall
+
+    ## Description
+
+    A `Wall` backed by one row of a `WallBank`. It has the layout of a wall
+    split by `Wall.game_split()`, but each part (starting hands, mountain,
+    dora and ura dora indicators, replacements) is only turned into a
+    `Deck` of `Tile`s the first time it is accessed.
+    '''
+
+    def __init__(self, ruleset: Ruleset, ids, index: int = None):
+        '''
+        Constructor: __init__
+
+        ## Parameters
+
+        - `ruleset`: `Ruleset`
+            The ruleset of the game.
+        - `ids`: `numpy.ndarray`
+            The tile IDs of the wall, in dealing order.
+        - `index`: `int` or `None`
+            The index of the wall in its bank.
+        '''
+        assert isinstance(ruleset, Ruleset), "Invalid ruleset, expected `Ruleset` object."
+        self.ruleset = ruleset
+        self.ids = ids
+        self.index = index
+        self.random_seed = None
+        self.parts = {}
+
+    def get_part(self, name: str, start: int, stop: int, sort: bool = False) -> Deck:
+        '''
+        Method: get_part()
+
+        ## Description
+
+        Returns the part `ids[start:stop]` of the wall as a `Deck`, creating
+        it on first access.
+        '''
+        deck = self.parts.get(name)
+        if deck is None:
+            deck = self.parts[name] = Deck(self.ids[start:stop].tolist(), sort=sort)
+        return deck
+
+    @property
+    def tiles(self):
+        return self.parse_list(self.ids.tolist())
+
+    @property
+    def starting_hands(self):
+        return [self.get_part("hand_{}".format(i), i * 13, (i + 1) * 13, sort=True) for i in range(self.ruleset.get_rule("players"))]
+
+    @property
+    def dora_indicators(self):
+        return self.get_part("dora_indicators", -5, None)
+
+    @property
+    def ura_dora_indicators(self):
+        return self.get_part("ura_dora_indicators", -10, -5)
+
+    @property
+    def replacements(self):
+        return self.get_part("replacements", -14, -10)
+
+    @property
+    def mountain(self):
+        return self.get_part("mountain", self.ruleset.get_rule("players") * 13, -14)
+
+    def get_starting_hand(self, player: int):
+        assert isinstance(player, int)
+        assert player in range(0, self.ruleset.get_rule("players")), "Invalid player ID, must be between 0 and {}".format(-1 + self.ruleset.get_rule("players"))
+        return self.get_part("hand_{}".format(player), player * 13, (player + 1) * 13, sort=True)
+
+    def save_tiles(self, filename: str):
+        import json
+        with open(filename, "w") as f:
+            json.dump(self.ids.tolist(), f)
+
+class WallBank:
+    '''
+    Class: WallBank
+
+    ## Description
+
+    A batch of pre-shuffled walls, stored as a `(K, 136)` `uint8` array of
+    tile IDs.
+
+    ## Examples
+
+    ```python
+    >>> bank = WallBank.generate(Ruleset(), 100000, seed=2022)
+    >>> bank.save("walls.npy")
+    >>> bank = WallBank.load("walls.npy", Ruleset()) # memory-mapped
+    >>> game = MahjongGame(Ruleset(), wall_bank=bank)
+    ```
+    '''
+
+    def __init__(self, walls, ruleset: Ruleset = None):
+        '''
+        Constructor: __init__
+
+        ## Parameters
+
+        - `walls`: `numpy.ndarray`
+            The walls, one per row.
+        - `ruleset`: `Ruleset` or `None`
+            The ruleset the walls are dealt for. Defaults to `Ruleset()`.
+        '''
+        assert walls.ndim == 2, "Invalid walls, expected a 2-dimensional array"
+        self.walls = walls
+        self.ruleset = ruleset if ruleset is not None else Ruleset()
+
+    @classmethod
+    def generate(cls, ruleset: Ruleset, count: int, seed: int = None):
+        '''
+        Method: generate()
+
+        ## Description
+
+        Shuffles `count` walls at once, each row independently.
+
+        ## Parameters
+
+        - `ruleset`: `Ruleset`
+            Decides the tiles of the walls, see `get_wall_tile_ids()`.
+        - `count`: `int`
+            The number of walls.
+        - `seed`: `int` or `None`
+            The seed of the NumPy generator. The same seed always gives the
+            same bank.
+
+        ## Returns
+
+        `WallBank`
+        '''
+        base = np.array(get_wall_tile_ids(ruleset), dtype=np.uint8)
+        rng = np.random.default_rng(seed)
+        walls = rng.permuted(np.broadcast_to(base, (count, len(base))), axis=1)
+        return cls(walls, ruleset)
+
+    @classmethod
+    def load(cls, filename: str, ruleset: Ruleset = None, mmap: bool = True):
+        '''
+        Method: load()
+
+        ## Description
+
+        Loads a bank saved by `save()`. With `mmap`, the file is
+        memory-mapped read-only, so only the walls that are used are read
+        and several processes can share one evaluation set.
+        '''
+        return cls(np.load(filename, mmap_mode="r" if mmap else None), ruleset)
+
+    def save(self, filename: str):
+        '''
+        Method: save()
+
+        ## Description
+
+        Saves the bank as a `.npy` file.
+        '''
+        np.save(filename, np.ascontiguousarray(self.walls))
+
+    def get_wall(self, index: int) -> BankWall:
+        '''
+        Method: get_wall()
+
+        ## Description
+
+        Returns the wall at `index`.
+        '''
+        return BankWall(self.ruleset, self.walls[index], index)
+
+    def __len__(self):
+        return self.walls.shape[0]
+
+    def __getitem__(self, index: int) -> BankWall:
+        return self.get_wall(index)
@@ -0,0 +1,530 @@
+'''
+File: wire.py
+Author: Kunologist
+Description:
+    A compact, versioned binary encoding of observations and actions for
+    remote agents. Tiles are sent as their one-byte IDs and the discards
+    are delta-encoded against the last message sent to the same seat.
+'''
+
+import struct
+
+from env.action import Action
+from env.deck import Deck
+from env.discards import get_bits
+from env.meld import Meld, MARKERS, get_index
+from env.tiles import Tile
+
+MAGIC = b"RMJ"
+VERSION = 4
+
+MESSAGE_OBSERVATION = 1
+MESSAGE_ACTION = 2
+MESSAGE_ACTION_SPACE = 3
+
+PLAYER_STATES = ["active", "passive", "chankan", "end_game"]
+WINDS = ["E", "S", "W", "N"]
+ACTION_TYPES = ["noop", "akan", "mkan", "kan", "chii", "pon", "discard", "replace", "reach", "ron", "tsumo", "ten", "noten"]
+MELD_TYPES = list(MARKERS)
+
+FLAG_INCOMING_TILE = 1
+FLAG_IS_ANKAN = 2
+FLAG_UNSEEN = 4
+FLAG_SAFE_BITS = 8
+FLAG_TENPAI = 16
+FLAG_RIVER_FLAGS = 32
+FLAG_MELDS = 64
+FLAG_RINSHAN = 128
+
+# Set on the count byte of a discard delta when the flags of the last
+# discard sent before have changed (it was called since), followed by them
+UPDATE_LAST_FLAGS = 0x80
+
+# No seat, for the from_seat of an ankan
+NO_SEAT = 255
+
+# magic, version, message type
+_preamble = struct.Struct("<3sBB")
+# players, player_idx, active_player, player_state, wind, wind_e, repeat,
+# dora_revealed, tiles_left, reach bits, ippatsu bits, flags, incoming tile
+_observation_header = struct.Struct("<13B")
+
+def _split_marked(string: str) -> tuple:
+    '''
+    Function: _split_marked()
+
+    ## Description
+
+    Splits a call or action string such as `"41p4141"` into its marker
+    letter, the position of the marker among the tiles, and the tile IDs.
+
+    ## Returns
+
+    `tuple`
+        `(marker, position, ids)`. `marker` is `0` if there is none.
+    '''
+    marker = 0
+    position = 0
+    ids = []
+    digits = ""
+    for ch in string:
+        if ch.isdigit():
+            digits += ch
+            if len(digits) == 2:
+                ids.append(int(digits))
+                digits = ""
+        else:
+            marker = ord(ch)
+            position = len(ids)
+    return marker, position, ids
+
+def _join_marked(marker: int, position: int, ids: list) -> str:
+    '''
+    Function: _join_marked()
+
+    ## Description
+
+    Inverse of `_split_marked()`.
+    '''
+    parts = [str(id) for id in ids]
+    if marker:
+        parts.insert(position, chr(marker))
+    return "".join(parts)
+
+def _pack_marked(string: str) -> bytes:
+    marker, position, ids = _split_marked(string)
+    return bytes([len(ids), marker, position]) + bytes(ids)
+
+def _unpack_marked(buffer: bytes, offset: int) -> tuple:
+    count, marker, position = buffer[offset], buffer[offset + 1], buffer[offset + 2]
+    offset += 3
+    ids = list(buffer[offset:offset + count])
+    return _join_marked(marker, position, ids), offset + count
+
+def _tile_ids(tiles) -> bytes:
+    return bytes([tile.get_id() for tile in tiles])
+
+def _check_preamble(buffer: bytes, message_type: int) -> int:
+    magic, version, kind = _preamble.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a wire message")
+    if version != VERSION:
+        raise ValueError("Unsupported wire version {}, expected {}".format(version, VERSION))
+    if kind != message_type:
+        raise ValueError("Unexpected message type {}, expected {}".format(kind, message_type))
+    return _preamble.size
+
+def encode_action(action: Action) -> bytes:
+    '''
+    Function: encode_action()
+
+    ## Description
+
+    Encodes an action.
+
+    ## Returns
+
+    `bytes`
+    '''
+    return _preamble.pack(MAGIC, VERSION, MESSAGE_ACTION) + bytes([ACTION_TYPES.index(action.action_type)]) + _pack_marked(action.action_string)
+
+def decode_action(buffer: bytes) -> Action:
+    '''
+    Function: decode_action()
+
+    ## Description
+
+    Decodes an action encoded by `encode_action()`.
+    '''
+    offset = _check_preamble(buffer, MESSAGE_ACTION)
+    action_string, _ = _unpack_marked(buffer, offset + 1)
+    return Action(ACTION_TYPES[buffer[offset]], action_string)
+
+def encode_action_space(action_space: list) -> bytes:
+    '''
+    Function: encode_action_space()
+
+    ## Description
+
+    Encodes a list of actions.
+    '''
+    body = bytearray([len(action_space)])
+    for action in action_space:
+        body.append(ACTION_TYPES.index(action.action_type))
+        body += _pack_marked(action.action_string)
+    return _preamble.pack(MAGIC, VERSION, MESSAGE_ACTION_SPACE) + bytes(body)
+
+def decode_action_space(buffer: bytes) -> list:
+    '''
+    Function: decode_action_space()
+
+    ## Description
+
+    Decodes a list of actions encoded by `encode_action_space()`.
+    '''
+    offset = _check_preamble(buffer, MESSAGE_ACTION_SPACE)
+    count = buffer[offset]
+    offset += 1
+    action_space = []
+    for _ in range(count):
+        action_type = ACTION_TYPES[buffer[offset]]
+        action_string, offset = _unpack_marked(buffer, offset + 1)
+        action_space.append(Action(action_type, action_string))
+    return action_space
+
+class ObservationEncoder:
+    '''
+    Class: ObservationEncoder
+
+    ## Description
+
+    Encodes observations into compact binary messages.
+
+    ## Details
+
+    The encoder remembers, for every receiving seat, how many discards of
+    each player it has already sent. A message only carries the discards
+    that were added since, together with the number of discards the
+    receiver is expected to have (the base). One encoder must be paired
+    with one `ObservationDecoder`, and messages must be decoded in the
+    order they were encoded. The encoder checks that the last discard it
+    sent is still the same `Tile` object, so the discards are sent in full
+    again once a new game starts.
+
+    The flags of the discards (`River`) travel with them. Only the last
+    discard of a player can be called, so among the discards already sent,
+    only the flags of the last one may change; they are sent again when
+    they do.
+
+    Layout of an observation message (all integers little endian):
+
+    - preamble: `"RMJ"`, version, message type
+    - header: 13 bytes, see `_observation_header`
+    - credits: one `int32` per player
+    - hand: tile count, tile IDs
+    - dora indicators: tile IDs (count in the header)
+    - unseen tiles, if flagged: the 34 counts, two per byte (low nibble
+      first)
+    - safe tiles, if flagged: the safe bits of every player, then the
+      passed bits of the receiver, 5 bytes each (the discard bits are
+      rebuilt from the discards)
+    - discards, per player: base, tile count (`UPDATE_LAST_FLAGS` set if
+      followed by the new flags of discard `base - 1`), new tile IDs, then
+      if flagged the flags of the new discards
+    - calls, per player: call count, then per call tile count, marker
+      letter, marker position, tile IDs
+    - melds, if flagged, per player: meld count, then per meld type
+      (index in `MELD_TYPES`), from seat (`NO_SEAT` for none), called tile
+      ID (0 for none), tile count, tile IDs
+
+    The tenpai flag is only read for `end_game` observations and the
+    rinshan flag for `active` ones, which carry these keys.
+    '''
+
+    def __init__(self):
+        self.sent_discards = {}
+
+    def reset(self):
+        '''
+        Method: reset()
+
+        ## Description
+
+        Forgets the discards sent so far. The next message to every seat
+        carries the full discard lists.
+        '''
+        self.sent_discards = {}
+
+    def encode(self, obs: dict) -> bytes:
+        '''
+        Method: encode()
+
+        ## Description
+
+        Encodes an observation returned by `MahjongGame.get_observation()`.
+        Keys that are not part of the layout are not transmitted.
+
+        ## Returns
+
+        `bytes`
+        '''
+        player_idx = obs["player_idx"]
+        players = len(obs["discarded_tiles"])
+        incoming_tile = obs.get("incoming_tile")
+        flags = 0
+        if incoming_tile is not None:
+            flags |= FLAG_INCOMING_TILE
+        if obs.get("is_ankan"):
+            flags |= FLAG_IS_ANKAN
+        if obs.get("tenpai"):
+            flags |= FLAG_TENPAI
+        if obs.get("rinshan"):
+            flags |= FLAG_RINSHAN
+        river_flags = obs.get("river_flags")
+        if river_flags is not None:
+            flags |= FLAG_RIVER_FLAGS
+        melds = obs.get("melds")
+        if melds is not None:
+            flags |= FLAG_MELDS
+        unseen = obs.get("unseen")
+        if unseen is not None:
+            flags |= FLAG_UNSEEN
+        safe_bits = obs.get("safe_bits")
+        if safe_bits is not None:
+            flags |= FLAG_SAFE_BITS
+        reach_bits = 0
+        ippatsu_bits = 0
+        for i in range(players):
+            if obs["reach"][i]:
+                reach_bits |= 1 << i
+            if obs["ippatsu"][i]:
+                ippatsu_bits |= 1 << i
+        dora_indicators = obs["dora_indicators"]
+        body = bytearray(_preamble.pack(MAGIC, VERSION, MESSAGE_OBSERVATION))
+        body += _observation_header.pack(
+            players,
+            player_idx,
+            obs["active_player"],
+            PLAYER_STATES.index(obs.get("player_state", "active")),
+            WINDS.index(obs["wind"]),
+            obs["wind_e"],
+            obs["repeat"],
+            len(dora_indicators),
+            obs["tiles_left"],
+            reach_bits,
+            ippatsu_bits,
+            flags,
+            incoming_tile.get_id() if incoming_tile is not None else 0
+        )
+        body += struct.pack("<{}i".format(players), *obs["credits"])
+        hand = obs["hand"]
+        body.append(len(hand))
+        body += _tile_ids(hand)
+        body += _tile_ids(dora_indicators)
+        if unseen is not None:
+            body += bytes(unseen[i] | unseen[i + 1] << 4 for i in range(0, 34, 2))
+        if safe_bits is not None:
+            for bits in safe_bits:
+                body += bits.to_bytes(5, "little")
+            body += obs.get("passed_bits", 0).to_bytes(5, "little")
+        # Discards, delta-encoded against what this seat already received
+        sent = self.sent_discards.get(player_idx)
+        if sent is None or len(sent) != players:
+            sent = self.sent_discards[player_idx] = [(0, None, 0)] * players
+        for i in range(players):
+            discards = obs["discarded_tiles"][i]
+            seat_flags = river_flags[i] if river_flags is not None else [0] * len(discards)
+            base, last_tile, last_flags = sent[i]
+            # The last tile sent must still be in place, otherwise this is
+            # another game and everything is sent again
+            if base > len(discards) or (base > 0 and discards[base - 1] is not last_tile):
+                base = 0
+            body.append(base)
+            if base > 0 and seat_flags[base - 1] != last_flags:
+                body.append(len(discards) - base | UPDATE_LAST_FLAGS)
+                body.append(seat_flags[base - 1])
+            else:
+                body.append(len(discards) - base)
+            body += _tile_ids(discards[base:])
+            if river_flags is not None:
+                body += bytes(seat_flags[base:])
+            sent[i] = (len(discards), discards[-1] if len(discards) > 0 else None, seat_flags[-1] if len(discards) > 0 else 0)
+        # Calls
+        for i in range(players):
+            calls = obs["calls"][i]
+            body.append(len(calls))
+            for call in calls:
+                body += _pack_marked(call)
+        if melds is not None:
+            for seat_melds in melds:
+                body.append(len(seat_melds))
+                for meld in seat_melds:
+                    body += bytes([
+                        MELD_TYPES.index(meld.type),
+                        meld.from_seat if meld.from_seat is not None else NO_SEAT,
+                        meld.called if meld.called is not None else 0,
+                        len(meld.tiles)
+                    ])
+                    body += bytes(meld.tiles)
+        return bytes(body)
+
+class ObservationDecoder:
+    '''
+    Class: ObservationDecoder
+
+    ## Description
+
+    Decodes messages produced by an `ObservationEncoder` back into
+    observation dicts made of `Tile`s and `Deck`s, keeping the discards of
+    every seat to apply the deltas to.
+    '''
+
+    def __init__(self):
+        self.discards = {}
+        self.river_flags = {}
+
+    def reset(self):
+        '''
+        Method: reset()
+
+        ## Description
+
+        Forgets the discards received so far.
+        '''
+        self.discards = {}
+        self.river_flags = {}
+
+    def decode(self, buffer: bytes) -> dict:
+        '''
+        Method: decode()
+
+        ## Description
+
+        Decodes an observation message.
+
+        ## Returns
+
+        `dict`
+            The observation.
+
+        ## Raises
+
+        - `ValueError`:
+            If the message is malformed, has an unsupported version, or
+            its discard deltas do not match what this decoder received
+            before.
+        '''
+        offset = _check_preamble(buffer, MESSAGE_OBSERVATION)
+        (players, player_idx, active_player, player_state, wind, wind_e, repeat,
+            dora_count, tiles_left, reach_bits, ippatsu_bits, flags, incoming_tile) = _observation_header.unpack_from(buffer, offset)
+        offset += _observation_header.size
+        credits = list(struct.unpack_from("<{}i".format(players), buffer, offset))
+        offset += 4 * players
+        hand_count = buffer[offset]
+        offset += 1
+        hand = Deck(list(buffer[offset:offset + hand_count]))
+        offset += hand_count
+        dora_indicators = [Tile(id) for id in buffer[offset:offset + dora_count]]
+        offset += dora_count
+        unseen = None
+        if flags & FLAG_UNSEEN:
+            unseen = []
+            for byte in buffer[offset:offset + 17]:
+                unseen += [byte & 15, byte >> 4]
+            offset += 17
+        safe_bits = None
+        if flags & FLAG_SAFE_BITS:
+            safe_bits = [int.from_bytes(buffer[offset + 5 * i:offset + 5 * i + 5], "little") for i in range(players + 1)]
+            offset += 5 * (players + 1)
+        known = self.discards.get(player_idx)
+        known_flags = self.river_flags.get(player_idx)
+        if known is None or len(known) != players:
+            known = self.discards[player_idx] = [[] for _ in range(players)]
+            known_flags = self.river_flags[player_idx] = [[] for _ in range(players)]
+        for i in range(players):
+            base, count = buffer[offset], buffer[offset + 1]
+            offset += 2
+            if base > len(known[i]):
+                raise ValueError("Discard delta of player {} starts at {}, but only {} discards are known".format(i, base, len(known[i])))
+            known_flags[i] = known_flags[i][:base]
+            if count & UPDATE_LAST_FLAGS:
+                count &= ~UPDATE_LAST_FLAGS
+                known_flags[i][base - 1] = buffer[offset]
+                offset += 1
+            known[i] = known[i][:base] + [Tile(id) for id in buffer[offset:offset + count]]
+            offset += count
+            if flags & FLAG_RIVER_FLAGS:
+                known_flags[i] += list(buffer[offset:offset + count])
+                offset += count
+            else:
+                known_flags[i] += [0] * count
+        calls = []
+        for i in range(players):
+            count = buffer[offset]
+            offset += 1
+            seat_calls = []
+            for _ in range(count):
+                call, offset = _unpack_marked(buffer, offset)
+                seat_calls.append(call)
+            calls.append(seat_calls)
+        melds = None
+        if flags & FLAG_MELDS:
+            melds = []
+            for i in range(players):
+                count = buffer[offset]
+                offset += 1
+                seat_melds = []
+                for k in range(count):
+                    meld_type, from_seat, called, tile_count = buffer[offset:offset + 4]
+                    offset += 4
+                    ids = list(buffer[offset:offset + tile_count])
+                    offset += tile_count
+                    string = calls[i][k] if count == len(calls[i]) else None
+                    seat_melds.append(Meld(MELD_TYPES[meld_type], ids, from_seat if from_seat != NO_SEAT else None, called if called != 0 else None, string))
+                melds.append(seat_melds)
+        obs = {
+            "active_player": active_player,
+            "player_idx": player_idx,
+            "hand": hand,
+            "dora_indicators": dora_indicators,
+            "discarded_tiles": [list(discards) for discards in known],
+            "calls": calls,
+            "wind": WINDS[wind],
+            "repeat": repeat,
+            "wind_e": wind_e,
+            "credits": credits,
+            "reach": [bool(reach_bits >> i & 1) for i in range(players)],
+            "ippatsu": [bool(ippatsu_bits >> i & 1) for i in range(players)],
+            "tiles_left": tiles_left,
+            "player_state": PLAYER_STATES[player_state],
+            "incoming_tile": Tile(incoming_tile) if flags & FLAG_INCOMING_TILE else None
+        }
+        if flags & FLAG_IS_ANKAN:
+            obs["is_ankan"] = True
+        if obs["player_state"] == "end_game":
+            obs["tenpai"] = bool(flags & FLAG_TENPAI)
+        if obs["player_state"] == "active":
+            obs["rinshan"] = bool(flags & FLAG_RINSHAN)
+        if flags & FLAG_RIVER_FLAGS:
+            obs["river_flags"] = [list(seat_flags) for seat_flags in known_flags]
+        if melds is not None:
+            obs["melds"] = melds
+        if unseen is not None:
+            obs["unseen"] = unseen
+        if safe_bits is not None:
+            obs["discard_bits"] = [get_bits(get_index(tile.get_id()) for tile in discards) for discards in known]
+            obs["safe_bits"] = safe_bits[:players]
+            obs["passed_bits"] = safe_bits[players]
+        return obs
+
+_decision_length = struct.Struct("<I")
+
+def pack_decision(encoder: ObservationEncoder, obs: dict, action_space: list) -> bytes:
+    '''
+    Function: pack_decision()
+
+    ## Description
+
+    Packs an observation and its action space into one message body, as
+    posted by a `FlaskAgent` using the binary wire format.
+    '''
+    obs_message = encoder.encode(obs)
+    return _decision_length.pack(len(obs_message)) + obs_message + encode_action_space(action_space)
+
+def unpack_decision(decoder: ObservationDecoder, buffer: bytes) -> tuple:
+    '''
+    Function: unpack_decision()
+
+    ## Description
+
+    Inverse of `pack_decision()`.
+
+    ## Returns
+
+    `tuple`
+        `(obs, action_space)`
+    '''
+    length = _decision_length.unpack_from(buffer, 0)[0]
+    start = _decision_length.size
+    obs = decoder.decode(buffer[start:start + length])
+    return obs, decode_action_space(buffer[start + length:])
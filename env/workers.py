@@ -0,0 +1,99 @@
+'''
+File: workers.py
+Author: Kunologist
+Description:
+    Process pools for self-play and evaluation whose workers start warm.
+    Workers are forked from a fork server that has already imported the
+    engine, so each one shares the loaded modules and tables with the fork
+    server copy-on-write instead of importing them again.
+'''
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Modules imported once by the fork server, inherited by every worker
+PRELOAD = [
+    "env",
+    "env.mahjong",
+    "env.utils",
+    "env.tables",
+    "env.agent",
+    "env.wall_bank",
+    "env.duplicate",
+    "mahjong.shanten",
+    "mahjong.hand_calculating.hand",
+    "mahjong.hand_calculating.hand_config",
+    "mahjong.tile",
+    "numpy"
+]
+
+def get_context(method: str = None, preload: list = None):
+    '''
+    Function: get_context()
+
+    ## Description
+
+    Returns the multiprocessing context workers are started with.
+
+    ## Parameters
+
+    - `method`: `str` or `None`
+        The start method. Defaults to `"forkserver"` where it is available
+        (Linux, macOS) and to `"spawn"` elsewhere.
+    - `preload`: `list` or `None`
+        Modules imported by the fork server in addition to `PRELOAD`.
+
+    ## Details
+
+    The fork server is started by the first pool that uses it and is then
+    shared by all pools of the process, so the preload list only has an
+    effect if it is set before the first forkserver pool is created.
+    '''
+    if method is None:
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    context = multiprocessing.get_context(method)
+    if method == "forkserver":
+        context.set_forkserver_preload(PRELOAD + list(preload or []))
+    return context
+
+def _initialize(initializer, initargs):
+    from env import warmup
+    warmup()
+    if initializer is not None:
+        initializer(*initargs)
+
+def make_pool(processes: int = None, method: str = None, preload: list = None, initializer=None, initargs: tuple = ()) -> ProcessPoolExecutor:
+    '''
+    Function: make_pool()
+
+    ## Description
+
+    Creates a process pool whose workers call `env.warmup()` before taking
+    any task. With the fork server, the modules are already imported by
+    then and warming up only builds the calculator objects.
+
+    ## Parameters
+
+    - `processes`: `int` or `None`
+        The number of workers, `None` for one per CPU.
+    - `method`: `str` or `None`
+        The start method, see `get_context()`.
+    - `preload`: `list` or `None`
+        Extra modules for the fork server to import, e.g. the module of
+        the agents under test.
+    - `initializer`, `initargs`
+        Called in every worker after warming up, as in
+        `ProcessPoolExecutor`.
+
+    ## Returns
+
+    `ProcessPoolExecutor`
+
+    ## Examples
+
+    ```python
+    >>> with make_pool(8, preload=["my_agents"]) as pool:
+    ...     results = list(pool.map(play, seeds))
+    ```
+    '''
+    return ProcessPoolExecutor(max_workers=processes, mp_context=get_context(method, preload), initializer=_initialize, initargs=(initializer, initargs))
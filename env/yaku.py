@@ -0,0 +1,220 @@
+'''
+File: yaku.py
+Author: Kunologist
+Description:
+    A fast check of whether a complete hand has a yaku, from the counts of
+    its tiles and its melds, so that the action space only offers wins
+    that can be scored. The full scorer (`get_value()`) is only called for
+    the hands the fast check cannot settle.
+'''
+
+from env.meld import get_index
+from env.utils import get_tile_counts, KOKUSHI_INDICES
+
+WINDS = ["E", "S", "W", "N"]
+DRAGON_INDICES = [31, 32, 33]
+# Yaku that are not counted towards `minYaku`
+DORA_NAMES = ["Dora", "Aka Dora"]
+
+def get_required_han(min_yaku: str) -> int:
+    '''
+    Function: get_required_han()
+
+    ## Description
+
+    Returns the han of yaku a win needs under the `minYaku` rule. A win
+    always needs one yaku, so `"0"` and `"1"` both require one han;
+    `"mangan"` requires five and `"yakuman"` thirteen. Dora do not count.
+    '''
+    if min_yaku == "mangan":
+        return 5
+    if min_yaku == "yakuman":
+        return 13
+    return max(int(min_yaku), 1)
+
+def get_situation(obs: dict, is_tsumo: bool, ruleset = None) -> dict:
+    '''
+    Function: get_situation()
+
+    ## Description
+
+    Returns the situation of a win by the player of an observation, as the
+    keyword arguments of `get_value()`: tsumo, riichi, ippatsu, rinshan,
+    chankan, haitei, houtei and the winds (as 34-indices). Ippatsu is only
+    counted if the ruleset (`enableIppatsu`) allows it.
+    '''
+    player_idx = obs["player_idx"]
+    players = len(obs["reach"])
+    last_tile = obs["tiles_left"] == 0
+    rinshan = bool(obs.get("rinshan")) and is_tsumo
+    chankan = obs.get("player_state") == "chankan"
+    ippatsu = bool(obs["ippatsu"][player_idx]) and (ruleset is None or bool(ruleset.get_rule("enableIppatsu")))
+    return {
+        "is_tsumo": is_tsumo,
+        "is_riichi": bool(obs["reach"][player_idx]),
+        "is_ippatsu": ippatsu,
+        "is_rinshan": rinshan,
+        "is_chankan": chankan,
+        "is_haitei": last_tile and is_tsumo and not rinshan,
+        "is_houtei": last_tile and not is_tsumo and not chankan,
+        "player_wind": 27 + (player_idx - obs["wind_e"]) % players,
+        "round_wind": 27 + WINDS.index(obs["wind"])
+    }
+
+def _is_pinfu(counts: list, win_index: int, value_indices: list) -> bool:
+    # Four runs and a pair that is not a value tile, won on a two-sided
+    # wait. Runs are taken from the lowest tile, which is the only way to
+    # split the counts into runs
+    for pair in range(34):
+        if counts[pair] < 2 or pair in value_indices:
+            continue
+        rest = list(counts)
+        rest[pair] -= 2
+        if any(rest[27:]):
+            continue
+        starts = []
+        for index in range(27):
+            while rest[index] > 0:
+                if index % 9 > 6 or rest[index + 1] == 0 or rest[index + 2] == 0:
+                    break
+                for k in range(3):
+                    rest[index + k] -= 1
+                starts.append(index)
+            if rest[index] > 0:
+                break
+        else:
+            if any(start == win_index and start % 9 != 6 or start + 2 == win_index and start % 9 != 0 for start in starts):
+                return True
+    return False
+
+def count_yaku_han(counts: list, melds: list, win_index: int, situation: dict, kuitan: bool = True) -> int:
+    '''
+    Function: count_yaku_han()
+
+    ## Description
+
+    Counts the han of the yaku of a complete hand that can be read from
+    its counts and its melds: riichi, ippatsu, menzen tsumo, rinshan,
+    chankan, haitei, houtei, tanyao, yakuhai, pinfu, chiitoitsu, toitoi,
+    honitsu, chinitsu and kokushi mosou. Other yaku (e.g. iipeikou,
+    sanshoku, ittsu, chanta) are not counted, so the result is a lower
+    bound of the han of the hand, dora excluded.
+
+    ## Parameters
+
+    - `counts`: `list`
+        The counts of the closed tiles, the winning tile included, see
+        `get_tile_counts()`.
+    - `melds`: `list` of `Meld`
+        The calls of the player.
+    - `win_index`: `int`
+        The 34-index of the winning tile.
+    - `situation`: `dict`
+        See `get_situation()`.
+    - `kuitan`: `bool`
+        Whether tanyao counts for open hands (`enableKuitan`).
+
+    ## Returns
+
+    `int`
+    '''
+    closed = all(not meld.is_open() for meld in melds)
+    total = list(counts)
+    for meld in melds:
+        for id in meld.tiles:
+            total[get_index(id)] += 1
+    if closed and len(melds) == 0 and sum(counts) == 14 and all(counts[index] > 0 for index in KOKUSHI_INDICES):
+        return 13
+    han = 0
+    # Situation
+    if situation["is_riichi"]:
+        han += 1
+        if situation["is_ippatsu"]:
+            han += 1
+    if closed and situation["is_tsumo"]:
+        han += 1
+    for key in ["is_rinshan", "is_chankan", "is_haitei", "is_houtei"]:
+        if situation[key]:
+            han += 1
+    # Tanyao
+    if (closed or kuitan) and not any(total[index] for index in KOKUSHI_INDICES):
+        han += 1
+    # Yakuhai, honors can only be in triplets
+    value_indices = DRAGON_INDICES + [situation["player_wind"], situation["round_wind"]]
+    for index in value_indices:
+        if total[index] >= 3:
+            han += 1
+    # Chiitoitsu, toitoi and pinfu
+    if closed and len(melds) == 0 and all(count in (0, 2) for count in counts):
+        han += 2
+    elif all(count in (0, 2, 3) for count in counts) and list(counts).count(2) == 1 and all(meld.type != "chii" for meld in melds):
+        han += 2
+    elif len(melds) == 0 and _is_pinfu(counts, win_index, value_indices):
+        han += 1
+    # Flushes
+    suits = [suit for suit in range(3) if any(total[suit * 9:suit * 9 + 9])]
+    if len(suits) == 1:
+        if any(total[27:]):
+            han += 3 if closed else 2
+        else:
+            han += 6 if closed else 5
+    return han
+
+def has_yaku(hand: list, melds: list, incoming_tile, obs: dict, is_tsumo: bool, ruleset = None) -> bool:
+    '''
+    Function: has_yaku()
+
+    ## Description
+
+    Checks whether a complete hand meets `minYaku`, see
+    `get_required_han()`. The yaku read by `count_yaku_han()` settle most
+    hands in microseconds; otherwise, the hand is scored by `get_value()`.
+
+    ## Parameters
+
+    - `hand`: `list` of `Tile`
+        The closed tiles, the winning tile included.
+    - `melds`: `list` of `Meld`
+        The calls of the player.
+    - `incoming_tile`: `Tile`
+        The winning tile.
+    - `obs`: `dict`
+        The observation of the player.
+    - `is_tsumo`: `bool`
+        Whether the win is a tsumo.
+    - `ruleset`: `Ruleset` or `None`
+        The ruleset, for `minYaku` and `enableKuitan`. Defaults to the
+        default rules.
+
+    ## Returns
+
+    `bool`
+    '''
+    from env.ruleset import default
+
+    rules = ruleset.get_rules() if ruleset is not None else default
+    required = get_required_han(rules.get("minYaku", "0"))
+    kuitan = rules.get("enableKuitan", True)
+    counts = get_tile_counts(hand)
+    if counts is None:
+        return False
+    situation = get_situation(obs, is_tsumo, ruleset)
+    if count_yaku_han(counts, melds, get_index(incoming_tile.get_id()), situation, kuitan) >= required:
+        return True
+    # Yaku the fast check does not read, from the full scorer
+    from env.deck import Deck
+    from env.utils import get_value
+
+    deck = Deck(list(hand))
+    for meld in melds:
+        for tile in meld.get_tiles():
+            deck += tile
+    try:
+        value = get_value(deck, incoming_tile, melds, has_open_tanyao=kuitan, **situation)
+    except IndexError:
+        # The scorer of the mahjong library fails on some open hands
+        # without yaku
+        return False
+    if value.error is not None or value.yaku is None:
+        return False
+    return sum(yaku.han_closed if yaku.han_open is None or not any(meld.is_open() for meld in melds) else yaku.han_open for yaku in value.yaku if yaku.name not in DORA_NAMES) >= required
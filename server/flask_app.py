@@ -1,36 +1,67 @@
 from flask import Flask, request, jsonify
 import json
 import os
-import time
+import sys
+import struct
+import threading
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.insert(0, parent)
+
+from env.decision_board import DecisionBoard
+from env.events import ObservationTracker
+from env.metrics import MetricsRegistry, collect
+from env.wire import ObservationDecoder, unpack_decision
 
 # Create a flask app
 app = Flask("flask")
 
-class MahjongServerState:
-    IDLE = 0
-    AWAIT = 1
+# Pending decisions of every table and seat hosted by this server. Undecided
+# actions fall back to the first action of the action space after 10 minutes.
+board = DecisionBoard(default_timeout=600)
+# Binary observations are delta-encoded, one decoder per table
+decoders = {}
+# Delta observations are applied to one tracker per table and seat
+trackers = {}
+decoders_lock = threading.Lock()
 
-server = {
-    "observation": None,
-    "action_space": None,
-    "state": MahjongServerState.IDLE,
-    "output_file": None
-}
+def decision_key(args):
+    return args.get('table_id', "0"), int(args.get('seat', 0)), args.get('decision_id')
 
 @app.route('/observation_update', methods=['POST'])
 def observation_update():
-    if server["state"] == MahjongServerState.IDLE:
-        # Get incoming json
-        req = request.get_json()
-        # Update server info
-        server["observation"] = json.loads(req["observation"])
-        server["output_file"] = req["file"]
-        server["state"] = MahjongServerState.AWAIT
-        print(server["observation"])
-        # Return json
-        return jsonify({"success": True})
-    else:
-        return jsonify({"success": False, "error": "Server already has an observation"})
+    try:
+        if request.mimetype == "application/octet-stream":
+            # Compact binary wire format, see env/wire.py
+            key = decision_key(request.args)
+            timeout = request.args.get("timeout", type=float)
+            with decoders_lock:
+                decoder = decoders.setdefault(key[0], ObservationDecoder())
+                obs, action_space = unpack_decision(decoder, request.get_data())
+            observation = json.loads(json.dumps(obs, default=lambda o: o.to_json()))
+            action_space = json.loads(json.dumps(action_space, default=lambda o: o.to_json()))
+        else:
+            # Get incoming json
+            req = request.get_json()
+            key = (req.get("table_id", "0"), int(req["seat"]), req["decision_id"])
+            timeout = req.get("timeout")
+            if "delta" in req:
+                with decoders_lock:
+                    tracker = trackers.setdefault(key[:2], ObservationTracker())
+                    obs = tracker.update(json.loads(req["delta"]))
+                observation = json.loads(json.dumps(obs, default=lambda o: o.to_json()))
+            else:
+                observation = json.loads(req["observation"])
+            action_space = json.loads(req["action_space"])
+    except (ValueError, KeyError, TypeError, IndexError, struct.error):
+        return jsonify({"success": False, "error": "Malformed observation"})
+    if key[2] is None:
+        return jsonify({"success": False, "error": "Missing decision id"})
+    if not board.post(*key, observation, action_space, timeout=timeout):
+        return jsonify({"success": False, "error": "Duplicate decision id"})
+    # Return json
+    return jsonify({"success": True, "decision_id": key[2]})
 
 def legacy(action_space, obs):
     s = ""
@@ -84,14 +115,20 @@ def legacy(action_space, obs):
 
 @app.route("/debug", methods=['GET'])
 def debug():
-    return "Debug\n\nState: {} \n\nObservation: {} \n\nAction Space: {}".format(server["state"], server["observation"], server["action_space"])
+    return "Debug\n\nPending: {} \n\nStats: {}".format(board.pending(), board.stats)
 
+# /action_input?table_id=0&seat=1, human-readable view of the next decision
 @app.route('/action_input', methods=['GET'])
 def action_input():
+    try:
+        decision = board.next_pending(request.args.get('table_id', "0"), int(request.args.get('seat', 0)))
+    except ValueError:
+        return "Seat is not an integer"
     # Create human-readbale observation state
-    if server["state"] == MahjongServerState.AWAIT:
+    if decision is not None:
+        observation = decision.observation
         output = "<p>【<b>"
-        wind = server["observation"]["wind"]
+        wind = observation["wind"]
         if wind == "E":
             output += "東"
         elif wind == "S":
@@ -100,14 +137,23 @@ def action_input():
             output += "西"
         elif wind == "N":
             output += "北"
-        output += "</b>" + str(server["observation"]["wind_e"] + 1) + "局 · "
-        output += str(server["observation"]["repeat"]) + "本場 · 供託" + "0" + "点 · 自風："
-        output += ["東", "南", "西", "北", "東", "南", "西", "北"][server["observation"]["player_idx"] - server["observation"]["wind_e"] + 4]
-        output += "】余" + str(server["observation"]["tiles_left"]) + '枚</p><p style="font-size:45px">'
-        output += ''.join(server["observation"]["hand"]["tiles"]) + " + " + server["observation"]["incoming_tile"]["unicode"] + '</p><p style="font-size:30px">'
+        output += "</b>" + str(observation["wind_e"] + 1) + "局 · "
+        output += str(observation["repeat"]) + "本場 · 供託" + "0" + "点 · 自風："
+        output += ["東", "南", "西", "北", "東", "南", "西", "北"][observation["player_idx"] - observation["wind_e"] + 4]
+        output += "】余" + str(observation["tiles_left"]) + '枚</p><p style="font-size:45px">'
+        output += ''.join(observation["hand"]["tiles"])
+        if observation["incoming_tile"]:
+            output += " + " + observation["incoming_tile"]["unicode"]
+        output += '</p><p style="font-size:30px">'
         output += '表ドラ表示: ' + ''.join([
-            tile["unicode"] for tile in server["observation"]["dora_indicators"]
-        ]) + "</p>"
+            tile["unicode"] for tile in observation["dora_indicators"]
+        ]) + "</p><p>"
+        for i in range(len(decision.action_space)):
+            action = decision.action_space[i]
+            output += '<a href="/action_submit?table_id={}&seat={}&decision_id={}&action={}">{:02d}: {} {}</a> '.format(
+                decision.key[0], decision.key[1], decision.key[2], i, i, action["action_type"], action["action_string"]
+            )
+        output += "</p>"
         html = f"""<!DOCTYPE html><html>
 <head>
     <title>Mahjong Action Input</title>
@@ -122,31 +168,64 @@ def action_input():
     else:
         return "Waiting for observation"
 
-# /action_submit?action=3, get parameter action
+# /decision_next?table_id=0&seat=1&timeout=10, long-polled by remote clients
+@app.route('/decision_next', methods=['GET'])
+def decision_next():
+    try:
+        table_id, seat, _ = decision_key(request.args)
+        timeout = float(request.args.get('timeout', 10))
+    except ValueError:
+        return jsonify({"success": False, "error": "Malformed query"})
+    decision = board.next_pending(table_id, seat, timeout)
+    if decision is None:
+        return jsonify({"success": False, "pending": True})
+    return jsonify({"success": True, "decision": decision.to_json()})
+
+# /action_submit?table_id=0&seat=1&decision_id=...&action=3, get parameter action
 @app.route('/action_submit', methods=['GET'])
 def action_submit():
     # Get action
     action = request.args.get('action')
     try:
         action = int(action)
+        key = decision_key(request.args)
     except:
         return jsonify({"success": False, "error": "Action is not an integer"})
-    # Check if server is in AWAIT state
-    if server["state"] == MahjongServerState.AWAIT:
-        # Write action to file
-        try:
-            with open(server["output_file"], "w") as f:
-                f.write(str(action))
-        except:
-            return jsonify({"success": False, "error": "Could not write to file " + server["output_file"]})
-        # Update server state
-        server["state"] = MahjongServerState.IDLE
-        # Return json
-        return jsonify({"success": True})
-    else:
-        return jsonify({"success": False, "error": "Server is not in AWAIT state"})
+    if not board.submit(*key, action):
+        return jsonify({"success": False, "error": "Unknown decision id"})
+    # Return json
+    return jsonify({"success": True})
 
+# /action_wait?table_id=0&seat=1&decision_id=...&timeout=10, long-polled by FlaskAgent
+@app.route('/action_wait', methods=['GET'])
+def action_wait():
+    try:
+        key = decision_key(request.args)
+        timeout = float(request.args.get('timeout', 10))
+    except ValueError:
+        return jsonify({"success": False, "error": "Malformed query"})
+    try:
+        action = board.wait(*key, timeout)
+    except KeyError:
+        return jsonify({"success": False, "error": "Unknown decision id"})
+    if action is None:
+        return jsonify({"success": False, "pending": True, "decision_id": key[2]})
+    return jsonify({"success": True, "decision_id": key[2], "action": action})
 
-# Deploy at localhost:10317
-app.run(host='localhost', port=10317, debug=True)
+# Prometheus metrics: the decisions of this server, plus the snapshots that
+# self-play workers write to $MAHJONG_METRICS_DIR (see env/metrics.py)
+metrics = MetricsRegistry()
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    snapshot = {"counters": {}, "histograms": {}}
+    if os.environ.get("MAHJONG_METRICS_DIR"):
+        snapshot = collect(os.environ["MAHJONG_METRICS_DIR"])
+    for name, value in board.stats.items():
+        snapshot["counters"]["server_decisions_{}_total".format(name)] = value
+    return metrics.render(snapshot), 200, {"Content-Type": "text/plain; version=0.0.4"}
+
+
+# Deploy at localhost:10317
+if __name__ == "__main__":
+    app.run(host='localhost', port=10317, debug=True, threaded=True)
@@ -0,0 +1,57 @@
+import os
+import sys
+
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.insert(0, parent)
+
+from env.cache import LRUCache, get_hand_key, configure_cache, clear_cache, get_cache_stats, DEFAULT_CAPACITY
+from env.deck import Deck
+from env.tiles import Tile
+from env.utils import get_tile_counts, check_reach, check_agari
+
+# Hand key test
+
+def test_hand_key_is_canonical():
+    a = get_tile_counts(Deck("123m456p789s11z").get_tiles())
+    b = get_tile_counts(list(reversed(Deck("11z789s456p123m").get_tiles())))
+    assert get_hand_key(a) == get_hand_key(b)
+    # Red fives do not change the counts
+    assert get_hand_key(get_tile_counts(Deck("0m123m456p789s1z").get_tiles())) == get_hand_key(get_tile_counts(Deck("5m123m456p789s1z").get_tiles()))
+    assert get_hand_key(a) != get_hand_key(get_tile_counts(Deck("123m456p789s12z").get_tiles()))
+
+# LRU test
+
+def test_lru_eviction_and_stats():
+    cache = LRUCache(2)
+    calls = []
+    def compute(x):
+        calls.append(x)
+        return x * 2
+    assert cache.get("a", compute, 1) == 2
+    assert cache.get("b", compute, 2) == 4
+    assert cache.get("a", compute, 1) == 2
+    assert cache.get("c", compute, 3) == 6 # evicts b
+    assert cache.get("b", compute, 2) == 4
+    assert calls == [1, 2, 3, 2]
+    stats = cache.get_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 4 and stats["size"] == 2
+    cache.resize(1)
+    assert cache.get_stats()["size"] == 1
+
+def test_cached_rule_checks():
+    clear_cache()
+    deck = Deck("5056p06777s456m4s7m")
+    first = check_reach(deck)
+    second = check_reach(Deck("5556p56777s456m4s7m"))
+    assert [tile.get_id() for tile in first] == [tile.get_id() for tile in second]
+    assert all(not tile.is_red_dora() for tile in first)
+    assert get_cache_stats()["check_reach"]["hits"] == 1
+    configure_cache(0)
+    try:
+        check_agari(deck)
+        check_agari(deck)
+        assert get_cache_stats()["check_agari"]["size"] == 0
+    finally:
+        configure_cache(DEFAULT_CAPACITY)
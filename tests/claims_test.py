@@ -0,0 +1,181 @@
+import os
+import sys
+import json
+import random
+import threading
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.insert(0, parent)
+
+from env.action import Action
+from env.agent import Agent
+from env.deck import Deck
+from env.mahjong import MahjongGame, MahjongEndGame
+from env.player import Player
+from env.ruleset import Ruleset
+from env.utils import get_tile_counts, get_waits_counts, may_claim_counts
+
+class ScriptedAgent(Agent):
+    # Returns the given action whatever the action space
+    def __init__(self, name, action):
+        self.name = name
+        self.action = action
+
+    def query(self, obs, action_space):
+        return self.action
+
+class BatchAgent(Agent):
+    # Counts the batches it is queried with
+    def __init__(self, name):
+        self.name = name
+        self.batches = []
+
+    def query(self, obs, action_space):
+        return action_space[0]
+
+    def query_batch(self, observations, action_spaces):
+        self.batches.append([obs["player_idx"] for obs in observations])
+        return super(BatchAgent, self).query_batch(observations, action_spaces)
+
+def make_game(multi_ron=True):
+    ruleset = Ruleset(json.dumps({"rules": {"enableMultiRon": multi_ron}}))
+    game = MahjongGame(ruleset, wall=1)
+    game.initialize_game()
+    performed = []
+    game.perform_action = lambda action, obs: performed.append((obs["player_idx"], action.action_type))
+    game.calculate_credits = lambda player_idx, ron_or_tsumo, ron_from, obs: [1000 if i == player_idx else -1000 if i == ron_from else 0 for i in range(4)]
+    return game, performed
+
+def resolve(game, actions, discarder=0):
+    observations = [{"player_idx": (discarder + k) % 4, "active_player": discarder} for k in range(1, 4)]
+    game.resolve_claims(observations, actions)
+
+# Claim arbitration test
+
+def test_pon_beats_chii():
+    game, performed = make_game()
+    resolve(game, [Action.CHII("c111213"), Action.NOOP(), Action.PON("p111111")])
+    assert performed == [(3, "pon")]
+
+def test_no_claims():
+    game, performed = make_game()
+    resolve(game, [Action.NOOP(), Action.NOOP(), Action.NOOP()])
+    assert performed == []
+
+def test_multi_ron():
+    game, performed = make_game()
+    try:
+        resolve(game, [Action.RON(), Action.PON("p111111"), Action.RON()], discarder=2)
+        assert False, "The game did not end"
+    except MahjongEndGame:
+        pass
+    assert game.state["end_game"]["credits"] == [0, 1000, -2000, 1000]
+    assert performed == []
+
+def test_head_bump():
+    game, performed = make_game(multi_ron=False)
+    try:
+        resolve(game, [Action.NOOP(), Action.RON(), Action.RON()], discarder=1)
+        assert False, "The game did not end"
+    except MahjongEndGame:
+        pass
+    # Seat 3 comes before seat 0 in turn order from seat 1
+    assert game.state["end_game"]["credits"] == [0, -1000, 0, 1000]
+
+def test_ask_all_batches_seats():
+    game = MahjongGame(Ruleset(), wall=1)
+    agent = BatchAgent("batch")
+    for i in range(3):
+        game.set_player(i, Player("batch", agent=agent))
+    game.set_player(3, Player("noop", agent=ScriptedAgent("noop", Action.NOOP())))
+    game.initialize_game()
+    seats = [1, 2, 3]
+    observations = [game.get_observation(i, {"player_state": "passive", "incoming_tile": game.hands[0].get_tiles()[0]}) for i in seats]
+    actions = game.ask_all(seats, observations)
+    assert agent.batches == [[1, 2]]
+    assert [action.action_type for action in actions] == ["noop", "noop", "noop"]
+
+class ThreadAgent(Agent):
+    # A concurrent agent recording the thread it is queried in
+    concurrent = True
+
+    def __init__(self, name):
+        self.name = name
+        self.threads = []
+
+    def query(self, obs, action_space):
+        self.threads.append(threading.get_ident())
+        return action_space[0]
+
+class ThreadPlayer(Player):
+    # Records the threads computing the action spaces
+    def get_action_space(self, obs):
+        self.agent.space_threads.append(threading.get_ident())
+        return super(ThreadPlayer, self).get_action_space(obs)
+
+def test_ask_all_action_spaces_on_caller():
+    game = MahjongGame(Ruleset(), wall=1)
+    agents = [ThreadAgent("thread {}".format(i)) for i in range(4)]
+    for i in range(4):
+        agents[i].space_threads = []
+        game.set_player(i, ThreadPlayer(agents[i].name, agent=agents[i]))
+    game.initialize_game()
+    seats = [1, 2, 3]
+    observations = [game.get_observation(i, {"player_state": "passive", "incoming_tile": game.hands[0].get_tiles()[0]}) for i in seats]
+    game.ask_all(seats, observations)
+    # Only the queries run in other threads
+    assert all(agents[i].space_threads == [threading.get_ident()] for i in seats)
+    assert all(agents[i].threads != [threading.get_ident()] and len(agents[i].threads) == 1 for i in seats)
+
+# Fast-forward test
+
+class CallingAgent(Agent):
+    # Calls whenever possible, otherwise discards at random. Only draws
+    # from its generator for a real choice, so that skipping noop-only
+    # decisions leaves the game unchanged
+    def __init__(self, name, seed):
+        self.name = name
+        self.random = random.Random(seed)
+
+    def query(self, obs, action_space):
+        calls = [action for action in action_space if action.action_type in ["chii", "pon"]]
+        if len(calls) > 0:
+            return calls[0]
+        choices = [action for action in action_space if action.action_type in ["noop", "discard", "replace", "ten", "noten"]]
+        if len(choices) == 1:
+            return choices[0]
+        return self.random.choice(choices)
+
+def play(seed, fast_forward):
+    game = MahjongGame(Ruleset(), wall=seed, fast_forward=fast_forward)
+    for i in range(4):
+        game.set_player(i, Player("Agent {}".format(i), agent=CallingAgent("Agent {}".format(i), seed * 4 + i)))
+    game.initialize_game()
+    for _ in range(40):
+        game.step()
+    return game
+
+def test_may_claim_counts():
+    counts = get_tile_counts(Deck("123m456p789s1122z").get_tiles())
+    # 1z and 2z complete the hand
+    assert get_waits_counts(counts) == frozenset([27, 28])
+    assert may_claim_counts(counts, 27, reach=True)
+    assert may_claim_counts(counts, 28)
+    assert not may_claim_counts(counts, 13)
+    # 4m only makes a chii with 2m3m
+    assert not may_claim_counts(counts, 3)
+    assert may_claim_counts(counts, 3, chii=True)
+    assert not may_claim_counts(counts, 3, chii=True, reach=True)
+    assert not may_claim_counts(counts, 9, chii=True)
+
+def test_fast_forward_keeps_the_game():
+    for seed in [1, 2]:
+        normal = play(seed, False)
+        fast = play(seed, True)
+        assert fast.skipped_decisions > 0
+        assert normal.skipped_decisions == 0
+        assert fast.state["calls"] == normal.state["calls"]
+        assert fast.state["discarded_tiles"] == normal.state["discarded_tiles"]
+        assert [hand.get_tiles() for hand in fast.hands] == [hand.get_tiles() for hand in normal.hands]
+        assert len(fast.history["actions"]) + fast.skipped_decisions == len(normal.history["actions"])
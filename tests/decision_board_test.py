@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+import threading
+
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.insert(0, parent)
+
+from env.decision_board import DecisionBoard
+
+# Decision board test
+
+def test_board_keys():
+    board = DecisionBoard()
+    assert board.post("a", 0, "x", {}, [])
+    assert board.post("b", 0, "x", {}, [])
+    assert board.post("a", 1, "x", {}, [])
+    assert not board.post("a", 0, "x", {}, [])
+    assert len(board.pending()) == 3
+    assert len(board.pending("a")) == 2
+    assert board.pending("a", 1) == [("a", 1, "x")]
+    assert board.submit("a", 1, "x", 2)
+    assert not board.submit("a", 1, "x", 3)
+    assert board.wait("a", 1, "x", 0) == 2
+    assert board.wait("a", 0, "x", 0) is None
+
+def test_board_next_pending():
+    board = DecisionBoard()
+    assert board.next_pending("t", 2) is None
+    board.post("t", 2, "first", {}, [])
+    board.post("t", 2, "second", {}, [])
+    assert board.next_pending("t", 2).key == ("t", 2, "first")
+    board.submit("t", 2, "first", 0)
+    assert board.next_pending("t", 2).key == ("t", 2, "second")
+    # A long-polling client is woken up by a new decision
+    result = []
+    thread = threading.Thread(target=lambda: result.append(board.next_pending("t", 3, timeout=5)))
+    thread.start()
+    board.post("t", 3, "third", {}, [])
+    thread.join(5)
+    assert result[0].key == ("t", 3, "third")
+
+def test_board_timeout():
+    board = DecisionBoard(default_timeout=0.05, default_action=0)
+    board.post("t", 0, "late", {}, ["noop", "pon"])
+    assert board.wait("t", 0, "late", 5) == 0
+    assert board.stats["timed_out"] == 1
+    board.post("t", 0, "later", {}, ["noop", "pon"], timeout=0)
+    assert not board.submit("t", 0, "later", 1)
+    assert board.wait("t", 0, "later", 5) == 0
+
+def test_board_releases_decisions():
+    # Answered by a push listener, as the responder of a local server does
+    board = DecisionBoard()
+    board.add_listener(lambda decision: board.submit(*decision.key, 1))
+    for i in range(100):
+        board.post("t", i % 4, str(i), {}, [])
+        assert board.wait("t", i % 4, str(i), 0) == 1
+    assert all(len(queue) == 0 for queue in board.queues.values())
+    assert len(board.decisions) == 0
+    # Abandoned decisions are dropped after their deadline
+    board = DecisionBoard(default_timeout=0, retention=0.05)
+    for i in range(10):
+        board.post("t", 0, str(i), {}, [])
+    time.sleep(0.05)
+    assert board.expire() == 10
+    assert len(board.decisions) == 0
+    assert len(board.queues[("t", 0)]) == 0
@@ -50,3 +50,44 @@ def test_deck_pop():
     another_deck = Deck("1m1s1z")
     assert deck.pop() == Tile("1z")
     assert deck - another_deck == Deck("1p")
+
+# Wall random number generator test
+
+def test_wall_seed_is_isolated():
+    from env.deck import Wall
+    from env.ruleset import Ruleset
+    import random
+    ruleset = Ruleset()
+    random.seed(0)
+    expected = random.random()
+    random.seed(0)
+    wall = Wall(ruleset, random_seed=114)
+    # The global generator is neither reseeded nor consumed
+    assert random.random() == expected
+    assert Wall(ruleset, random_seed=114).get_tiles() == wall.get_tiles()
+    assert Wall(ruleset, random_seed=115).get_tiles() != wall.get_tiles()
+    assert Wall(ruleset).random_seed != Wall(ruleset).random_seed
+
+def test_wall_seed_threads():
+    from env.deck import Wall
+    from env.ruleset import Ruleset
+    import threading
+    ruleset = Ruleset()
+    expected = [Wall(ruleset, random_seed=seed).get_tiles() for seed in range(8)]
+    results = [None] * 8
+    def deal(seed):
+        for _ in range(20):
+            results[seed] = Wall(ruleset, random_seed=seed).get_tiles()
+    threads = [threading.Thread(target=deal, args=(seed,)) for seed in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == expected
+
+def test_spawn_seeds():
+    from env.deck import spawn_seeds
+    seeds = spawn_seeds(2022, 16)
+    assert seeds == spawn_seeds(2022, 16)
+    assert len(set(seeds)) == 16
+    assert seeds != spawn_seeds(2023, 16)
@@ -0,0 +1,120 @@
+import io
+import os
+import sys
+import random
+import contextlib
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.insert(0, parent)
+
+from env.agent import Agent
+from env.deck import Deck
+from env.discards import DiscardIndex, get_bits, get_indices
+from env.mahjong import MahjongGame, MahjongEndGame, MahjongRuleError
+from env.meld import get_index
+from env.player import Player
+from env.ruleset import Ruleset
+from env.tiles import Tile
+
+class CheckingAgent(Agent):
+    # Checks the discard bits of every observation against the rivers,
+    # then plays at random
+    def __init__(self, name, seed):
+        self.name = name
+        self.random = random.Random(seed)
+        self.checked = 0
+
+    def query(self, obs, action_space):
+        for i, river in enumerate(obs["discarded_tiles"]):
+            bits = get_bits(get_index(tile.get_id()) for tile in river)
+            assert obs["discard_bits"][i] == bits
+            assert obs["safe_bits"][i] & bits == bits
+            if not obs["reach"][i]:
+                assert obs["safe_bits"][i] == bits
+        self.checked += 1
+        return self.random.choice([action for action in action_space if action.action_type in ["noop", "discard", "replace", "reach", "ten", "noten"]])
+
+def make_game():
+    game = MahjongGame(Ruleset(), wall=1)
+    for i in range(4):
+        game.set_player(i, Player("Agent {}".format(i), agent=CheckingAgent("Agent {}".format(i), i)))
+    game.initialize_game()
+    # 1z and 2z complete the hand of seat 1
+    game.hands[1] = Deck("123m456p789s1122z")
+    return game
+
+def can_ron(game):
+    obs = game.get_observation(1, {"player_state": "passive", "incoming_tile": Tile(41)})
+    return "ron" in [action.action_type for action in game.players[1].get_action_space(obs)]
+
+# Discard index test
+
+def test_bits():
+    assert get_bits([0, 27, 33]) == 1 | 1 << 27 | 1 << 33
+    assert get_indices(get_bits([33, 0, 27])) == [0, 27, 33]
+
+def test_index_events():
+    index = DiscardIndex()
+    index.discard(0, Tile(11))
+    index.discard(0, Tile(53))
+    assert index.discarded[0] == get_bits([0, 22])
+    index.pass_tile(0, Tile(53))
+    assert index.passed == [0, 1 << 22, 1 << 22, 1 << 22]
+    index.turn(1)
+    assert index.passed[1] == 0
+    # Only the tiles passed after the reach are safe
+    index.declare_reach(2)
+    index.discard(3, Tile(47))
+    index.pass_tile(3, Tile(47))
+    assert index.get_safe(2) == 1 << 33
+    assert index.get_safe(0) == get_bits([0, 22])
+
+def test_own_discard_furiten():
+    game = make_game()
+    assert can_ron(game)
+    game.discards.discard(1, Tile(42))
+    assert not can_ron(game)
+
+def test_temporary_furiten():
+    game = make_game()
+    game.discards.pass_tile(0, Tile(42))
+    assert not can_ron(game)
+    game.discards.turn(1)
+    assert can_ron(game)
+
+def test_reach_furiten():
+    game = make_game()
+    game.discards.declare_reach(1)
+    game.discards.pass_tile(0, Tile(42))
+    game.discards.turn(1)
+    assert not can_ron(game)
+
+def test_game_keeps_discard_bits():
+    for seed in range(3):
+        game = MahjongGame(Ruleset(), wall=seed)
+        agents = [CheckingAgent("Agent {}".format(i), seed * 4 + i) for i in range(4)]
+        for i in range(4):
+            game.set_player(i, Player("Agent {}".format(i), agent=agents[i]))
+        game.initialize_game()
+        with contextlib.redirect_stdout(io.StringIO()):
+            try:
+                for _ in range(100):
+                    game.step()
+            except (MahjongEndGame, MahjongRuleError):
+                pass
+        assert sum(agent.checked for agent in agents) > 0
+
+def test_ankan_passes_kanned_tile():
+    from env.action import Action
+
+    game = make_game()
+    game.hands[0] = Deck("1111m456p789s1234z")
+    # Seat 2 waits for kokushi mosou on 1m
+    game.hands[2] = Deck("99m19p19s1234567z")
+    obs = game.get_observation(0, {"player_state": "active", "incoming_tile": Tile(41)})
+    with contextlib.redirect_stdout(io.StringIO()):
+        game.perform_action(Action.AKAN(11), obs)
+    # The incoming tile stays private, only seat 2 could win on the kan
+    assert game.discards.passed == [0, 0, get_bits([0]), 0]
+    assert can_ron(game)
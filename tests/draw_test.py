@@ -0,0 +1,94 @@
+import io
+import os
+import sys
+import json
+import contextlib
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.insert(0, parent)
+
+from env.action import Action
+from env.agent import Agent
+from env.deck import Deck
+from env.mahjong import MahjongGame, MahjongEndGame
+from env.player import Player
+from env.river import FLAG_CALLED
+from env.ruleset import Ruleset
+
+class DeclaringAgent(Agent):
+    # Declares tenpai if allowed and asked to
+    def __init__(self, name, declare=True):
+        self.name = name
+        self.declare = declare
+        self.queries = 0
+
+    def query(self, obs, action_space):
+        self.queries += 1
+        assert obs["player_state"] == "end_game"
+        if self.declare and Action.TEN() in action_space:
+            return Action.TEN()
+        return Action.NOTEN()
+
+def make_game(rules = {}, declare=True, fast_forward=False):
+    game = MahjongGame(Ruleset(json.dumps({"rules": rules})), wall=1, fast_forward=fast_forward)
+    for i in range(4):
+        game.set_player(i, Player("Agent {}".format(i), agent=DeclaringAgent("Agent {}".format(i), declare)))
+    game.initialize_game()
+    # Seat 0 is tenpai, the others are not
+    game.hands = [Deck("123m456p789s1122z")] + [Deck("1357m2468p13579s") for _ in range(3)]
+    game.wall.mountain = Deck([])
+    return game
+
+def draw(game):
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            game.step()
+        assert False, "The game did not end"
+    except MahjongEndGame:
+        pass
+    return game.state["end_game"]
+
+# Exhaustive draw test
+
+def test_noten_penalty():
+    end_game = draw(make_game())
+    assert end_game["reason"] == "wall_empty"
+    assert end_game["tenpai"] == [True, False, False, False]
+    assert end_game["credits"] == [3000, -1000, -1000, -1000]
+
+def test_two_tenpai():
+    game = make_game()
+    game.hands[2] = Deck("111222333m4567p")
+    end_game = draw(game)
+    assert end_game["credits"] == [1500, -1500, 1500, -1500]
+
+def test_no_penalty():
+    end_game = draw(make_game({"enableNoTenPenalty": False}))
+    assert end_game["credits"] == [0, 0, 0, 0]
+
+def test_hidden_tenpai():
+    end_game = draw(make_game(declare=False))
+    assert end_game["tenpai"] == [False, False, False, False]
+    assert end_game["credits"] == [0, 0, 0, 0]
+
+def test_fast_forward_skips_noten():
+    game = make_game(fast_forward=True)
+    draw(game)
+    assert game.skipped_decisions == 3
+    assert [player.agent.queries for player in game.players] == [1, 0, 0, 0]
+
+def test_nagashi_mangan():
+    game = make_game()
+    for i, ids in enumerate([[12, 23], [11, 19, 41, 47], [22, 29], [31, 34]]):
+        for id in ids:
+            game.rivers[i].append(id)
+    end_game = draw(game)
+    assert end_game["reason"] == "nagashi_mangan"
+    assert end_game["credits"] == [-4000, 8000, -2000, -2000]
+    # A called discard breaks nagashi mangan
+    game = make_game()
+    for id in [11, 19, 41]:
+        game.rivers[1].append(id)
+    game.rivers[1].mark_called()
+    assert draw(game)["reason"] == "wall_empty"
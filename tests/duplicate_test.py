@@ -0,0 +1,101 @@
+import os
+import sys
+import json
+import tempfile
+from functools import partial
+
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.insert(0, parent)
+
+from env.action import Action
+from env.agent import Agent, AgentAgari
+from env.deck import get_wall_tile_ids
+from env.duplicate import evaluate, summarize, load_walls, play_wall
+from env.ruleset import Ruleset
+from env.wall_bank import WallBank
+
+class FailingAgent(Agent):
+    def query(self, obs, action_space):
+        raise RuntimeError("no action for {}".format(self.name))
+
+class RuleBreakingAgent(Agent):
+    # Declares an ankan it cannot make as the active player
+    def query(self, obs, action_space):
+        if obs["player_state"] == "active":
+            return Action.AKAN(11)
+        return action_space[0]
+
+def make_tenhou_wall(ruleset):
+    # The dealer draws 1z into 123m456p789s555z1z: a tsumo on the first draw
+    hand = [11, 12, 13, 24, 25, 26, 37, 38, 39, 45, 45, 45, 41]
+    ids = get_wall_tile_ids(ruleset)
+    for id in hand + [41]:
+        ids.remove(id)
+    ids = hand + ids
+    # The first draw is the last tile of the mountain, before the 14-tile dead wall
+    ids.insert(len(ids) - 14, 41)
+    return ids
+
+# Duplicate evaluation test
+
+def test_summarize():
+    results = [
+        [{"seats": [0, 1, 0, 1], "credits": [1000, -1000, 0, 0], "reason": "ron"},
+         {"seats": [1, 0, 1, 0], "credits": [1000, -1000, 0, 0], "reason": "ron"}],
+        [{"seats": [0, 1, 0, 1], "credits": [0, 0, 0, 0], "reason": "error"},
+         {"seats": [1, 0, 1, 0], "credits": [0, 0, 2000, -2000], "reason": "tsumo"}]
+    ]
+    report = summarize(results, 2)
+    assert report["walls"] == 2 and report["games"] == 4 and report["errors"] == 1
+    assert report["reasons"] == {"ron": 2, "error": 1, "tsumo": 1}
+    # The luck of the first wall cancels out
+    assert report["agents"][0]["mean"] == (0 + (-2000 / 4)) / 2
+    assert report["differences"][0]["mean"] == (0 + 4000 / 4) / 2
+    low, high = report["differences"][0]["ci"]
+    assert low < 500 < high
+
+def test_load_walls():
+    ruleset = Ruleset()
+    bank = WallBank.generate(ruleset, 2, seed=1)
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "wall.json")
+        bank[1].save_tiles(filename)
+        walls = load_walls([filename, bank[0], bank.walls[1]])
+    assert walls == [bank.walls[1].tolist(), bank.walls[0].tolist(), bank.walls[1].tolist()]
+    assert load_walls(bank) == bank.walls.tolist()
+
+def test_evaluate_rotations():
+    ruleset = Ruleset()
+    walls = [make_tenhou_wall(ruleset)] * 2
+    agents = [partial(AgentAgari, "first"), partial(AgentAgari, "second")]
+    for processes in [1, 2]:
+        report = evaluate(agents, walls, ruleset, processes=processes)
+        assert report["games"] == 8
+        assert report["reasons"] == {"tsumo": 8}
+        # Both agents were dealer (and won) equally often on every wall,
+        # and tsumo payments sum to zero
+        assert report["agents"][0]["mean"] == report["agents"][1]["mean"] == 0
+        assert report["differences"][0]["mean"] == 0
+
+def test_play_wall_errors(caplog):
+    ruleset = Ruleset()
+    agents = [partial(AgentAgari, "agari"), partial(FailingAgent, "failing")]
+    results = play_wall(ruleset, make_tenhou_wall(ruleset), agents, [0, 1, 0, 1], 0)
+    # The dealer wins on the first draw when agent 0 is seated there
+    assert [result["reason"] for result in results] == ["tsumo", "error", "tsumo", "error"]
+    assert results[0]["error"] is None
+    assert results[1]["error"] == "RuntimeError: no action for failing"
+    assert "RuntimeError" in caplog.text
+    assert summarize([results], 2)["error_types"] == {"RuntimeError": 2}
+
+def test_play_wall_rule_errors():
+    ruleset = Ruleset()
+    agents = [partial(AgentAgari, "agari"), partial(RuleBreakingAgent, "breaking")]
+    results = play_wall(ruleset, make_tenhou_wall(ruleset), agents, [0, 1, 0, 1], 0)
+    assert [result["reason"] for result in results] == ["tsumo", "error", "tsumo", "error"]
+    assert results[1]["error"].startswith("MahjongRuleError: Ankan failed")
+    report = summarize([results], 2)
+    assert report["errors"] == 2
+    assert report["error_types"] == {"MahjongRuleError": 2}
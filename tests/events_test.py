@@ -0,0 +1,77 @@
+import os
+import sys
+import random
+
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.insert(0, parent)
+
+from env.agent import Agent
+from env.events import ObservationTracker, make_delta
+from env.mahjong import MahjongGame
+from env.player import Player
+from env.ruleset import Ruleset
+
+class TrackingAgent(Agent):
+    # Rebuilds every observation from its delta and compares it with the
+    # full observation. Calls whenever possible, otherwise discards.
+    def __init__(self, name, seed):
+        self.name = name
+        self.random = random.Random(seed)
+        self.tracker = ObservationTracker()
+        self.events = 0
+
+    def query(self, obs, action_space):
+        self.events += len(obs["events"])
+        rebuilt = self.tracker.update(make_delta(obs))
+        assert rebuilt["hand"] == obs["hand"]
+        assert [tile.get_id() for tile in rebuilt["dora_indicators"]] == [tile.get_id() for tile in obs["dora_indicators"]]
+        assert [[tile.get_id() for tile in d] for d in rebuilt["discarded_tiles"]] == [[tile.get_id() for tile in d] for d in obs["discarded_tiles"]]
+        assert rebuilt["calls"] == obs["calls"]
+        assert rebuilt["river_flags"] == obs["river_flags"]
+        assert rebuilt["melds"] == [list(melds) for melds in obs["melds"]]
+        assert rebuilt.get("rinshan") == obs.get("rinshan")
+        assert set(rebuilt.keys()) == set(obs.keys()) - {"events"}
+        assert rebuilt["incoming_tile"] == obs["incoming_tile"]
+        calls = [action for action in action_space if action.action_type in ["chii", "pon"]]
+        if len(calls) > 0:
+            return calls[0]
+        return self.random.choice([action for action in action_space if action.action_type in ["noop", "discard", "replace", "ten", "noten"]])
+
+def make_game(seed):
+    game = MahjongGame(Ruleset(), wall=seed, stream_events=True)
+    agents = [TrackingAgent("Agent {}".format(i), seed * 4 + i) for i in range(4)]
+    for i in range(4):
+        game.set_player(i, Player(agents[i].name, agent=agents[i]))
+    game.initialize_game()
+    return game, agents
+
+# Delta observation test
+
+def test_tracker_rebuilds_observations():
+    for seed in [1, 2]:
+        game, agents = make_game(seed)
+        for _ in range(24):
+            game.step()
+        assert sum(agent.events for agent in agents) > 0
+        assert any(len(calls) > 0 for calls in game.state["calls"])
+
+def test_events_are_private():
+    game = MahjongGame(Ruleset(), wall=1, stream_events=True)
+    game.initialize_game()
+    tile = game.wall.mountain[-1]
+    game.wall.mountain.pop()
+    game.emit({"type": "draw", "player_idx": 0}, 0, {"tile": tile.get_id()})
+    own = game.get_observation(0, {})["events"]
+    other = game.get_observation(1, {})["events"]
+    assert own[0]["type"] == "start" and own[0]["hand"] == [t.get_id() for t in game.hands[0]]
+    assert own[1] == {"type": "draw", "player_idx": 0, "tile": tile.get_id()}
+    assert other[1] == {"type": "draw", "player_idx": 0}
+    # Queues are drained by each observation
+    assert game.get_observation(0, {})["events"] == []
+
+def test_no_events_by_default():
+    game = MahjongGame(Ruleset(), wall=1)
+    game.initialize_game()
+    assert "events" not in game.get_observation(0, {})
@@ -0,0 +1,114 @@
+import os
+import sys
+import threading
+
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.insert(0, parent)
+
+from env.action import Action
+from env.deck import Deck
+from env.tiles import Tile
+from env.flask_agent import FlaskAgent
+from env.local_server import LocalAgentServer
+
+def make_observation():
+    return {
+        "player_idx": 0,
+        "active_player": 0,
+        "hand": Deck("123m456p789s1122z"),
+        "incoming_tile": Tile("3z")
+    }
+
+# Remote agent test
+
+def test_flask_agent_keep_alive():
+    seen = []
+    def responder(obs, action_space):
+        seen.append(obs["incoming_tile"]["text"])
+        return len(action_space) - 1
+    server = LocalAgentServer(responder=responder)
+    agent = FlaskAgent("remote", server=server.start())
+    action_space = [Action.DISCARD(), Action.REPLACE(11), Action.TSUMO()]
+    try:
+        for _ in range(20):
+            assert agent.query(make_observation(), action_space) == Action.TSUMO()
+    finally:
+        agent.close()
+        server.stop()
+    assert seen == ["3z"] * 20
+    # All decisions went through a single kept-alive connection
+    assert server.connections == 1
+
+def test_flask_agent_manual_submit():
+    server = LocalAgentServer()
+    agent = FlaskAgent("remote", server=server.start(), timeout=10, poll_interval=0.2)
+    action_space = [Action.DISCARD(), Action.REPLACE(11)]
+    result = []
+    thread = threading.Thread(target=lambda: result.append(agent.query(make_observation(), action_space)))
+    thread.start()
+    try:
+        decision = server.board.next_pending("0", 0, timeout=5)
+        assert decision.key[:2] == ("0", 0)
+        assert not server.board.submit("0", 0, "not-a-decision", 0)
+        assert server.board.submit(*decision.key, 1)
+        thread.join(10)
+    finally:
+        agent.close()
+        server.stop()
+    assert result == [Action.REPLACE(11)]
+
+def test_flask_agent_binary_wire():
+    from env.mahjong import MahjongGame
+    from env.ruleset import Ruleset
+    game = MahjongGame(Ruleset(), wall=1)
+    game.initialize_game()
+    seen = []
+    def responder(obs, action_space):
+        seen.append((obs["hand"]["tiles"], obs["incoming_tile"]["text"], action_space[1]["action_string"]))
+        return 1
+    server = LocalAgentServer(responder=responder)
+    agent = FlaskAgent("remote", server=server.start(), wire="binary")
+    tile = game.wall.mountain[-1]
+    obs = game.get_observation(0, {"player_state": "active", "incoming_tile": tile})
+    action_space = [Action.DISCARD(), Action.REPLACE(game.hands[0][0].get_id())]
+    try:
+        assert agent.query(obs, action_space) == action_space[1]
+    finally:
+        agent.close()
+        server.stop()
+    assert seen == [(game.hands[0].to_json()["tiles"], str(tile), str(game.hands[0][0].get_id()))]
+
+def test_flask_agent_delta_wire():
+    from env.mahjong import MahjongGame
+    from env.ruleset import Ruleset
+    game = MahjongGame(Ruleset(), wall=1, stream_events=True)
+    game.initialize_game()
+    seen = []
+    def responder(obs, action_space):
+        seen.append((obs["hand"]["tiles"], [[tile["text"] for tile in d] for d in obs["discarded_tiles"]]))
+        return 0
+    server = LocalAgentServer(responder=responder)
+    agent = FlaskAgent("remote", server=server.start(), wire="delta")
+    try:
+        for _ in range(8):
+            player_idx = game.state["player_idx"]
+            tile = game.wall.mountain.pop()
+            game.perform_action(Action.DISCARD(), {"player_idx": player_idx, "incoming_tile": tile})
+            game.state["player_idx"] = (player_idx + 1) % 4
+            obs = game.get_observation(0, {"player_state": "passive", "incoming_tile": tile})
+            assert agent.query(obs, [Action.NOOP()]) == Action.NOOP()
+    finally:
+        agent.close()
+        server.stop()
+    assert seen[-1] == (game.hands[0].to_json()["tiles"], [[str(tile) for tile in d] for d in game.state["discarded_tiles"]])
+
+def test_flask_agent_deprecated_path():
+    import pytest
+    with pytest.warns(DeprecationWarning):
+        agent = FlaskAgent("remote", "actions/remote.txt")
+    assert agent.timeout == 60
+    # The other parameters are keyword-only
+    with pytest.raises(TypeError):
+        FlaskAgent("remote", "actions/remote.txt", 10)
@@ -0,0 +1,18 @@
+import os
+import sys
+import subprocess
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+def loaded_after(statement: str) -> bool:
+    code = statement + "; import sys; print('mahjong.hand_calculating.hand' in sys.modules)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=parent, check=True, capture_output=True, text=True).stdout
+    return output.strip() == "True"
+
+def test_import_is_lazy():
+    assert not loaded_after("import env.mahjong")
+
+def test_warmup_loads_calculators():
+    assert loaded_after("import env; env.warmup()")
@@ -0,0 +1,79 @@
+import os
+import sys
+
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.insert(0, parent)
+
+from env.agent import Agent
+from env.deck import Deck
+from env.meld import Meld, get_melds
+from env.mahjong import MahjongGame
+from env.player import Player
+from env.ruleset import Ruleset
+from env.tiles import Tile
+from env.utils import get_value
+
+# Parsing test
+
+def test_parse_call_strings():
+    chii = Meld.from_string("c275226", 1)
+    assert chii.type == "chii" and chii.from_seat == 0 and chii.called == 27
+    assert chii.tile == 13 and chii.red == 1
+    assert Meld.from_string("p414141", 0).from_seat == 3
+    assert Meld.from_string("41p4141", 0).from_seat == 2
+    assert Meld.from_string("4141p41", 0).from_seat == 1
+    akan = Meld.from_string("121212a12", 2)
+    assert akan.is_kan() and not akan.is_open() and akan.from_seat is None
+    kakan = Meld.from_string("41p414141", 0, "kan")
+    assert kakan.is_kan() and kakan.from_seat == 2
+    assert Meld.from_string("41p414141").type == "kan"
+    assert kakan.to_string() == "41p414141"
+    # Melds are hashable, equal melds having the same hash
+    assert len({Meld.from_string("p414141", 0), Meld.from_string("p414141", 0), chii}) == 2
+
+def test_136_array():
+    assert Meld.from_string("p151551").get_136_array() == [17, 18, 16]
+    assert sorted(Meld.from_string("c131214").get_136_array()) == Deck("234m").get_136_array()
+
+def test_value_with_melds():
+    deck = Deck("234m567p11z")
+    melds = ["c131112", "p464646"]
+    by_string = get_value(deck + Deck("123m666z"), Tile(41), melds=melds)
+    by_meld = get_value(deck + Deck("123m666z"), Tile(41), melds=[Meld.from_string(call, 0) for call in melds])
+    assert by_string.han == by_meld.han and by_string.fu == by_meld.fu
+
+# Engine test
+
+class CallingAgent(Agent):
+    def query(self, obs, action_space):
+        for action in action_space:
+            if action.action_type in ["pon", "chii"]:
+                return action
+        return action_space[0]
+
+def test_engine_keeps_melds():
+    for seed in range(1, 6):
+        game = MahjongGame(Ruleset(), wall=seed)
+        for i in range(4):
+            game.set_player(i, Player("P{}".format(i), agent=CallingAgent("P{}".format(i))))
+        game.initialize_game()
+        try:
+            for _ in range(30):
+                game.step()
+        except Exception:
+            pass
+        for seat in range(4):
+            assert [meld.to_string() for meld in game.state["melds"][seat]] == game.state["calls"][seat]
+            for meld in game.state["melds"][seat]:
+                assert meld.from_seat != seat
+        if any(len(calls) > 0 for calls in game.state["calls"]):
+            obs = game.get_observation(0)
+            obs_without_melds = dict(obs)
+            del obs_without_melds["melds"]
+            assert get_melds(obs, 0) is obs["melds"][0]
+            assert get_melds(obs, 0) == game.state["melds"][0]
+            assert get_melds(obs_without_melds, 0) == game.state["melds"][0]
+            return
+    assert False, "No call was made"
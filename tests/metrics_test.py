@@ -0,0 +1,72 @@
+import os
+import sys
+import random
+import tempfile
+
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.insert(0, parent)
+
+from env.agent import Agent
+from env.mahjong import MahjongGame, MahjongEndGame
+from env.metrics import MetricsRegistry, MetricsServer, merge, collect
+from env.player import Player
+from env.ruleset import Ruleset
+
+# Registry test
+
+def test_registry_render():
+    metrics = MetricsRegistry()
+    metrics.inc("games_finished_total", reason="ron")
+    metrics.inc("games_finished_total", reason="ron")
+    metrics.inc("decisions_total", 5)
+    metrics.observe("agent_latency_seconds", 0.002)
+    metrics.observe("agent_latency_seconds", 100)
+    assert metrics.get("games_finished_total", reason="ron") == 2
+    text = metrics.render()
+    assert 'mahjong_games_finished_total{reason="ron"} 2' in text
+    assert "# TYPE mahjong_decisions_total counter" in text
+    assert 'mahjong_agent_latency_seconds_bucket{le="0.005"} 1' in text
+    assert 'mahjong_agent_latency_seconds_bucket{le="+Inf"} 2' in text
+    assert "mahjong_agent_latency_seconds_count 2" in text
+
+def test_merge_workers():
+    workers = [MetricsRegistry() for _ in range(3)]
+    for i, metrics in enumerate(workers):
+        metrics.inc("decisions_total", i + 1)
+        metrics.observe("agent_latency_seconds", 0.01)
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, metrics in enumerate(workers):
+            # One file per process; simulate three processes
+            os.makedirs(os.path.join(tmp, str(i)))
+            metrics.write(os.path.join(tmp, str(i)))
+        merged = merge([collect(os.path.join(tmp, str(i))) for i in range(3)])
+    assert merged["counters"]["decisions_total"] == 6
+    assert merged["histograms"]["agent_latency_seconds"]["count"] == 3
+
+def test_engine_metrics():
+    import requests
+    random.seed(1)
+    metrics = MetricsRegistry()
+    game = MahjongGame(Ruleset(), wall=1, metrics=metrics)
+    for i in range(4):
+        game.set_player(i, Player("Random {}".format(i + 1), agent=Agent("Random {}".format(i + 1))))
+    game.initialize_game()
+    for _ in range(4):
+        game.step()
+    try:
+        game.end_game({"reason": "wall_empty", "credits": [0, 0, 0, 0]})
+    except MahjongEndGame:
+        pass
+    assert metrics.get("games_started_total") == 1
+    assert metrics.get("games_finished_total", reason="wall_empty") == 1
+    assert metrics.get("decisions_total") >= 16
+    assert metrics.histograms["hand_length"]["sum"] == sum(len(d) for d in game.state["discarded_tiles"])
+    server = MetricsServer(metrics)
+    url = server.start()
+    try:
+        text = requests.get(url + "metrics").text
+    finally:
+        server.stop()
+    assert "mahjong_decisions_total" in text
@@ -0,0 +1,103 @@
+import io
+import os
+import sys
+import copy
+import json
+import pickle
+import random
+import contextlib
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.insert(0, parent)
+
+from env.agent import Agent
+from env.mahjong import MahjongGame
+from env.player import Player
+from env.ruleset import Ruleset
+from env.views import HandView, RiverView
+
+# Public observation test
+
+def test_public_observation_is_shared():
+    game = MahjongGame(Ruleset(), wall=1)
+    game.initialize_game()
+    tile = game.wall.mountain[-1]
+    public = game.get_public_observation()
+    for i in range(1, 4):
+        shared = game.get_observation(i, {"player_state": "passive", "incoming_tile": tile}, public)
+        own = game.get_observation(i, {"player_state": "passive", "incoming_tile": tile})
+        assert shared.keys() == own.keys()
+        assert shared == own
+        assert shared["hand"] == game.hands[i]
+    # Seat views do not write through to the snapshot
+    shared["tiles_left"] = 0
+    assert public["tiles_left"] == len(game.wall.mountain)
+    # The dora indicators are shared until a dora is revealed
+    assert game.get_public_observation()["dora_indicators"] is public["dora_indicators"]
+    game.state["dora_revealed"] += 1
+    revealed = game.get_public_observation()["dora_indicators"]
+    assert len(revealed) == len(public["dora_indicators"]) + 1 == game.state["dora_revealed"]
+
+def test_public_observation_is_read_only():
+    game = MahjongGame(Ruleset(), wall=1)
+    game.initialize_game()
+    public = game.get_public_observation()
+    assert "hand" not in public and "player_idx" not in public
+    try:
+        public["tiles_left"] = 0
+        assert False, "The snapshot was modified"
+    except TypeError:
+        pass
+
+# Observation view test
+
+def make_game(seed):
+    random.seed(seed)
+    game = MahjongGame(Ruleset(), wall=seed)
+    for i in range(4):
+        game.set_player(i, Player("Random {}".format(i), agent=Agent("Random {}".format(i))))
+    game.initialize_game()
+    return game
+
+def test_observations_do_not_change():
+    game = make_game(1)
+    observations = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(12):
+            observations.append(game.get_observation(0, {"player_state": "passive", "incoming_tile": None}))
+            frozen = copy.deepcopy(observations[-1])
+            game.step()
+            assert observations[-1]["discarded_tiles"] == frozen["discarded_tiles"]
+            assert observations[-1]["hand"].get_tiles() == frozen["hand"].get_tiles()
+    assert game.state["discarded_tiles"][0] != observations[0]["discarded_tiles"][0]
+    assert [len(obs["discarded_tiles"][0]) for obs in observations] == sorted(len(obs["discarded_tiles"][0]) for obs in observations)
+    # The views share the river of the game
+    assert observations[-1]["discarded_tiles"][0][0] is game.state["discarded_tiles"][0][0]
+
+def test_views_are_read_only():
+    game = make_game(1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        game.step()
+    obs = game.get_observation(1)
+    for mutate in [lambda: obs["credits"].__setitem__(0, 0), lambda: obs["calls"][0].append("p111111"), lambda: obs["discarded_tiles"].pop(),
+                   lambda: obs["hand"].pop(), lambda: obs["hand"].append(obs["hand"][0]), lambda: obs["hand"].remove_tile(obs["hand"][0]),
+                   lambda: obs["hand"].__setitem__(0, obs["hand"][1]), lambda: obs["hand"].sort(), lambda: setattr(obs["hand"], "tiles", [])]:
+        try:
+            mutate()
+            assert False, "The observation was modified"
+        except TypeError:
+            pass
+    river = obs["discarded_tiles"][0]
+    assert isinstance(river, RiverView) and len(river) == 1
+    assert river[-1] is river[0] and river[1:] == []
+    assert json.loads(json.dumps(obs["discarded_tiles"], default=lambda o: o.to_json()))[0][0]["id"] == river[0].get_id()
+    assert pickle.loads(pickle.dumps(obs["credits"])) == [25000] * 4
+    # The hand is a view of its own copy of the hand
+    hand = obs["hand"]
+    assert isinstance(hand, HandView) and hand == game.hands[1]
+    assert hand.get_tiles() is not game.hands[1].get_tiles()
+    assert pickle.loads(pickle.dumps(hand)) == hand
+    deck = hand.copy()
+    deck.pop()
+    assert len(deck) == len(hand) - 1 == len(game.hands[1]) - 1
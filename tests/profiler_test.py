@@ -0,0 +1,83 @@
+import os
+import sys
+import io
+import json
+import random
+import contextlib
+import tempfile
+
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.insert(0, parent)
+
+from env.agent import Agent
+from env.deck import Deck
+from env.mahjong import MahjongGame, MahjongEndGame
+from env.player import Player
+from env.profiler import StepProfiler, PhaseStats, PHASES
+from env.ruleset import Ruleset
+
+def make_game(profiler=None):
+    random.seed(1)
+    game = MahjongGame(Ruleset(), wall=1, profiler=profiler)
+    for i in range(4):
+        game.set_player(i, Player("Random {}".format(i + 1), agent=Agent("Random {}".format(i + 1))))
+    game.initialize_game()
+    return game
+
+# Profiler test
+
+def test_phase_stats():
+    stats = PhaseStats()
+    for elapsed in [100, 200, 300, 5000]:
+        stats.add(elapsed)
+    assert stats.count == 4 and stats.total_ns == 5600 and stats.max_ns == 5000
+    # Percentiles are bucket upper bounds: within a factor of two
+    assert 200 <= stats.percentile(0.5) < 400
+    assert stats.percentile(1.0) == 5000
+
+def test_step_profiler():
+    profiler = StepProfiler()
+    game = make_game(profiler)
+    for _ in range(8):
+        game.step()
+    summary = profiler.summary("game")
+    assert set(summary.keys()) == set(PHASES)
+    assert summary["step"]["count"] == 8
+    assert summary["observation"]["count"] == 8
+    assert summary["passive"]["count"] == 8
+    # Every seat is asked once per step
+    assert summary["query"]["count"] >= 32
+    assert summary["record"]["count"] == summary["query"]["count"]
+    assert summary["step"]["total_ms"] >= summary["passive"]["total_ms"]
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "profile.json")
+        profiler.dump(filename)
+        with open(filename) as f:
+            assert json.load(f)["phases"]["step"]["count"] == 8
+    # A new game resets the game scope only
+    game.initialize_game()
+    assert profiler.summary("game")["step"]["count"] == 0
+    assert profiler.summary("total")["step"]["count"] == 8
+
+def test_profiler_disabled():
+    game = make_game()
+    assert game.profiler is None
+    game.step()
+
+def test_profiler_end_game():
+    # A step ending the game is recorded, exhaustive draw included
+    profiler = StepProfiler()
+    game = make_game(profiler)
+    game.wall.mountain = Deck([])
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            game.step()
+        assert False, "The game did not end"
+    except MahjongEndGame:
+        pass
+    summary = profiler.summary("game")
+    assert summary["step"]["count"] == 1
+    assert summary["draw"]["count"] == 1
+    assert summary["step"]["total_ms"] >= summary["draw"]["total_ms"]
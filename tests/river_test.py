@@ -0,0 +1,78 @@
+import io
+import os
+import sys
+import random
+import contextlib
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.insert(0, parent)
+
+from env.agent import Agent
+from env.mahjong import MahjongGame, MahjongEndGame, MahjongRuleError
+from env.player import Player
+from env.river import River, FLAG_TSUMOGIRI, FLAG_REACH, FLAG_CALLED, get_river_array
+from env.ruleset import Ruleset
+
+class CallingAgent(Agent):
+    # Makes the given calls whenever possible, otherwise discards at random
+    def __init__(self, name, seed, calls):
+        self.name = name
+        self.random = random.Random(seed)
+        self.calls = calls
+
+    def query(self, obs, action_space):
+        calls = [action for action in action_space if action.action_type in self.calls]
+        if len(calls) > 0:
+            return calls[0]
+        return self.random.choice([action for action in action_space if action.action_type in ["noop", "discard", "replace", "ten", "noten"]])
+
+# River test
+
+def test_river():
+    river = River(4)
+    river.append(11, FLAG_TSUMOGIRI)
+    river.append(47, FLAG_REACH)
+    river.mark_called()
+    assert len(river) == 2
+    assert river.get_flags() == [FLAG_TSUMOGIRI, FLAG_REACH | FLAG_CALLED]
+    assert bytes(river.ids) == bytes([11, 47, 0, 0])
+    river.append(12)
+    river.append(13)
+    try:
+        river.append(14)
+        assert False, "The river did not overflow"
+    except IndexError:
+        pass
+
+def test_river_array():
+    rivers = [River(4), River(4)]
+    rivers[1].append(53, FLAG_TSUMOGIRI)
+    array = get_river_array(rivers)
+    assert array.shape == (2, 2, 4)
+    assert array[1, 0].tolist() == [53, 0, 0, 0]
+    assert array[1, 1].tolist() == [FLAG_TSUMOGIRI, 0, 0, 0]
+    assert not array[0].any()
+
+def test_game_fills_rivers():
+    for seed in range(3):
+        game = MahjongGame(Ruleset(), wall=seed)
+        for i in range(4):
+            # Two seats declare reach, two seats call
+            calls = ["reach"] if i < 2 else ["chii", "pon"]
+            game.set_player(i, Player("Agent {}".format(i), agent=CallingAgent("Agent {}".format(i), seed * 4 + i, calls)))
+        game.initialize_game()
+        with contextlib.redirect_stdout(io.StringIO()):
+            try:
+                for _ in range(100):
+                    game.step()
+            except (MahjongEndGame, MahjongRuleError):
+                pass
+        for i, river in enumerate(game.rivers):
+            assert list(river.ids[:len(river)]) == [tile.get_id() for tile in game.state["discarded_tiles"][i]]
+            assert sum(1 for flags in river.get_flags() if flags & FLAG_REACH) == int(game.state["reach"][i])
+        # Every chii and pon took a discard
+        called = sum(1 for river in game.rivers for flags in river.get_flags() if flags & FLAG_CALLED)
+        assert called == sum(1 for melds in game.state["melds"] for meld in melds if meld.type in ["chii", "pon", "kan"])
+        obs = game.get_observation(0)
+        assert obs["river_flags"] == [river.get_flags() for river in game.rivers]
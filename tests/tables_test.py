@@ -0,0 +1,90 @@
+import os
+import sys
+import shutil
+import tempfile
+
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.insert(0, parent)
+
+import pytest
+
+from env.deck import Deck
+from env.tables import AgariTables, build_tables, save_tables, get_tables, HEADER, DEFAULT_FILENAME
+from env.utils import check_agari, check_tenpai
+
+# Table file test
+
+def test_shipped_file_matches_generator():
+    tables = AgariTables.load(DEFAULT_FILENAME)
+    number, honor = build_tables()
+    assert bytes(tables.number) == bytes(number)
+    assert bytes(tables.honor) == bytes(honor)
+    assert get_tables().source in ["file", "built"]
+
+def test_corrupted_file_is_rejected():
+    directory = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(directory, "tables.bin")
+        save_tables(filename)
+        assert AgariTables.load(filename).source == "file"
+        with open(filename, "r+b") as f:
+            f.seek(HEADER.size + 1000)
+            f.write(b"\x07")
+        with pytest.raises(ValueError):
+            AgariTables.load(filename)
+        with open(filename, "r+b") as f:
+            f.truncate(100)
+        with pytest.raises(ValueError):
+            AgariTables.load(filename)
+    finally:
+        shutil.rmtree(directory)
+
+# Table lookup test
+
+def test_agari_lookup():
+    assert check_agari(Deck("123m456p789s11z")) == (True, "ordinary")
+    assert check_agari(Deck("234406m789p111s22z")) == (True, "ordinary")
+    assert not check_agari(Deck("44m99p678777s11144z"))
+    assert not check_agari(Deck("1111123m456p789s"))
+    assert check_agari(Deck("1m9m1p9p11s9s1234567z")) == (True, "kokushi_mosou")
+    assert check_agari(Deck("44m77m11p88p99p55z66z")) == (True, "chiitoitsu")
+
+def test_tenpai_lookup():
+    assert check_tenpai(Deck("88m23344556s111z"))
+    assert not check_tenpai(Deck("1111m258p369s123z"))
+
+# Batch test
+
+def test_agari_batch_matches_check_agari():
+    import numpy as np
+    from env.utils import check_agari_batch, get_tile_counts, HAND_TYPES
+    decks = [Deck(s) for s in ["123m456p789s11z", "234406m789p111s22z", "44m99p678777s11144z", "1m9m1p9p11s9s1234567z", "44m77m11p88p99p55z66z", "223344m667788p66z", "147m258p369s3456z"]]
+    counts = np.array([get_tile_counts(deck.get_tiles()) for deck in decks])
+    agari, types = check_agari_batch(counts, return_types=True)
+    for deck, is_agari, code in zip(decks, agari, types):
+        expected = check_agari(deck)
+        assert bool(is_agari) == bool(expected)
+        assert HAND_TYPES[code] == (expected[1] if expected else None)
+    # 123m456p789s11z has 11 tiles: agari with one call only
+    assert list(check_agari_batch(counts[:1], np.array([0]))) == [False]
+    assert list(check_agari_batch(counts[:1], np.array([1]))) == [True]
+    called = np.array([get_tile_counts(Deck("789p2267s0s").get_tiles())])
+    assert list(check_agari_batch(called, np.array([2]))) == [True]
+    assert list(check_agari_batch(counts[3:5], np.array([1, 1]))) == [False, False]
+
+def test_waits_batch_matches_get_waits():
+    import numpy as np
+    from env.utils import get_waits_batch, get_waits_counts, get_tile_counts
+    decks = [Deck(s) for s in ["123m456p789s1122z", "1112345678999m", "1m9m1p9p1s9s1234567z", "1357m2468p13579s", "1111m234p", "1m"]]
+    counts = np.array([get_tile_counts(deck.get_tiles()) for deck in decks])
+    waits = get_waits_batch(counts, np.array([0, 0, 0, 0, 2, 4]))
+    for deck, hand_waits in zip(decks[:4], waits):
+        assert set(np.flatnonzero(hand_waits)) == set(get_waits_counts(get_tile_counts(deck.get_tiles())))
+    # Nine gates waits on every man tile, kokushi on all thirteen
+    assert waits[1, :9].all() and waits[2].sum() == 13
+    assert not waits[3].any()
+    # The only wait of 1111m234p would be a fifth 1m
+    assert not waits[4].any()
+    assert list(np.flatnonzero(waits[5])) == [0]
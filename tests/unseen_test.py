@@ -0,0 +1,87 @@
+import io
+import os
+import sys
+import random
+import contextlib
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.insert(0, parent)
+
+from env.agent import Agent
+from env.deck import Deck
+from env.mahjong import MahjongGame, MahjongEndGame
+from env.meld import Meld, get_index
+from env.player import Player
+from env.ruleset import Ruleset
+from env.tiles import Tile
+from env.unseen import UnseenCounter
+
+def count_unseen(game, seat):
+    # Counts the unseen tiles of a seat from the whole state
+    counts = [4] * 34
+    tiles = [tile.get_id() for tile in game.hands[seat]]
+    tiles += [tile.get_id() for river in game.state["discarded_tiles"] for tile in river]
+    tiles += [tile.get_id() for tile in game.wall.get_dora_indicators()[0:game.state["dora_revealed"]]]
+    for melds in game.state["melds"]:
+        for meld in melds:
+            ids = list(meld.tiles)
+            if meld.called is not None:
+                ids.remove(meld.called)
+            tiles += ids
+    for id in tiles:
+        counts[get_index(id)] -= 1
+    return counts
+
+class CallingAgent(Agent):
+    # Calls whenever possible, otherwise discards at random
+    def __init__(self, name, seed):
+        self.name = name
+        self.random = random.Random(seed)
+
+    def query(self, obs, action_space):
+        calls = [action for action in action_space if action.action_type in ["chii", "pon"]]
+        if len(calls) > 0:
+            return calls[0]
+        return self.random.choice([action for action in action_space if action.action_type in ["noop", "discard", "replace", "ten", "noten"]])
+
+# Unseen counter test
+
+def test_counter_events():
+    counter = UnseenCounter([Deck("123m456p789s1122z"), Deck("1222333444555z")], [Tile(11)])
+    assert counter.get_counts(0)[0] == 2 and counter.get_counts(1)[0] == 3
+    counter.discard(1, Tile(45))
+    assert counter.get_counts(0)[31] == 3 and counter.get_counts(1)[31] == 1
+    # Pon of the 1z: the called 1z was seen when it was discarded
+    counter.discard(1, Tile(41))
+    assert counter.get_counts(0)[27] == 1
+    pon = Meld.from_string("p414141", 0, "pon")
+    counter.call(0, pon)
+    assert counter.get_counts(0)[27] == 1 and counter.get_counts(1)[27] == 1
+    # Kakan shows the added tile only
+    counter.call(0, Meld("kan", pon.tiles + (41,), pon.from_seat, pon.called), pon)
+    assert counter.get_counts(1)[27] == 0
+    # Ankan shows all four tiles
+    counter.draw(1, Tile(43))
+    assert counter.get_counts(1)[29] == 0 and counter.get_counts(0)[29] == 4
+    version = counter.versions[0]
+    counter.call(1, Meld.from_string("a43434343", 1, "akan"))
+    assert counter.get_counts(0)[29] == 0 and counter.versions[0] > version
+    counter.dora(Tile(47))
+    assert counter.get_counts(0)[33] == 3 and counter.get_counts(1)[33] == 3
+
+def test_game_keeps_unseen_counts():
+    for seed in [1, 2, 3]:
+        game = MahjongGame(Ruleset(), wall=seed)
+        for i in range(4):
+            game.set_player(i, Player("P{}".format(i), agent=CallingAgent("P{}".format(i), seed * 4 + i)))
+        game.initialize_game()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(30):
+                    game.step()
+        except MahjongEndGame:
+            pass
+        for seat in range(4):
+            obs = game.get_observation(seat)
+            assert obs["unseen"] == count_unseen(game, seat)
@@ -0,0 +1,63 @@
+import os
+import sys
+import tempfile
+
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.insert(0, parent)
+
+from env.deck import Wall, get_wall_tile_ids
+from env.mahjong import MahjongGame
+from env.ruleset import Ruleset
+from env.wall_bank import WallBank
+
+# Wall bank test
+
+def test_generate():
+    ruleset = Ruleset()
+    bank = WallBank.generate(ruleset, 50, seed=1)
+    assert bank.walls.shape == (50, 136)
+    assert sorted(bank.walls[7].tolist()) == sorted(get_wall_tile_ids(ruleset))
+    assert (WallBank.generate(ruleset, 50, seed=1).walls == bank.walls).all()
+    # Rows are shuffled independently
+    assert len(set(map(bytes, bank.walls))) == 50
+
+def test_bank_wall_layout():
+    ruleset = Ruleset()
+    bank = WallBank.generate(ruleset, 2, seed=2)
+    wall = bank[1]
+    # Nothing is turned into tiles before it is used
+    assert wall.parts == {}
+    reference = Wall(ruleset, tiles=bank.walls[1].tolist())
+    assert wall.get_starting_hand(2) == reference.get_starting_hand(2)
+    assert wall.get_mountain() == reference.get_mountain()
+    assert wall.get_dora_indicators() == reference.get_dora_indicators()
+    assert wall.get_ura_dora_indicators() == reference.get_ura_dora_indicators()
+    assert wall.get_replacements() == reference.get_replacements()
+    # Parts are created once, so draws are kept
+    wall.mountain.pop()
+    assert len(wall.get_mountain()) == len(reference.get_mountain()) - 1
+
+def test_save_load_mmap():
+    ruleset = Ruleset()
+    bank = WallBank.generate(ruleset, 10, seed=3)
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "walls.npy")
+        bank.save(filename)
+        loaded = WallBank.load(filename, ruleset)
+        assert len(loaded) == 10
+        assert (loaded.walls == bank.walls).all()
+        assert loaded[4].get_mountain() == bank[4].get_mountain()
+        del loaded
+
+def test_game_takes_next_wall():
+    ruleset = Ruleset()
+    bank = WallBank.generate(ruleset, 3, seed=4)
+    game = MahjongGame(ruleset, wall_bank=bank)
+    game.initialize_game()
+    assert game.wall.index == 0
+    assert game.hands[0] == bank[0].get_starting_hand(0)
+    game.initialize_game()
+    assert game.wall.index == 1
+    assert game.hands[3] == bank[1].get_starting_hand(3)
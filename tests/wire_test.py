@@ -0,0 +1,126 @@
+import io
+import os
+import sys
+import random
+import contextlib
+
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.insert(0, parent)
+
+from env.action import Action
+from env.agent import Agent
+from env.mahjong import MahjongGame, MahjongEndGame, MahjongRuleError
+from env.player import Player
+from env.ruleset import Ruleset
+from env.wire import ObservationEncoder, ObservationDecoder, encode_action, decode_action, encode_action_space, decode_action_space
+
+def play_discards(game, turns):
+    # Every player discards the tile drawn, without asking any agent
+    for _ in range(turns):
+        player_idx = game.state["player_idx"]
+        tile = game.wall.mountain.pop()
+        game.perform_action(Action.DISCARD(), {"player_idx": player_idx, "incoming_tile": tile})
+        game.state["player_idx"] = (player_idx + 1) % 4
+
+def assert_same_observation(obs, decoded):
+    for key in ["player_idx", "active_player", "wind", "wind_e", "repeat", "credits", "tiles_left", "player_state", "incoming_tile"]:
+        assert obs[key] == decoded[key]
+    assert obs["hand"] == decoded["hand"]
+    assert [tile.get_id() for tile in obs["dora_indicators"]] == [tile.get_id() for tile in decoded["dora_indicators"]]
+    assert [[tile.get_id() for tile in d] for d in obs["discarded_tiles"]] == [[tile.get_id() for tile in d] for d in decoded["discarded_tiles"]]
+    assert obs["calls"] == decoded["calls"]
+    assert [bool(r) for r in obs["reach"]] == decoded["reach"]
+    assert decoded.get("unseen") == obs.get("unseen")
+    for key in ["discard_bits", "safe_bits", "passed_bits"]:
+        assert decoded.get(key) == obs.get(key)
+
+# Observation encoding
+
+def test_observation_roundtrip():
+    game = MahjongGame(Ruleset(), wall=1)
+    game.initialize_game()
+    encoder = ObservationEncoder()
+    decoder = ObservationDecoder()
+    game.state["calls"][2].append("41p4141")
+    game.state["reach"][3] = True
+    sizes = []
+    for _ in range(6):
+        play_discards(game, 3)
+        obs = game.get_observation(1, {"player_state": "passive", "incoming_tile": game.wall.mountain[-1]})
+        message = encoder.encode(obs)
+        sizes.append(len(message))
+        assert_same_observation(obs, decoder.decode(message))
+    # Only new discards are sent
+    assert sizes[-1] <= sizes[0] + 3
+    # A fresh decoder cannot apply deltas
+    try:
+        ObservationDecoder().decode(message)
+        assert False
+    except ValueError:
+        pass
+
+def test_observation_new_game():
+    encoder = ObservationEncoder()
+    decoder = ObservationDecoder()
+    for seed in [1, 2]:
+        game = MahjongGame(Ruleset(), wall=seed)
+        game.initialize_game()
+        play_discards(game, 5)
+        obs = game.get_observation(0, {"player_state": "active", "incoming_tile": None})
+        assert_same_observation(obs, decoder.decode(encoder.encode(obs)))
+
+class WireAgent(Agent):
+    # Sends every observation through the wire and compares it with the
+    # original, then plays at random, calling whenever possible
+    def __init__(self, name, seed, encoder, decoder, checked):
+        self.name = name
+        self.random = random.Random(seed)
+        self.encoder = encoder
+        self.decoder = decoder
+        self.checked = checked
+
+    def query(self, obs, action_space):
+        decoded = self.decoder.decode(self.encoder.encode(obs))
+        assert set(decoded.keys()) == set(obs.keys())
+        assert_same_observation(obs, decoded)
+        assert decoded["river_flags"] == [list(flags) for flags in obs["river_flags"]]
+        assert decoded["melds"] == [list(melds) for melds in obs["melds"]]
+        for key in ["tenpai", "rinshan", "is_ankan"]:
+            assert decoded.get(key) == obs.get(key)
+        self.checked[obs["player_state"]] = self.checked.get(obs["player_state"], 0) + 1
+        calls = [action for action in action_space if action.action_type in ["chii", "pon"]]
+        if len(calls) > 0:
+            return calls[0]
+        return self.random.choice([action for action in action_space if action.action_type in ["noop", "discard", "replace", "reach", "ten", "noten"]])
+
+def test_game_roundtrip():
+    encoder = ObservationEncoder()
+    decoder = ObservationDecoder()
+    checked = {}
+    for seed in range(2):
+        game = MahjongGame(Ruleset(), wall=seed)
+        for i in range(4):
+            game.set_player(i, Player("Agent {}".format(i), agent=WireAgent("Agent {}".format(i), seed * 4 + i, encoder, decoder, checked)))
+        game.initialize_game()
+        with contextlib.redirect_stdout(io.StringIO()):
+            try:
+                for _ in range(200):
+                    game.step()
+            except (MahjongEndGame, MahjongRuleError):
+                pass
+        assert any(len(melds) > 0 for melds in game.state["melds"])
+    assert checked.get("active", 0) > 0 and checked.get("passive", 0) > 0
+
+# Action encoding
+
+def test_action_roundtrip():
+    actions = [
+        Action.NOOP(), Action.DISCARD(), Action.REPLACE(41), Action.REACH(0), Action.REACH(51),
+        Action.CHII("c275226"), Action.PON("41p4141"), Action.AKAN(15), Action.AKAN(12),
+        Action("kan", "47k474747"), Action("mkan", "121212m12"), Action.RON(), Action.TSUMO()
+    ]
+    for action in actions:
+        assert decode_action(encode_action(action)) == action
+    assert decode_action_space(encode_action_space(actions)) == actions
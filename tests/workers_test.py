@@ -0,0 +1,22 @@
+import os
+import sys
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from env.workers import make_pool, get_context
+
+# Worker pool test
+
+def test_workers_start_warm():
+    with make_pool(2) as pool:
+        warm = pool.submit(eval, "'mahjong.hand_calculating.hand' in __import__('sys').modules").result()
+        calculators = pool.submit(eval, "__import__('env.utils').utils._calculators is not None").result()
+    assert warm
+    assert calculators
+
+def test_spawn_fallback():
+    assert get_context("spawn").get_start_method() == "spawn"
+    with make_pool(1, method="spawn") as pool:
+        assert pool.submit(eval, "__import__('env.utils').utils._calculators is not None").result()
@@ -0,0 +1,142 @@
+import os
+import sys
+import json
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.insert(0, parent)
+
+from env.agent import Agent
+from env.deck import Deck
+from env.mahjong import MahjongGame
+from env.meld import Meld, get_index
+from env.player import Player
+from env.ruleset import Ruleset
+from env.tiles import Tile
+from env.utils import get_tile_counts
+from env.yaku import count_yaku_han, get_required_han, has_yaku
+
+def make_obs(player_idx=0, reach=False, player_state="passive", tiles_left=50):
+    return {
+        "player_idx": player_idx,
+        "player_state": player_state,
+        "reach": [reach if i == player_idx else False for i in range(4)],
+        "ippatsu": [False] * 4,
+        "wind": "E",
+        "wind_e": 0,
+        "tiles_left": tiles_left
+    }
+
+def check(hand, win, melds=[], is_tsumo=False, ruleset=None, **kwargs):
+    tiles = Deck(hand).get_tiles()
+    return has_yaku(tiles, melds, Tile(win), make_obs(**kwargs), is_tsumo, ruleset)
+
+def count(hand, win, melds=[], is_tsumo=False, **kwargs):
+    from env.yaku import get_situation
+    counts = get_tile_counts(Deck(hand).get_tiles())
+    return count_yaku_han(counts, melds, get_index(win), get_situation(make_obs(**kwargs), is_tsumo))
+
+# Yaku test
+
+def test_required_han():
+    assert [get_required_han(rule) for rule in ["0", "1", "2", "4", "mangan", "yakuman"]] == [1, 1, 2, 4, 5, 13]
+
+def test_count_yaku_han():
+    # Tanyao and pinfu, won on 8s completing 678s
+    assert count("234m345p456s22678s", 38) == 2
+    # 6s completes 456s or 678s, both two-sided waits
+    assert count("234m345p456s22678s", 36) == 2
+    # 3m only completes 123m, a closed edge wait
+    assert count("123m345p456s22678s", 13) == 0
+    # Menzen tsumo, riichi, haitei
+    assert count("123789m456p789s11z", 41, is_tsumo=True) == 1
+    assert count("123789m456p789s11z", 41, reach=True, is_tsumo=True, tiles_left=0) == 3
+    # Haku
+    assert count("123m456p789s55566z", 46) == 1
+    # Chiitoitsu
+    assert count("1122m3344p5566s77z", 47) == 2
+    # Chinitsu
+    assert count("11123455678999m", 15) >= 6
+    # Open honitsu and double east for the dealer
+    assert count("22z123m456m", 13, [Meld.from_string("p414141", 0, "pon"), Meld.from_string("c171819", 0, "chii")]) == 2 + 2
+
+def test_has_yaku():
+    assert check("234m345p456s22678s", 38)
+    assert check("123789m456p789s11z", 41, is_tsumo=True)
+    assert check("123789m456p789s11z", 41, reach=True)
+    # No yaku: a closed ron on a shanpon of west
+    assert not check("123m456p789s11333z", 43)
+    # Iipeikou is only found by the scorer
+    assert check("112233m456p789s33z", 43)
+    # Open hand without yaku
+    assert not check("456p789s11z", 41, [Meld.from_string("c111213", 0, "chii")])
+
+def test_min_yaku():
+    ruleset = Ruleset(json.dumps({"rules": {"minYaku": "2"}}))
+    assert check("234m345p456s22678s", 38, ruleset=ruleset)
+    assert not check("123789m456p789s11z", 41, reach=True, ruleset=ruleset)
+
+def test_action_space():
+    game = MahjongGame(Ruleset(), wall=1)
+    game.initialize_game()
+    game.hands[1] = Deck("123m456p789s1133z")
+    # Seat 1 is south: the east triplet is a yaku (round wind), west is not
+    obs = game.get_observation(1, {"player_state": "passive", "incoming_tile": Tile(41)})
+    assert "ron" in [action.action_type for action in game.players[1].get_action_space(obs)]
+    obs = game.get_observation(1, {"player_state": "passive", "incoming_tile": Tile(43)})
+    assert "ron" not in [action.action_type for action in game.players[1].get_action_space(obs)]
+
+def test_ippatsu():
+    from env.action import Action
+    from env.yaku import get_situation
+
+    game = MahjongGame(Ruleset(), wall=1)
+    game.initialize_game()
+    game.hands[0] = Deck("123789m456p789s1z")
+    obs = game.get_observation(0, {"player_state": "active", "incoming_tile": Tile(42)})
+    game.perform_action(Action.REACH(60), obs)
+    obs = game.get_observation(0, {"player_state": "active", "incoming_tile": Tile(41)})
+    assert get_situation(obs, True, game.ruleset)["is_ippatsu"]
+    counts = get_tile_counts(game.hands[0].get_tiles() + [Tile(41)])
+    assert count_yaku_han(counts, [], 27, get_situation(obs, True, game.ruleset)) == 3
+    # Turns after the reach discard, the win has no ippatsu
+    for id in [43, 44, 45]:
+        obs = game.get_observation(0, {"player_state": "active", "incoming_tile": Tile(id)})
+        game.perform_action(Action.DISCARD(), obs)
+    assert game.state["ippatsu"][0] == False
+    obs = game.get_observation(0, {"player_state": "active", "incoming_tile": Tile(41)})
+    assert not get_situation(obs, True, game.ruleset)["is_ippatsu"]
+    assert count_yaku_han(counts, [], 27, get_situation(obs, True, game.ruleset)) == 2
+
+def test_ippatsu_disabled():
+    from env.action import Action
+    from env.yaku import get_situation
+
+    game = MahjongGame(Ruleset(json.dumps({"rules": {"enableIppatsu": False}})), wall=1)
+    game.initialize_game()
+    game.hands[0] = Deck("123789m456p789s1z")
+    obs = game.get_observation(0, {"player_state": "active", "incoming_tile": Tile(42)})
+    game.perform_action(Action.REACH(60), obs)
+    obs = game.get_observation(0, {"player_state": "active", "incoming_tile": Tile(41)})
+    assert not get_situation(obs, True, game.ruleset)["is_ippatsu"]
+
+def test_double_reach():
+    from env.action import Action
+
+    game = MahjongGame(Ruleset(), wall=1)
+    game.initialize_game()
+    game.hands[0] = Deck("123789m456p789s1z")
+    obs = game.get_observation(0, {"player_state": "active", "incoming_tile": Tile(42)})
+    game.perform_action(Action.REACH(60), obs)
+    assert game.state["double_reach"] == [True, False, False, False]
+    # A tsumo on 1z: double reach (2 han), ippatsu and menzen tsumo
+    obs = game.get_observation(0, {"player_state": "active", "incoming_tile": Tile(41)})
+    game.state["dora_revealed"] = 0
+    assert game.calculate_credits(0, "tsumo", obs=obs) == [11700, -3900, -3900, -3900]
+    # Not on a later discard
+    game.hands[1] = Deck("123789m456p789s1z")
+    obs = game.get_observation(1, {"player_state": "active", "incoming_tile": Tile(43)})
+    game.perform_action(Action.DISCARD(), obs)
+    obs = game.get_observation(1, {"player_state": "active", "incoming_tile": Tile(42)})
+    game.perform_action(Action.REACH(60), obs)
+    assert game.state["double_reach"][1] == False